@@ -0,0 +1,277 @@
+"""
+Archive output: every document's document.txt and attachments go straight into rolling
+tar or zip shards (documents-00001.tar, ...) instead of a folder tree of loose files.
+
+shards.sqlite maps each UNID to its shard and to the byte offset and size of every
+member. Members are stored uncompressed, so one document or attachment can be read
+back with a single seek:
+
+    python archive_sink.py OUTPUT_DIR UNID                  # list the document's members
+    python archive_sink.py OUTPUT_DIR UNID --name report.pdf --out report.pdf
+"""
+import argparse
+import glob
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from field_serializer import document_text
+from metrics import run_metrics
+from sinks import RecordSink
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_KINDS = ("tar", "zip")
+# A new shard is started once the current one reaches this size; documents are never split
+SHARD_SIZE = 2 << 30
+INDEX_NAME = "shards.sqlite"
+COPY_CHUNK = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    unid TEXT PRIMARY KEY,
+    subject TEXT,
+    categories TEXT NOT NULL,
+    shard TEXT,
+    folder TEXT,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    unid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    shard TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (unid, name)
+);
+"""
+
+
+class TarShard:
+    """Uncompressed tar; returns the data offset of every member it appends."""
+
+    def __init__(self, path):
+        self.path = path
+        self._tar = tarfile.open(path, "w", format=tarfile.PAX_FORMAT)
+
+    def add(self, name, fileobj, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = time.time()
+        self._tar.addfile(info, fileobj)
+        # The member's data ends the archive so far, padded to whole blocks
+        padded = -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        return self._tar.offset - padded
+
+    def tell(self):
+        return self._tar.offset
+
+    def close(self):
+        self._tar.close()
+
+
+class ZipShard:
+    """Zip with stored (uncompressed) members; returns the data offset of every member."""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True)
+
+    def add(self, name, fileobj, size):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        info.file_size = size
+        with self._zip.open(info, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as dest:
+            shutil.copyfileobj(fileobj, dest, COPY_CHUNK)
+        # Local header rewritten in place; the stored data ends where the next member starts
+        return self._zip.fp.tell() - size
+
+    def tell(self):
+        return self._zip.fp.tell()
+
+    def close(self):
+        self._zip.close()
+
+
+SHARD_TYPES = {"tar": TarShard, "zip": ZipShard}
+
+
+class ArchiveSink(RecordSink):
+    """
+    Record sink writing documents into rolling `kind` ("tar" or "zip") shards of about
+    `shard_size` bytes in output_dir, indexed in shards.sqlite. Attachments are
+    extracted to a temporary file outside the lock, then appended under it, so worker
+    threads only serialize on the archive writes. With `append` (resumed or
+    incremental runs) numbering continues after the existing shards and a re-exported
+    UNID points to its newest copy. A full shard is only closed at the start of a new
+    response thread, so a thread written in order stays in one shard.
+    """
+
+    def __init__(self, output_dir, kind, sanitize, shard_size=SHARD_SIZE, append=False, batch_size=500):
+        super().__init__(os.path.join(output_dir, INDEX_NAME), output_dir, sanitize)
+        if kind not in SHARD_TYPES:
+            raise ValueError(f"Unknown archive kind '{kind}', expected one of {ARCHIVE_KINDS}")
+        self.output_dir = output_dir
+        self.kind = kind
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        existing = [int(m.group(1)) for m in (re.search(r"documents-(\d+)\.", os.path.basename(path))
+                                              for path in glob.glob(os.path.join(output_dir, "documents-*.*")))
+                    if m]
+        self._shard_number = max(existing) if append and existing else 0
+        self._shard = None
+        self._thread = None
+        self._documents = []
+        self._members = []
+        self._deleted = []
+
+    def _current_shard(self, thread=None):
+        if (self._shard is not None and self._shard.tell() >= self.shard_size
+                and (thread is None or thread != self._thread)):
+            self._shard.close()
+            self._shard = None
+        if self._shard is None:
+            self._shard_number += 1
+            path = os.path.join(self.output_dir, f"documents-{self._shard_number:05d}.{self.kind}")
+            self._shard = SHARD_TYPES[self.kind](path)
+        return self._shard
+
+    def write_document(self, snapshot, category_paths):
+        """Append document.txt and the attachments to the current shard and return its path."""
+        subject = snapshot.subject()
+        doc_id = snapshot.unid[:8] or "unknown"
+        first_path = category_paths[0] if category_paths else ["Uncategorized"]
+        folder = "/".join([self.sanitize(part) for part in first_path] +
+                          [self.sanitize(f"{subject}_{doc_id}")])
+        text = document_text(snapshot).encode("utf-8")
+
+        tmp_dir = tempfile.mkdtemp(prefix=".shard-", dir=self.output_dir)
+        try:
+            files = []
+            names = {"document.txt"}
+            for index, attachment in enumerate(snapshot.attachments):
+                try:
+                    placed = attachment.extract(os.path.join(tmp_dir, str(index))) or os.path.join(tmp_dir, str(index))
+                except Exception as e:
+                    logger.error("Failed to extract attachment '%s': %s", attachment.name, e)
+                    run_metrics.add("errors")
+                    continue
+                name = self.sanitize(attachment.name) or f"attachment_{index}"
+                if name in names:
+                    stem, extension = os.path.splitext(name)
+                    name = f"{stem}_{index}{extension}"
+                names.add(name)
+                files.append((name, placed, getattr(attachment, "sha256", None)))
+
+            with self._lock, run_metrics.phase("write_text"):
+                shard = self._current_shard(snapshot.thread)
+                self._thread = snapshot.thread
+                shard_name = os.path.basename(shard.path)
+                offset = shard.add(f"{folder}/document.txt", io.BytesIO(text), len(text))
+                members = [(snapshot.unid, "document.txt", shard_name, offset, len(text), None)]
+                for name, path, sha256 in files:
+                    size = os.path.getsize(path)
+                    with open(path, "rb") as f:
+                        offset = shard.add(f"{folder}/{name}", f, size)
+                    members.append((snapshot.unid, name, shard_name, offset, size, sha256))
+                run_metrics.add("bytes_written", len(text))
+                self._documents.append((snapshot.unid, subject,
+                                        json.dumps([list(parts) for parts in category_paths], ensure_ascii=False),
+                                        shard_name, folder))
+                self._members.extend(members)
+                self.count += 1
+                if len(self._documents) >= self.batch_size:
+                    self._flush_locked()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return shard.path
+
+    def _write(self, record):
+        """Only tombstones come through here: mark the document deleted, its bytes stay in the older shard."""
+        self._deleted.append((record["unid"],))
+
+    def _flush_locked(self):
+        with self._conn:
+            unids = [(row[0],) for row in self._documents]
+            self._conn.executemany("DELETE FROM members WHERE unid = ?", unids)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (unid, subject, categories, shard, folder, deleted) "
+                "VALUES (?, ?, ?, ?, ?, 0)", self._documents)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO members (unid, name, shard, offset, size, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self._members)
+            self._conn.executemany("UPDATE documents SET deleted = 1 WHERE unid = ?", self._deleted)
+        self._documents = []
+        self._members = []
+        self._deleted = []
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._shard is not None:
+                self._shard.close()
+                self._shard = None
+            self._conn.close()
+
+
+def document_members(output_dir, unid):
+    """[(name, shard, offset, size, sha256), ...] of an archived document."""
+    conn = sqlite3.connect(os.path.join(output_dir, INDEX_NAME))
+    try:
+        return conn.execute("SELECT name, shard, offset, size, sha256 FROM members WHERE unid = ? ORDER BY rowid",
+                            (unid,)).fetchall()
+    finally:
+        conn.close()
+
+
+def copy_member(output_dir, unid, name, dest):
+    """Copy one archived member (e.g. "document.txt") of `unid` into the binary file object `dest`."""
+    for member, shard, offset, size, _ in document_members(output_dir, unid):
+        if member == name:
+            with open(os.path.join(output_dir, shard), "rb") as f:
+                f.seek(offset)
+                while size > 0:
+                    chunk = f.read(min(size, COPY_CHUNK))
+                    if not chunk:
+                        raise EOFError(f"Shard '{shard}' ends before member '{name}' of {unid}")
+                    dest.write(chunk)
+                    size -= len(chunk)
+            return
+    raise KeyError(f"No member '{name}' for document {unid} in {output_dir}")
+
+
+def read_member(output_dir, unid, name="document.txt"):
+    buffer = io.BytesIO()
+    copy_member(output_dir, unid, name, buffer)
+    return buffer.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Read one document back from an archive-shard export.")
+    parser.add_argument("output_dir")
+    parser.add_argument("unid")
+    parser.add_argument("--name", help="Member to extract (default: list the document's members).")
+    parser.add_argument("--out", help="Write the member here instead of to stdout.")
+    args = parser.parse_args()
+
+    if args.name is None:
+        for name, shard, offset, size, sha256 in document_members(args.output_dir, args.unid):
+            print(f"{name}  ({size} bytes in {shard} at {offset})")
+    elif args.out:
+        with open(args.out, "wb") as out:
+            copy_member(args.output_dir, args.unid, args.name, out)
+    else:
+        copy_member(args.output_dir, args.unid, args.name, sys.stdout.buffer)
@@ -0,0 +1,195 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from com_lifetime import rss_bytes
+from fake_notes import CATEGORIZED_VIEW, CorpusSpec, FakeNotes
+from metrics import run_metrics
+from selection import Selection
+from throttle import Throttle
+
+NSF_PATH = "bench.nsf"
+# COM latency the blended-throttled mode keeps under; pair it with --load-latency-ms
+THROTTLE_TARGET = 0.005
+
+
+def load_script(name):
+    """Import one of the hyphenated extractor scripts (e.g. "extract-all3") as a module."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _all_documents(notes, output_dir, workers=1, **options):
+    load_script("extract-all2").extract_nsf_data_all_documents(
+        "", NSF_PATH, output_dir, workers=workers, session_factory=notes, **options)
+
+
+def _blended(notes, output_dir, workers=1, **options):
+    load_script("extract-all3").blended_export(
+        "", NSF_PATH, CATEGORIZED_VIEW, output_dir, workers=workers, session_factory=notes, **options)
+
+
+def _all_views(notes, output_dir, workers=1):
+    load_script("extract-all4").extract_all_views_with_categories(
+        "", NSF_PATH, output_dir, session_factory=notes)
+
+
+def _crawler(notes, output_dir, workers=1):
+    load_script("extract-geds").enumerate_all_databases("", output_dir, session_factory=notes)
+
+
+# Export mode -> runner(notes, output_dir, workers)
+MODES = {
+    "all-documents": lambda notes, out, workers: _all_documents(notes, out),
+    "all-documents-threads": _all_documents,
+    "all-documents-dxl": lambda notes, out, workers: _all_documents(notes, out, engine="dxl"),
+    "blended": lambda notes, out, workers: _blended(notes, out),
+    "blended-threads": _blended,
+    "blended-pipeline": lambda notes, out, workers: _blended(notes, out, pipeline=True, writers=workers),
+    "blended-jsonl": lambda notes, out, workers: _blended(notes, out, sink_kind="jsonl"),
+    "blended-tar": lambda notes, out, workers: _blended(notes, out, sink_kind="tar"),
+    "blended-blobs": lambda notes, out, workers: _blended(notes, out, blob_mode="hardlink"),
+    "blended-index": lambda notes, out, workers: _blended(notes, out, index_path=os.path.join(out, "index.sqlite")),
+    "blended-throttled": lambda notes, out, workers: _blended(
+        notes, out, workers, throttle=Throttle(workers, target_latency=THROTTLE_TARGET)),
+    "blended-fields": lambda notes, out, workers: _blended(notes, out, selection=Selection(fields=("DocNumber",))),
+    "blended-nested": lambda notes, out, workers: _blended(notes, out, workers, threads="nested"),
+    "all-views": _all_views,
+    "crawler": _crawler,
+}
+
+
+def output_bytes(output_dir):
+    """Bytes written under output_dir, counting hardlinked files once."""
+    seen = set()
+    total = 0
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            stat = os.lstat(os.path.join(root, name))
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                total += stat.st_size
+    return total
+
+
+def benchmark_export(spec, modes=None, workers=4, latency=0.0, call_latency=None, verbose=False,
+                     top_calls=0, load_latency=0.0):
+    """
+    Run each export mode against a fresh FakeNotes corpus built from `spec` and return
+    {mode: (docs/sec, COM calls/doc, bytes/sec, seconds)}.
+    """
+    results = {}
+    for mode in modes or MODES:
+        notes = FakeNotes({NSF_PATH: spec}, latency=latency, call_latency=call_latency, load_latency=load_latency)
+        output_dir = tempfile.mkdtemp(prefix=f"bench-{mode}-")
+        try:
+            quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            start = time.perf_counter()
+            with quiet:
+                MODES[mode](notes, output_dir, workers)
+            elapsed = time.perf_counter() - start
+            written = output_bytes(output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        calls = notes.total_calls()
+        results[mode] = (spec.documents / elapsed, calls / spec.documents, written / elapsed, elapsed)
+        print(f"[BENCH] {mode:>22}: {results[mode][0]:8.1f} docs/sec, {results[mode][1]:6.1f} COM calls/doc, "
+              f"{results[mode][2] / 1048576:7.1f} MB/sec ({elapsed:.2f}s, {written / 1048576:.1f} MB written)")
+        for member, count in notes.calls.most_common(top_calls):
+            print(f"[BENCH] {'':>22}  {count:>8} {member}")
+    return results
+
+
+def soak(documents, samples=10):
+    """
+    Blended export of `documents` small documents into a JSONL sink, with the fake
+    keeping every document and view entry alive until it is released. Prints RSS and
+    the live fake COM objects every documents/samples documents; both should stay flat.
+    """
+    spec = CorpusSpec(documents=documents, items_per_document=6, attachments_per_document=0)
+    notes = FakeNotes({NSF_PATH: spec}, retain_handles=True)
+    output_dir = tempfile.mkdtemp(prefix="soak-")
+    readings = []
+    done = threading.Event()
+    # The extractor's own output is silenced below; the samples still go to the console
+    console = sys.stdout
+
+    def sample():
+        step = max(documents // samples, 1)
+        mark = step
+        while not done.wait(0.1):
+            count = run_metrics.counters["documents"]
+            if count >= mark:
+                readings.append((count, rss_bytes() or 0, notes.live_handles()))
+                print(f"[SOAK] {count:>9} documents: RSS {readings[-1][1] / 1048576:7.1f} MB, "
+                      f"{readings[-1][2]} live COM objects", file=console, flush=True)
+                mark += step
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            _blended(notes, output_dir, sink_kind="jsonl")
+    finally:
+        done.set()
+        sampler.join()
+        shutil.rmtree(output_dir, ignore_errors=True)
+    if len(readings) > 1:
+        (first_count, first_rss, _), (last_count, last_rss, last_live) = readings[0], readings[-1]
+        per_document = (last_rss - first_rss) / max(last_count - first_count, 1)
+        print(f"[SOAK] {documents} documents in {time.perf_counter() - start:.0f}s; RSS grew "
+              f"{(last_rss - first_rss) / 1048576:.1f} MB ({per_document:.1f} bytes/document) after the "
+              f"first sample, {last_live} COM objects still alive.")
+    return readings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every export mode against a synthetic Notes database.")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--items", type=int, default=12, help="Items per document.")
+    parser.add_argument("--attachments", type=float, default=1.0, help="Mean attachments per document.")
+    parser.add_argument("--attachment-kb", type=int, nargs="+", default=[20, 150, 1500],
+                        help="Attachment sizes to draw from, in KB.")
+    parser.add_argument("--shared-attachments", type=float, default=0.2,
+                        help="Fraction of attachments that are the same few shared files.")
+    parser.add_argument("--category-depth", type=int, default=2)
+    parser.add_argument("--categories-per-level", type=int, default=5)
+    parser.add_argument("--responses", type=float, default=0.0,
+                        help="Fraction of documents that are responses (see the blended-nested mode).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per COM call.")
+    parser.add_argument("--load-latency-ms", type=float, default=0.0,
+                        help="Latency added per COM call per other call in flight (a server under load).")
+    parser.add_argument("--extract-latency-ms", type=float, default=None,
+                        help="Latency per ExtractFile call, if different.")
+    parser.add_argument("--workers", type=int, default=4, help="Workers/writers for the parallel modes.")
+    parser.add_argument("--top-calls", type=int, default=0, help="Show the N most frequent COM calls per mode.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the extractors' own output.")
+    parser.add_argument("--soak", type=int, metavar="DOCUMENTS",
+                        help="Instead of benchmarking, run a long blended export and watch RSS and live COM objects.")
+    args = parser.parse_args()
+    if args.soak:
+        soak(args.soak)
+        raise SystemExit
+
+    corpus = CorpusSpec(documents=args.documents, items_per_document=args.items,
+                        attachments_per_document=args.attachments,
+                        attachment_sizes=tuple(kb * 1024 for kb in args.attachment_kb),
+                        shared_attachments=args.shared_attachments, category_depth=args.category_depth,
+                        categories_per_level=args.categories_per_level, response_ratio=args.responses)
+    extract_latency = {"ExtractFile": args.extract_latency_ms / 1000} if args.extract_latency_ms is not None else None
+    benchmark_export(corpus, args.modes, workers=args.workers, latency=args.latency_ms / 1000,
+                     call_latency=extract_latency, verbose=args.verbose, top_calls=args.top_calls,
+                     load_latency=args.load_latency_ms / 1000)
@@ -0,0 +1,88 @@
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from doc_snapshot import AUTHORS, DATETIMES, NAMES, NUMBERS, TEXT, DocumentSnapshot, ItemSnapshot
+from field_serializer import document_text
+
+
+def sample_snapshot(index, values):
+    """A document with a few scalar items and large multi-value text, name, number and date items."""
+    base = datetime.datetime(2020, 1, 1)
+    items = [
+        ItemSnapshot("Subject", TEXT, (f"Document {index}",), None),
+        ItemSnapshot("Form", TEXT, ("Memo",), None),
+        ItemSnapshot("Keywords", TEXT, tuple(f"keyword {index}.{n}" for n in range(values)), None),
+        ItemSnapshot("Readers", NAMES, tuple(f"CN=Reader {n}/O=Fake" for n in range(values)), None),
+        ItemSnapshot("Authors", AUTHORS, tuple(f"CN=Author {n}/O=Fake" for n in range(values // 10 or 1)), None),
+        ItemSnapshot("Amounts", NUMBERS, tuple(float(n) * 1.5 for n in range(values)), None),
+        ItemSnapshot("History", DATETIMES, tuple(base + datetime.timedelta(hours=n) for n in range(values)), None),
+    ]
+    return DocumentSnapshot(f"FA4E{index:028X}", items, [])
+
+
+def write_per_line(snapshot, path):
+    """The extractors' former document.txt writer: one repr()'d write per item."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"----- Document: {snapshot.subject()} ({snapshot.unid[:8]}) -----\n")
+        for item in snapshot.items:
+            if item.error is not None:
+                f.write(f"{item.name}: <Error reading value: {item.error}>\n")
+            else:
+                f.write(f"{item.name}: {item.values}\n")
+        f.write("--------------------\n")
+        return f.tell()
+
+
+def write_typed(snapshot, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(document_text(snapshot))
+        return f.tell()
+
+
+WRITERS = {
+    "per-line": write_per_line,
+    "typed": write_typed,
+}
+
+
+def benchmark_serializer(documents=200, values=2000, repeat=5):
+    """
+    Time each document.txt writer over the same snapshots and return
+    {writer: (docs/sec, MB/sec, seconds)} using the best of `repeat` runs.
+    """
+    snapshots = [sample_snapshot(i, values) for i in range(documents)]
+    output_dir = tempfile.mkdtemp(prefix="bench-serializer-")
+    best = {}
+    try:
+        # Alternate the writers, so both see the same disk and machine load
+        for _ in range(repeat):
+            for name, write in WRITERS.items():
+                start = time.perf_counter()
+                written = sum(write(snapshot, os.path.join(output_dir, f"{n}.txt"))
+                              for n, snapshot in enumerate(snapshots))
+                elapsed = time.perf_counter() - start
+                if name not in best or elapsed < best[name][0]:
+                    best[name] = (elapsed, written)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    results = {}
+    for name, (elapsed, written) in best.items():
+        results[name] = (documents / elapsed, written / elapsed / 1048576, elapsed)
+        print(f"[BENCH] {name:>8}: {documents} documents, {written / 1048576:.1f} MB in {elapsed:.3f}s "
+              f"-> {results[name][0]:.0f} docs/sec, {results[name][1]:.1f} MB/sec")
+    print(f"[BENCH] speedup: {results['typed'][0] / results['per-line'][0]:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the per-line and typed document.txt writers.")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--values", type=int, default=2000, help="Values in each multi-value item.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    benchmark_serializer(args.documents, args.values, args.repeat)
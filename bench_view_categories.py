@@ -0,0 +1,62 @@
+import argparse
+import time
+
+from fake_notes import CATEGORIZED_VIEW, CorpusSpec, FakeNotes
+from session_pool import notes_session_factory, open_database
+from view_categories import gather_view_categories_by_document, gather_view_categories_by_entry
+
+PATHS = {
+    "document": gather_view_categories_by_document,
+    "entry": gather_view_categories_by_entry,
+}
+
+
+def benchmark_view_categories(db, view_name, repeat=3):
+    """
+    Time both category-mapping passes over the same view and return
+    {path: (entries/sec, seconds, entries)} using the best of `repeat` runs.
+    """
+    view = db.GetView(view_name)
+    if not view:
+        raise Exception(f"View '{view_name}' not found")
+
+    results = {}
+    for name, gather in PATHS.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            doc_id_to_paths, entry_count = gather(view)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best[0]:
+                best = (elapsed, entry_count, len(doc_id_to_paths))
+        elapsed, entry_count, doc_count = best
+        results[name] = (entry_count / elapsed if elapsed else 0.0, elapsed, entry_count)
+        print(f"[BENCH] {name:>8}: {entry_count} entries, {doc_count} docs in {elapsed:.3f}s "
+              f"-> {results[name][0]:.0f} entries/sec")
+    if results["document"][0]:
+        print(f"[BENCH] speedup: {results['entry'][0] / results['document'][0]:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare entries/sec of the view category mapping passes.")
+    parser.add_argument("nsf_path", nargs="?")
+    parser.add_argument("view_name", nargs="?")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fake", action="store_true",
+                        help="Run against a synthetic database (fake_notes) instead of a Notes client.")
+    parser.add_argument("--documents", type=int, default=5000, help="Documents in the synthetic database.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated latency per synthetic COM call.")
+    args = parser.parse_args()
+
+    if args.fake:
+        nsf_path = args.nsf_path or "bench.nsf"
+        session_factory = FakeNotes({nsf_path: CorpusSpec(documents=args.documents)}, latency=args.latency_ms / 1000)
+        view_name = args.view_name or CATEGORIZED_VIEW
+    elif args.nsf_path and args.view_name:
+        nsf_path, view_name, session_factory = args.nsf_path, args.view_name, notes_session_factory
+    else:
+        parser.error("nsf_path and view_name are required unless --fake is given")
+    session = session_factory(args.password)
+    benchmark_view_categories(open_database(session, nsf_path), view_name, args.repeat)
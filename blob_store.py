@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# How a document gets an attachment that lives in the blob directory
+BLOB_MODES = ("hardlink", "copy", "reference")
+BLOB_DIR = "blobs"
+REFERENCES_NAME = "references.jsonl"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobAttachment:
+    """
+    Stands in for a snapshot attachment: `extract(path)` stores the content once in the
+    blob store (ExtractFile only when it isn't known yet) and places it at `path`.
+    """
+
+    __slots__ = ("name", "source", "store", "sha256", "size")
+
+    def __init__(self, source, store):
+        self.name = source.name
+        self.source = source
+        self.store = store
+        self.sha256 = None
+        self.size = None
+
+    def ingest(self):
+        """Get the content into the blob store; needs the COM session unless already known."""
+        if self.sha256 is None:
+            self.sha256, self.size = self.store.ingest(self.source)
+        return self.sha256
+
+    def extract(self, path):
+        """Place the blob at `path`; returns where the content can be read."""
+        return self.store.place(self.ingest(), self.name, self.size, path)
+
+
+class BlobStore:
+    """
+    Content-addressed attachment store: every attachment is hashed as it is extracted
+    and kept once as blobs/<sha256[:2]>/<sha256>. Documents get a hardlink/copy of the
+    blob (or nothing, in "reference" mode) and every placement is listed by hash in
+    blobs/references.jsonl. An attachment whose name and FileSize match a known blob
+    is assumed to be that blob and isn't extracted at all (`precheck`).
+    """
+
+    def __init__(self, output_dir, mode="hardlink", precheck=True):
+        if mode not in BLOB_MODES:
+            raise ValueError(f"Unknown blob mode '{mode}', expected one of {BLOB_MODES}")
+        self.output_dir = output_dir
+        self.root = os.path.join(output_dir, BLOB_DIR)
+        self.mode = mode
+        self.precheck = precheck
+        self.references_path = os.path.join(self.root, REFERENCES_NAME)
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+        self.extracted = 0
+        self.extracted_bytes = 0
+        self.extract_seconds = 0.0
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        # (lowercased name, size) -> sha256, rebuilt from earlier runs' references
+        self._by_name_size = {}
+        self._lock = threading.Lock()
+        self._load_references()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load_references(self):
+        if not os.path.exists(self.references_path):
+            return
+        with open(self.references_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ref = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                if os.path.exists(self.blob_path(ref["sha256"])):
+                    self._by_name_size[(ref["name"].lower(), ref["size"])] = ref["sha256"]
+
+    def wrap(self, snapshot):
+        """Route the snapshot's attachments through the store; returns the snapshot."""
+        snapshot.attachments = [BlobAttachment(attachment, self) for attachment in snapshot.attachments]
+        return snapshot
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def ingest(self, attachment):
+        """Returns (sha256, size) for the attachment, extracting it only if needed."""
+        size = None
+        if self.precheck:
+            try:
+                size = attachment.size()
+            except Exception:
+                size = None
+        if size is not None:
+            with self._lock:
+                sha256 = self._by_name_size.get((attachment.name.lower(), size))
+                if sha256 is not None:
+                    self.skipped += 1
+                    self.skipped_bytes += size
+                    return sha256, size
+
+        tmp_path = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        start = time.perf_counter()
+        attachment.extract(tmp_path)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(tmp_path)
+        sha256 = file_sha256(tmp_path)
+
+        blob_path = self.blob_path(sha256)
+        with self._lock:
+            self.extracted += 1
+            self.extracted_bytes += size
+            self.extract_seconds += elapsed
+            duplicate = os.path.exists(blob_path)
+            if duplicate:
+                self.duplicates += 1
+                self.duplicate_bytes += size
+            self._by_name_size[(attachment.name.lower(), size)] = sha256
+        if duplicate:
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return sha256, size
+
+    def place(self, sha256, name, size, path):
+        """Hardlink/copy the blob to `path` (not in "reference" mode) and record the reference."""
+        blob_path = self.blob_path(sha256)
+        placed = blob_path
+        if self.mode != "reference":
+            if os.path.exists(path):
+                os.unlink(path)
+            linked = False
+            if self.mode == "hardlink":
+                try:
+                    os.link(blob_path, path)
+                    linked = True
+                except OSError:
+                    # Different volume or filesystem without hardlinks
+                    pass
+            if not linked:
+                shutil.copy2(blob_path, path)
+            placed = path
+        line = json.dumps({"sha256": sha256, "name": name, "size": size,
+                           "path": os.path.relpath(path, self.output_dir)}, ensure_ascii=False)
+        with self._lock:
+            with open(self.references_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        return placed
+
+    def report(self):
+        """Print how much extraction the store avoided."""
+        saved_bytes = self.duplicate_bytes + self.skipped_bytes
+        per_extract = self.extract_seconds / self.extracted if self.extracted else 0.0
+        print(f"[INFO] Blob store: {self.extracted} attachments extracted "
+              f"({self.extracted_bytes / 1048576:.1f} MB in {self.extract_seconds:.1f}s), "
+              f"{self.duplicates} duplicates dropped after hashing, "
+              f"{self.skipped} skipped by name+size pre-check.")
+        print(f"[INFO] Blob store: {saved_bytes / 1048576:.1f} MB deduplicated, "
+              f"~{self.skipped * per_extract:.1f}s of ExtractFile saved.")
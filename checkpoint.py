@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+CheckpointEntry = namedtuple("CheckpointEntry", ["last_modified", "paths", "attachments"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    db_key TEXT NOT NULL,
+    unid TEXT NOT NULL,
+    last_modified TEXT,
+    paths TEXT NOT NULL,
+    attachments TEXT NOT NULL,
+    PRIMARY KEY (db_key, unid)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    db_key TEXT PRIMARY KEY,
+    until_time TEXT NOT NULL
+);
+"""
+
+# One Checkpoint per manifest file and process, so every pickled reference
+# (e.g. in a worker process) resolves to the same connection and pending batch.
+_open_checkpoints = {}
+_open_lock = threading.Lock()
+
+
+def open_checkpoint(path, batch_size=500):
+    key = (os.getpid(), os.path.abspath(path))
+    with _open_lock:
+        checkpoint = _open_checkpoints.get(key)
+        if checkpoint is None:
+            checkpoint = _open_checkpoints[key] = Checkpoint(path, batch_size)
+        return checkpoint
+
+
+class Checkpoint:
+    """
+    SQLite manifest of processed documents: UNID, LastModified, output paths and
+    attachment names per database. Marks are buffered and written in one
+    transaction every `batch_size` documents; lookups are served from memory.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._cache = {}
+        # (db_key, unid) -> row to upsert, or None to delete; the last change wins
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return open_checkpoint, (self.path, self.batch_size)
+
+    def _entries(self, db_key):
+        entries = self._cache.get(db_key)
+        if entries is None:
+            rows = self._conn.execute(
+                "SELECT unid, last_modified, paths, attachments FROM documents WHERE db_key = ?",
+                (db_key,))
+            entries = self._cache[db_key] = {
+                unid: CheckpointEntry(last_modified, json.loads(paths), json.loads(attachments))
+                for unid, last_modified, paths, attachments in rows
+            }
+        return entries
+
+    def get(self, db_key, unid):
+        with self._lock:
+            return self._entries(db_key).get(unid)
+
+    def is_done(self, db_key, unid, last_modified):
+        """True if the UNID was already exported and hasn't been modified since."""
+        entry = self.get(db_key, unid)
+        return entry is not None and entry.last_modified == last_modified
+
+    def count(self, db_key):
+        with self._lock:
+            return len(self._entries(db_key))
+
+    def mark(self, db_key, unid, last_modified, paths, attachments):
+        with self._lock:
+            entry = CheckpointEntry(last_modified, list(paths), list(attachments))
+            self._entries(db_key)[unid] = entry
+            self._pending[(db_key, unid)] = (db_key, unid, last_modified,
+                                             json.dumps(entry.paths, ensure_ascii=False),
+                                             json.dumps(entry.attachments, ensure_ascii=False))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def forget(self, db_key, unid):
+        """Drop a UNID from the manifest (e.g. after the document was deleted)."""
+        with self._lock:
+            self._entries(db_key).pop(unid, None)
+            self._pending[(db_key, unid)] = None
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def get_watermark(self, db_key):
+        """High-water mark of the last completed incremental run, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT until_time FROM watermarks WHERE db_key = ?",
+                                     (db_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, db_key, until_time):
+        """Flush pending marks and move the high-water mark in the same transaction."""
+        with self._lock:
+            self._flush_locked(("INSERT OR REPLACE INTO watermarks (db_key, until_time) VALUES (?, ?)",
+                                (db_key, until_time)))
+
+    def add_path(self, db_key, unid, path, last_modified=None, attachments=None):
+        """Record one more output path for a UNID, keeping what is already known about it."""
+        entry = self.get(db_key, unid)
+        if entry is not None:
+            if path in entry.paths:
+                return
+            paths = entry.paths + [path]
+            last_modified = last_modified if last_modified is not None else entry.last_modified
+            attachments = attachments if attachments is not None else entry.attachments
+        else:
+            paths = [path]
+        self.mark(db_key, unid, last_modified, paths, attachments or [])
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self, extra_statement=None):
+        if not self._pending and extra_statement is None:
+            return
+        upserts = [row for row in self._pending.values() if row is not None]
+        deletes = [key for key, row in self._pending.items() if row is None]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (db_key, unid, last_modified, paths, attachments) "
+                "VALUES (?, ?, ?, ?, ?)", upserts)
+            self._conn.executemany("DELETE FROM documents WHERE db_key = ? AND unid = ?", deletes)
+            if extra_statement is not None:
+                self._conn.execute(*extra_statement)
+        self._pending = {}
+
+    def close(self):
+        self.flush()
+        with _open_lock:
+            _open_checkpoints.pop((os.getpid(), os.path.abspath(self.path)), None)
+        self._conn.close()
@@ -0,0 +1,136 @@
+"""
+Explicit COM object lifetime for long exports.
+
+pywin32 releases a COM proxy only when its last Python reference goes away, and the
+Notes back end keeps every document, item and view entry it handed out alive until
+then. `release()` drops the interface pointer of per-document objects as soon as the
+loop is done with them, and a Watchdog samples the process's memory (RSS) and handle
+count every few hundred documents: over a threshold it forces a garbage collection,
+and if that doesn't help it asks the caller to recycle its Notes session.
+"""
+import gc
+import os
+import sys
+
+# Documents between two watchdog samples
+CHECK_EVERY = 500
+
+
+def release(*objects):
+    """Release the COM interface behind each object now; the proxies are unusable afterwards."""
+    for obj in objects:
+        if obj is not None and hasattr(obj, "_oleobj_"):
+            try:
+                obj._oleobj_ = None
+            except Exception:
+                pass
+
+
+def rss_bytes():
+    """Resident set size of this process, or None if it can't be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def handle_count():
+    """Open handles (Windows) or file descriptors (elsewhere) of this process, or None."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        count = wintypes.DWORD()
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.kernel32.GetProcessHandleCount(process, ctypes.byref(count)):
+            return count.value
+        return None
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class Watchdog:
+    """
+    Samples RSS and the handle count every `every` documents. `check()` returns True
+    when a threshold (`max_rss_mb`, `max_handles`) is still crossed after a forced
+    garbage collection, i.e. when the caller should recycle its session.
+    `handles` is the handle counter to sample (the process's by default).
+    """
+
+    def __init__(self, max_rss_mb=None, max_handles=None, every=CHECK_EVERY, handles=handle_count):
+        self.max_rss = max_rss_mb * 1048576 if max_rss_mb else None
+        self.max_handles = max_handles
+        self.every = every
+        self.handles = handles
+        self.documents = 0
+        self.cleanups = 0
+        self.recycles = 0
+        self.peak_rss = 0
+        self.peak_handles = 0
+
+    def _over(self):
+        rss = rss_bytes() if self.max_rss else None
+        handles = self.handles() if self.max_handles else None
+        self.peak_rss = max(self.peak_rss, rss or 0)
+        self.peak_handles = max(self.peak_handles, handles or 0)
+        return ((rss is not None and rss > self.max_rss)
+                or (handles is not None and handles > self.max_handles))
+
+    def check(self):
+        """Count one document; True if the session should be recycled now."""
+        self.documents += 1
+        if self.documents % self.every or not self._over():
+            return False
+        gc.collect()
+        self.cleanups += 1
+        return self._over()
+
+    def recycled(self):
+        self.recycles += 1
+
+    def report(self):
+        print(f"[INFO] Watchdog: peak RSS {self.peak_rss / 1048576:.0f} MB, peak handles {self.peak_handles}, "
+              f"{self.cleanups} forced cleanups, {self.recycles} session recycles.")
+
+
+def add_lifetime_arguments(parser):
+    group = parser.add_argument_group("long runs")
+    group.add_argument("--max-rss-mb", type=float, metavar="MB",
+                       help="Force cleanup, then recycle the Notes session, when the process grows past MB.")
+    group.add_argument("--max-handles", type=int, metavar="N",
+                       help="Same, for the process's open handle count.")
+    group.add_argument("--watchdog-every", type=int, default=CHECK_EVERY, metavar="DOCS",
+                       help="Documents between two memory/handle samples.")
+
+
+def watchdog_from_args(args):
+    """Watchdog from the add_lifetime_arguments options, or None if no threshold was set."""
+    if not args.max_rss_mb and not args.max_handles:
+        return None
+    return Watchdog(args.max_rss_mb, args.max_handles, args.watchdog_every)
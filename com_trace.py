@@ -0,0 +1,222 @@
+"""
+Opt-in tracing proxy for the Notes COM objects. Wrap a session (or use
+TracedSessionFactory) and every property read, property write and method call made
+through it, and through every object it hands back, is counted and timed by member
+name and by the call site in our code.
+
+    tracer = Tracer()
+    blended_export(..., session_factory=TracedSessionFactory(notes_session_factory, tracer))
+    tracer.write("trace")   # trace.txt (sorted cost report) and trace.folded (flamegraph stacks)
+
+The folded file feeds straight into flamegraph.pl or speedscope.
+"""
+import datetime
+import os
+import sys
+import threading
+import time
+import types
+
+from session_pool import notes_session_factory, release_session
+
+# Plain values COM hands back; anything else is wrapped so its members get traced too
+_PLAIN = (str, bytes, int, float, bool, complex, datetime.datetime, datetime.date)
+MAX_STACK_DEPTH = 40
+
+# Notes class of the object returned by a member, for readable report names
+RETURNS = {
+    "GetDatabase": "Database", "GetFirstDatabase": "Database", "GetNextDatabase": "Database",
+    "AddressBooks": "Database", "CurrentDatabase": "Database", "GetDbDirectory": "DbDirectory",
+    "AllDocuments": "DocumentCollection", "GetModifiedDocuments": "DocumentCollection",
+    "Search": "DocumentCollection", "FTSearch": "DocumentCollection",
+    "GetFirstDocument": "Document", "GetNextDocument": "Document", "GetDocumentByUNID": "Document",
+    "Document": "Document", "Items": "Item", "GetFirstItem": "Item", "EmbeddedObjects": "EmbeddedObject",
+    "Views": "View", "GetView": "View", "AllEntries": "ViewEntryCollection",
+    "CreateViewNav": "ViewNavigator", "GetFirst": "ViewEntry", "GetNext": "ViewEntry",
+    "GetFirstEntry": "ViewEntry", "GetNextEntry": "ViewEntry",
+    "CreateDateTime": "DateTime", "UntilTime": "DateTime", "CreateStream": "Stream",
+}
+
+
+def unwrap(value):
+    """The real COM object behind a traced proxy (arguments passed back into COM)."""
+    if isinstance(value, TracedObject):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap(v) for v in value)
+    return value
+
+
+class Tracer:
+    """Collects (member, call site) -> count and seconds, plus folded call stacks."""
+
+    def __init__(self):
+        self.calls = {}
+        self.stacks = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def wrap(self, value, class_name="Session"):
+        if value is None or isinstance(value, _PLAIN) or isinstance(value, TracedObject):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.wrap(v, class_name) for v in value)
+        return TracedObject(value, self, class_name)
+
+    def record(self, member, seconds):
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_globals.get("__name__") == __name__:
+            frame = frame.f_back
+        site = f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}" if frame else "?"
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(f"{os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]}.{frame.f_code.co_name}")
+            frame = frame.f_back
+        folded = ";".join(reversed(stack)) + ";" + member
+        with self._lock:
+            entry = self.calls.get((member, site))
+            if entry is None:
+                self.calls[(member, site)] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+            self.stacks[folded] = self.stacks.get(folded, 0.0) + seconds
+
+    def by_member(self):
+        totals = {}
+        for (member, _), (count, seconds) in self.calls.items():
+            entry = totals.setdefault(member, [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        return totals
+
+    def report(self, top=50):
+        """Cost report: members, then member + call site, most expensive first."""
+        members = sorted(self.by_member().items(), key=lambda item: item[1][1], reverse=True)
+        total_calls = sum(count for count, _ in self.calls.values())
+        total_seconds = sum(seconds for _, seconds in self.calls.values())
+        lines = [f"COM trace: {total_calls} calls, {total_seconds:.3f}s inside COM", "",
+                 f"{'calls':>10} {'total s':>10} {'mean us':>10} {'share':>7}  member"]
+        for member, (count, seconds) in members[:top]:
+            share = seconds / total_seconds if total_seconds else 0.0
+            lines.append(f"{count:>10} {seconds:>10.3f} {seconds / count * 1e6:>10.1f} {share:>7.1%}  {member}")
+        lines += ["", f"{'calls':>10} {'total s':>10} {'mean us':>10}  member @ call site"]
+        sites = sorted(self.calls.items(), key=lambda item: item[1][1], reverse=True)
+        for (member, site), (count, seconds) in sites[:top]:
+            lines.append(f"{count:>10} {seconds:>10.3f} {seconds / count * 1e6:>10.1f}  {member} @ {site}")
+        return "\n".join(lines) + "\n"
+
+    def folded(self):
+        """Folded stacks (frame;frame;member microseconds) for flamegraph tools."""
+        return "".join(f"{stack} {round(seconds * 1e6)}\n"
+                       for stack, seconds in sorted(self.stacks.items()) if seconds > 0)
+
+    def write(self, prefix):
+        """Write <prefix>.txt (report) and <prefix>.folded (flamegraph stacks)."""
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(self.report())
+        with open(f"{prefix}.folded", "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        print(f"[INFO] COM trace written to {prefix}.txt and {prefix}.folded")
+
+
+class TracedObject:
+    """
+    Proxy that times every member access on one COM object and wraps what it returns.
+    Underscore attributes (pywin32's own, e.g. the _oleobj_ that com_lifetime.release()
+    clears) are Python-side bookkeeping, not COM members: they pass through unrecorded.
+    """
+
+    __slots__ = ("_target", "_tracer", "_class")
+
+    def __init__(self, target, tracer, class_name):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_tracer", tracer)
+        object.__setattr__(self, "_class", class_name)
+
+    def __getattr__(self, name):
+        target = object.__getattribute__(self, "_target")
+        if name.startswith("_"):
+            return getattr(target, name)
+        tracer = object.__getattribute__(self, "_tracer")
+        class_name = object.__getattribute__(self, "_class")
+        start = time.perf_counter()
+        value = getattr(target, name)
+        elapsed = time.perf_counter() - start
+        if isinstance(value, (types.MethodType, types.BuiltinMethodType)):
+            return _TracedMethod(value, tracer, f"{class_name}.{name}()", RETURNS.get(name, name))
+        tracer.record(f"{class_name}.{name}", elapsed)
+        return tracer.wrap(value, RETURNS.get(name, name))
+
+    def __setattr__(self, name, value):
+        target = object.__getattribute__(self, "_target")
+        if name.startswith("_"):
+            setattr(target, name, value)
+            return
+        tracer = object.__getattribute__(self, "_tracer")
+        start = time.perf_counter()
+        setattr(target, name, unwrap(value))
+        tracer.record(f"{object.__getattribute__(self, '_class')}.{name}=", time.perf_counter() - start)
+
+    def __iter__(self):
+        tracer = object.__getattribute__(self, "_tracer")
+        class_name = object.__getattribute__(self, "_class")
+        for value in object.__getattribute__(self, "_target"):
+            yield tracer.wrap(value, class_name)
+
+    def __len__(self):
+        return len(object.__getattribute__(self, "_target"))
+
+    def __bool__(self):
+        return bool(object.__getattribute__(self, "_target"))
+
+    def __repr__(self):
+        return f"<traced {object.__getattribute__(self, '_class')} {object.__getattribute__(self, '_target')!r}>"
+
+
+class _TracedMethod:
+    __slots__ = ("method", "tracer", "member", "returns")
+
+    def __init__(self, method, tracer, member, returns):
+        self.method = method
+        self.tracer = tracer
+        self.member = member
+        self.returns = returns
+
+    def __call__(self, *args, **kwargs):
+        args = [unwrap(arg) for arg in args]
+        kwargs = {key: unwrap(value) for key, value in kwargs.items()}
+        start = time.perf_counter()
+        value = self.method(*args, **kwargs)
+        self.tracer.record(self.member, time.perf_counter() - start)
+        return self.tracer.wrap(value, self.returns)
+
+
+class TracedSessionFactory:
+    """Session factory that hands out traced sessions from `session_factory`."""
+
+    def __init__(self, session_factory=notes_session_factory, tracer=None):
+        self.session_factory = session_factory
+        self.tracer = tracer if tracer is not None else Tracer()
+
+    def __call__(self, password):
+        return self.tracer.wrap(self.session_factory(password), "Session")
+
+    def release(self, session):
+        release_session(self.session_factory, unwrap(session))
+
+
+def trace_session_factory(trace_prefix, session_factory=notes_session_factory):
+    """(session factory, tracer) for a --trace option; no tracing when the prefix is empty."""
+    if not trace_prefix:
+        return session_factory, None
+    traced = TracedSessionFactory(session_factory)
+    return traced, traced.tracer
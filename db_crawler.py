@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from session_pool import notes_session_factory, open_database, release_session
+
+# NotesDbDirectory.GetFirstDatabase file type for .nsf/.nsg/.nsh databases
+DATABASE = 1247
+SUMMARY_NAME = "crawl_summary.json"
+
+CatalogEntry = namedtuple("CatalogEntry", ["server", "file_path", "title", "size", "doc_count", "error"])
+
+
+def catalog_entry(db, server="", count_documents=True):
+    """
+    Open a database just long enough to read its size and document count. Counting
+    builds db.AllDocuments, a collection of every document, so on large servers
+    count_documents=False skips it and leaves doc_count None.
+    """
+    try:
+        if not db.IsOpen:
+            db.Open()
+        doc_count = db.AllDocuments.Count if count_documents else None
+        return CatalogEntry(server, db.FilePath, db.Title, float(db.Size), doc_count, None)
+    except Exception as e:
+        return CatalogEntry(server, db.FilePath, db.Title, 0.0, None, str(e))
+
+
+def database_folder_name(db, sanitize):
+    """
+    Output folder name for a database: its sanitized title plus a short hash of its
+    server and file path, since two databases can share a title.
+    """
+    location = f"{getattr(db, 'Server', '') or ''}!!{db.FilePath}".lower()
+    return f"{sanitize(db.Title)}_{hashlib.sha1(location.encode('utf-8')).hexdigest()[:8]}"
+
+
+def build_catalog(session, server="", count_documents=True):
+    """Catalog every database in the server's (or local) data directory."""
+    db_directory = session.GetDbDirectory(server)
+    catalog = []
+    db = db_directory.GetFirstDatabase(DATABASE)
+    while db:
+        catalog.append(catalog_entry(db, server, count_documents))
+        db = db_directory.GetNextDatabase()
+    return catalog
+
+
+def catalog_databases(dbs, server="", count_documents=True):
+    """Catalog an explicit list of databases (e.g. session.AddressBooks)."""
+    return [catalog_entry(db, getattr(db, "Server", server) or server, count_documents) for db in dbs]
+
+
+def format_doc_count(doc_count):
+    return "-" if doc_count is None else str(doc_count)
+
+
+def _crawl_one(session_factory, password, export_database, entry):
+    """Worker body: private session, open the database and run the export on it."""
+    result = entry._asdict()
+    start = time.perf_counter()
+    session = session_factory(password)
+    db = None
+    try:
+        db = open_database(session, entry.file_path, entry.server)
+        result.update(status="ok", output=export_database(db))
+    except Exception as e:
+        result.update(status="failed", error=str(e))
+    finally:
+        release_session(session_factory, session, db)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def crawl(password, catalog, export_database, output_dir, concurrency=1,
+          session_factory=notes_session_factory):
+    """
+    Export every catalogued database, largest first, in up to `concurrency` worker
+    processes, each with its own session. `export_database(db)` must be picklable (a
+    module-level function or functools.partial of one); its return value (e.g. the
+    database's output folder) is kept in the summary. Writes crawl_summary.json into
+    output_dir and returns the per-database results.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending = sorted((entry for entry in catalog if entry.error is None),
+                     key=lambda entry: entry.size, reverse=True)
+    results = [dict(entry._asdict(), status="unreadable", seconds=0.0)
+               for entry in catalog if entry.error is not None]
+    run_one = functools.partial(_crawl_one, session_factory, password, export_database)
+
+    print(f"[INFO] Crawling {len(pending)} databases with concurrency {concurrency} "
+          f"({len(results)} unreadable in catalog).")
+    if concurrency <= 1:
+        for entry in pending:
+            results.append(_report(run_one(entry), len(results) + 1, len(catalog)))
+    else:
+        with ProcessPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(run_one, entry) for entry in pending]
+            for future in as_completed(futures):
+                results.append(_report(future.result(), len(results) + 1, len(catalog)))
+
+    with open(os.path.join(output_dir, SUMMARY_NAME), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print_summary(results)
+    return results
+
+
+def _report(result, done, total):
+    print(f"[INFO] ({done}/{total}) {result['status']}: {result['title']} "
+          f"({format_doc_count(result['doc_count'])} docs, {result['size'] / 1048576:.1f} MB) in {result['seconds']:.1f}s"
+          + (f" - {result['error']}" if result.get("error") else ""))
+    return result
+
+
+def print_summary(results):
+    print("\n[DONE] Per-database results:")
+    print(f"{'status':<11}{'docs':>8}{'MB':>10}{'seconds':>10}  title")
+    for result in sorted(results, key=lambda r: r["size"], reverse=True):
+        print(f"{result['status']:<11}{format_doc_count(result['doc_count']):>8}{result['size'] / 1048576:>10.1f}"
+              f"{result['seconds']:>10.1f}  {result['title']} ({result['file_path']})")
+    failed = sum(1 for result in results if result["status"] != "ok")
+    print(f"[DONE] {len(results) - failed} databases exported, {failed} failed or unreadable.")
@@ -0,0 +1,102 @@
+import datetime
+import os
+import shutil
+
+# NotesDatabase.GetModifiedDocuments noteClass for data documents (DBMOD_DOC_DATA)
+DBMOD_DOC_DATA = 1
+TOMBSTONE_NAME = "tombstone.txt"
+
+
+def watermark_text(date_time):
+    """
+    A NotesDateTime as an ISO-8601 UTC string. LocalTime text follows the client's
+    locale and time zone, so a checkpoint moved to another machine would misread it.
+    """
+    # pywin32 hands COM dates over as wall-clock values; LSGMTTime's are GMT
+    gmt = date_time.LSGMTTime.replace(tzinfo=None)
+    return gmt.replace(tzinfo=datetime.timezone.utc).isoformat()
+
+
+def notes_datetime(session, text):
+    """NotesDateTime for a watermark_text() string (or the LocalTime text older checkpoints hold)."""
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return session.CreateDateTime(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    date_time = session.CreateDateTime("Today")
+    # LSLocalTime is the settable one: hand it the same moment in this machine's time zone
+    date_time.LSLocalTime = moment.astimezone().replace(tzinfo=None)
+    return date_time
+
+
+def modified_documents(session, db, since_text=None):
+    """
+    Server-side query for the documents created, modified or deleted since the
+    high-water mark `since_text` (all documents when None).
+    Returns (collection, new high-water mark as ISO-8601 UTC text).
+    """
+    if since_text:
+        collection = db.GetModifiedDocuments(notes_datetime(session, since_text), DBMOD_DOC_DATA)
+    else:
+        collection = db.GetModifiedDocuments()
+    return collection, watermark_text(collection.UntilTime)
+
+
+def is_deletion_stub(doc):
+    """Deleted documents come back from GetModifiedDocuments as deletion stubs."""
+    try:
+        return bool(doc.IsDeleted) or not doc.IsValid
+    except Exception:
+        return False
+
+
+def split_deletions(collection):
+    """Walk a modified-documents collection once: (live UNIDs, deleted UNIDs)."""
+    live, deleted = [], []
+    doc = collection.GetFirstDocument()
+    while doc:
+        next_doc = collection.GetNextDocument(doc)
+        unid = doc.UniversalID
+        if unid:
+            (deleted if is_deletion_stub(doc) else live).append(unid)
+        doc = next_doc
+    return live, deleted
+
+
+def remove_outputs(paths):
+    """Remove previously exported document folders (or their symlinks)."""
+    for path in paths:
+        if os.path.islink(path):
+            os.unlink(path)
+        elif os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def tombstone_document(checkpoint, db_key, unid, sink=None, index=None):
+    """
+    Replace every exported copy of a deleted document with a tombstone file (or a
+    tombstone record when exporting to a record sink) and drop it from the checkpoint
+    and the search index.
+    Returns False if the document was never exported.
+    """
+    entry = checkpoint.get(db_key, unid)
+    if entry is None:
+        return False
+    if sink is not None:
+        sink.write_tombstone(unid)
+    if index is not None:
+        index.remove(unid)
+    detected = datetime.datetime.now().isoformat(timespec="seconds")
+    for path in entry.paths:
+        # Record sink files are listed as paths too; only folders get a tombstone file
+        if not os.path.lexists(path) or (os.path.isfile(path) and not os.path.islink(path)):
+            continue
+        remove_outputs([path])
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, TOMBSTONE_NAME), "w", encoding="utf-8") as f:
+            f.write(f"----- Deleted: {unid} -----\n")
+            f.write(f"Detected: {detected}\n")
+    checkpoint.forget(db_key, unid)
+    return True
@@ -0,0 +1,171 @@
+import logging
+import os
+import time
+from collections import namedtuple
+
+from com_lifetime import release
+from metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+# NotesItem.Type values; rich text items are the only ones that carry EmbeddedObjects
+RICHTEXT = 1
+NUMBERS = 768
+DATETIMES = 1024
+NAMES = 1074
+READERS = 1075
+AUTHORS = 1076
+ATTACHMENT = 1084
+TEXT = 1280
+
+ItemSnapshot = namedtuple("ItemSnapshot", ["name", "type", "values", "error"])
+
+
+class AttachmentRef:
+    """
+    An embedded object found while snapshotting; keeps the COM handle for ExtractFile,
+    and the rich text item it came from, since the handle is only valid while that is.
+    """
+
+    __slots__ = ("name", "handle", "item")
+
+    def __init__(self, name, handle, item=None):
+        self.name = name
+        self.handle = handle
+        self.item = item
+
+    def extract(self, path):
+        with run_metrics.phase("extract_attachment"):
+            self.handle.ExtractFile(path)
+        run_metrics.add("attachments")
+        run_metrics.add("bytes_written", os.path.getsize(path))
+
+    def size(self):
+        return self.handle.FileSize
+
+
+class DocumentSnapshot:
+    """
+    Every item of one document (name, type, values) read exactly once over COM.
+    Subject lookup, field dumps and attachment discovery all work from this copy,
+    so the document's Items collection is only walked a single time.
+    `com_calls` is the number of COM property reads/method calls the snapshot cost.
+    `thread` is the UNID heading the document's response thread, when an exporter
+    indexes threads (see threads.ThreadIndex).
+    """
+
+    def __init__(self, unid, items, attachments, com_calls=0):
+        self.unid = unid
+        self.items = items
+        self.attachments = attachments
+        self.com_calls = com_calls
+        self.thread = None
+        self._by_name = {}
+        for item in items:
+            self._by_name.setdefault(item.name.lower(), item)
+
+    @classmethod
+    def from_document(cls, doc, fields=None, attachments=True):
+        """
+        Snapshot `doc`. With `fields`, only those items are read (one GetFirstItem
+        each) instead of walking every item; attachments then come only from the
+        requested rich text items. `attachments=False` skips embedded objects entirely.
+        """
+        start = time.perf_counter()
+        calls = 0
+        try:
+            unid = doc.UniversalID or ""
+        except Exception:
+            unid = ""
+        calls += 1
+
+        if fields is None:
+            doc_items = doc.Items
+            calls += 1
+        else:
+            doc_items = []
+            for field in fields:
+                item = doc.GetFirstItem(field)
+                calls += 1
+                if item is not None:
+                    doc_items.append(item)
+
+        items = []
+        found_attachments = []
+        for item in doc_items:
+            name = item.Name
+            item_type = item.Type
+            calls += 2
+            try:
+                values, error = item.Values, None
+            except Exception as e:
+                values, error = None, str(e)
+            calls += 1
+            items.append(ItemSnapshot(name, item_type, values, error))
+
+            if item_type == RICHTEXT and attachments:
+                try:
+                    embedded_objects = item.EmbeddedObjects
+                    calls += 1
+                    found, cost = _read_embedded_objects(embedded_objects, item)
+                    found_attachments.extend(found)
+                    calls += cost
+                except Exception as e:
+                    logger.error("Error processing embedded objects in item '%s': %s", name, e)
+                    run_metrics.add("errors")
+                    found = ()
+                if found:
+                    # Kept alive by its attachments until they are extracted and dropped
+                    continue
+            # Values are copied
+            release(item)
+
+        run_metrics.observe("read_items", time.perf_counter() - start)
+        return cls(unid, items, found_attachments, calls)
+
+    def get(self, name, default=None):
+        """Values of the named item (case-insensitive), or `default` if absent."""
+        item = self._by_name.get(name.lower())
+        if item is None or item.values is None:
+            return default
+        return item.values
+
+    def first(self, name):
+        values = self.get(name)
+        if isinstance(values, (list, tuple)):
+            return values[0] if values else None
+        return values
+
+    def subject(self):
+        """Return 'Subject' field, or fallback to 'Form' if needed."""
+        subject = self.first("Subject")
+        if not subject:
+            form = self.first("Form")
+            subject = f"Form_{form}" if form else None
+        return subject or "UnnamedDocument"
+
+    def parent(self):
+        """UNID of the document this one responds to (its $Ref item), or None."""
+        return self.first("$Ref") or None
+
+
+def _read_embedded_objects(embedded_objects, item=None):
+    """Returns ([AttachmentRef, ...], com_calls) for a COM collection or a tuple."""
+    if not embedded_objects:
+        return [], 0
+    found = []
+    calls = 0
+    # If it's a COM collection (has Count)
+    if hasattr(embedded_objects, "Count"):
+        count = embedded_objects.Count
+        calls += 1
+        for i in range(1, count + 1):
+            embedded_obj = embedded_objects.Item(i)
+            found.append(AttachmentRef(embedded_obj.Name, embedded_obj, item))
+            calls += 2
+    # Else if it's a Python iterable (pywin32 hands back a tuple of objects)
+    elif hasattr(embedded_objects, "__iter__"):
+        for embedded_obj in embedded_objects:
+            found.append(AttachmentRef(embedded_obj.Name, embedded_obj, item))
+            calls += 1
+    return found, calls
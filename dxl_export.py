@@ -0,0 +1,264 @@
+"""
+Bulk ingestion through DXL instead of one COM call per item value.
+
+Notes writes a whole database (or any note collection) to a DXL file in a single
+DXLExporter.Process() call; `iter_dxl_documents` then streams that file through expat
+and yields the same DocumentSnapshots `DocumentSnapshot.from_document` builds over COM.
+Parsing needs no Notes session, so a saved DXL file can be extracted offline on any OS.
+Memory stays bounded by one document's items: attachment <filedata> is base64-decoded
+chunk by chunk straight into a spool file, and only complete documents are kept.
+
+    export_dxl(session, db, "library.dxl")
+    for snapshot in iter_dxl_documents("library.dxl", spool_dir):
+        ...
+"""
+import binascii
+import datetime
+import mmap
+import os
+import xml.parsers.expat
+from collections import deque
+
+from doc_snapshot import (ATTACHMENT, AUTHORS, DATETIMES, NAMES, NUMBERS, READERS, RICHTEXT, TEXT,
+                          DocumentSnapshot, ItemSnapshot)
+from metrics import run_metrics
+from pipeline import SpooledAttachment
+
+# Bytes read from the DXL file per expat feed, and characters expat hands over per callback
+CHUNK_SIZE = 1 << 20
+TEXT_BUFFER = 1 << 16
+# A Notes database starts with its DBHEADER signature; a DXL file with "<" (after a BOM)
+NSF_SIGNATURE = b"\x1a\x00"
+
+# DXL value element -> NotesItem.Type (text items are refined by their names/readers/authors flags)
+VALUE_TYPES = {
+    "text": TEXT, "textlist": TEXT,
+    "number": NUMBERS, "numberlist": NUMBERS,
+    "datetime": DATETIMES, "datetimelist": DATETIMES, "datetimepair": DATETIMES,
+    "richtext": RICHTEXT, "object": ATTACHMENT,
+}
+TEXT_FLAGS = (("authors", AUTHORS), ("readers", READERS), ("names", NAMES))
+# Rich text elements holding encoded images/objects rather than readable text
+BINARY_TAGS = frozenset(("gif", "jpeg", "png", "bmp", "notesbitmap", "cgm", "objectdata", "filedata"))
+
+
+def export_dxl(session, source, dxl_path):
+    """
+    Export `source` (a database, or a Note/DocumentCollection) to `dxl_path` in one
+    DXLExporter pass; for a database only its data documents are selected.
+    Notes streams the DXL to disk itself, so nothing large crosses COM.
+    """
+    if hasattr(source, "CreateNoteCollection"):
+        collection = source.CreateNoteCollection(False)
+        collection.SelectDocuments = True
+        collection.BuildCollection()
+        source = collection
+    if os.path.exists(dxl_path):
+        os.remove(dxl_path)
+    stream = session.CreateStream()
+    if not stream.Open(dxl_path, "UTF-8"):
+        raise Exception(f"Unable to open '{dxl_path}' for the DXL export")
+    try:
+        exporter = session.CreateDXLExporter()
+        exporter.OutputDOCTYPE = False
+        exporter.SetInput(source)
+        exporter.SetOutput(stream)
+        exporter.Process()
+    finally:
+        stream.Close()
+    return dxl_path
+
+
+def dxl_datetime(text):
+    """Parse a DXL datetime ("20200101T093000,00-05", or only a date or a time)."""
+    text = text.strip()
+    date_part, _, time_part = text.partition("T")
+    offset = None
+    for sign in "+-":
+        if sign in time_part:
+            time_part, _, zone = time_part.partition(sign)
+            hours, _, minutes = zone.partition(":")
+            if len(hours) > 2:
+                hours, minutes = hours[:2], hours[2:]
+            delta = datetime.timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+            offset = datetime.timezone(delta if sign == "+" else -delta)
+            break
+    seconds, _, hundredths = time_part.partition(",")
+    year, month, day = (int(date_part[:4]), int(date_part[4:6]), int(date_part[6:8])) if date_part else (1, 1, 1)
+    if seconds:
+        return datetime.datetime(year, month, day, int(seconds[:2]), int(seconds[2:4]), int(seconds[4:6] or 0),
+                                 int(hundredths or 0) * 10000, tzinfo=offset)
+    return datetime.datetime(year, month, day)
+
+
+def _value(kind, text):
+    if kind == "number":
+        try:
+            return float(text)
+        except ValueError:
+            return text
+    if kind == "datetime":
+        return dxl_datetime(text)
+    return text
+
+
+class Base64File:
+    """Writes base64 text to `path` as it arrives, decoding whole 4-character groups."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._pending = b""
+        self._file = open(path, "wb")
+
+    def write(self, text):
+        data = self._pending + text.encode("ascii").translate(None, b" \t\r\n")
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        if usable:
+            decoded = binascii.a2b_base64(data[:usable])
+            self._file.write(decoded)
+            self.size += len(decoded)
+
+    def close(self):
+        if self._pending:
+            raise ValueError(f"Truncated base64 data for '{self.path}'")
+        self._file.close()
+
+
+class DxlReader:
+    """
+    Incremental DXL parser: `feed` bytes in, collect finished DocumentSnapshots from
+    `documents`. Attachments are decoded into `spool_dir` as <UNID>-<n> files and come
+    back as SpooledAttachments, so the writers place them like pipelined extractions.
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self.documents = deque()
+        self._parser = xml.parsers.expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.buffer_size = TEXT_BUFFER
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._characters
+        self._document = None
+        self._item = None
+        self._text = None
+        self._binary = 0
+        self._blob = None
+
+    def feed(self, data, final=False):
+        self._parser.Parse(data, final)
+
+    def _start(self, tag, attrs):
+        if tag == "document":
+            self._document = {"unid": "", "items": [], "attachments": []}
+            return
+        document = self._document
+        if document is None:
+            return
+        if tag == "noteinfo" and self._item is None:
+            document["unid"] = attrs.get("unid", "")
+        elif tag == "item":
+            item_type = None
+            for flag, flagged_type in TEXT_FLAGS:
+                if attrs.get(flag) == "true":
+                    item_type = flagged_type
+                    break
+            self._item = {"name": attrs.get("name", ""), "type": item_type, "values": [], "error": None}
+        elif self._item is None:
+            return
+        elif self._item["type"] == RICHTEXT:
+            if tag in BINARY_TAGS:
+                self._binary += 1
+        elif tag in VALUE_TYPES:
+            if self._item["type"] is None:
+                self._item["type"] = VALUE_TYPES[tag]
+            if tag == "richtext":
+                self._item["type"] = RICHTEXT
+                self._text = []
+            elif tag in ("text", "number", "datetime"):
+                self._text = []
+        elif tag == "file":
+            self._file_name = attrs.get("name", "")
+        elif tag == "filedata" and self._item["type"] == ATTACHMENT:
+            unid = document["unid"] or "unknown"
+            path = os.path.join(self.spool_dir, f"{unid}-{len(document['attachments'])}")
+            self._blob = Base64File(path)
+        elif tag == "rawitemdata":
+            self._item["error"] = f"Unsupported DXL item data (type {attrs.get('type', '?')})"
+
+    def _characters(self, data):
+        if self._blob is not None:
+            self._blob.write(data)
+        elif self._text is not None and not self._binary:
+            self._text.append(data)
+
+    def _end(self, tag):
+        document = self._document
+        if document is None:
+            return
+        item = self._item
+        if tag == "document":
+            self.documents.append(DocumentSnapshot(document["unid"], document["items"], document["attachments"]))
+            self._document = None
+        elif item is None:
+            return
+        elif tag == "item":
+            if item["type"] == RICHTEXT:
+                item["values"] = ["".join(self._text).strip("\n")]
+                self._text = None
+            # $FILE items only carry the attachments, which the snapshot lists on their own
+            # (as DocumentSnapshot.from_document does), so they aren't kept as items
+            if item["type"] != ATTACHMENT or item["error"] is not None:
+                values = tuple(item["values"]) if item["error"] is None else None
+                document["items"].append(ItemSnapshot(item["name"], item["type"], values, item["error"]))
+            self._item = None
+        elif item["type"] == RICHTEXT:
+            if tag in BINARY_TAGS:
+                self._binary -= 1
+            elif tag == "par":
+                self._text.append("\n")
+        elif tag in ("text", "number", "datetime") and self._text is not None:
+            try:
+                item["values"].append(_value(tag, "".join(self._text)))
+            except ValueError as e:
+                item["error"] = f"Invalid DXL {tag} value: {e}"
+            self._text = None
+        elif tag == "filedata" and self._blob is not None:
+            blob, self._blob = self._blob, None
+            blob.close()
+            document["attachments"].append(SpooledAttachment(self._file_name, blob.path))
+            run_metrics.add("attachments")
+            run_metrics.add("bytes_written", blob.size)
+
+
+def check_dxl(head, dxl_path):
+    """Refuse anything that isn't DXL, with a pointer to the fix for NSF databases."""
+    head = bytes(head).lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith(NSF_SIGNATURE):
+        raise ValueError(f"'{dxl_path}' is an NSF database, not a DXL export. The NSF format can only be "
+                         f"read through Notes: export it once with --engine dxl where a Notes client is "
+                         f"installed and extract offline from the .dxl file it writes.")
+    if not head.startswith(b"<"):
+        raise ValueError(f"'{dxl_path}' is not a DXL export")
+
+
+def iter_dxl_documents(dxl_path, spool_dir, chunk_size=CHUNK_SIZE):
+    """
+    Yield a DocumentSnapshot per <document> in the DXL file. The file is memory-mapped
+    and handed to expat `chunk_size` bytes at a time, without copying it into Python.
+    """
+    with open(dxl_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"'{dxl_path}' is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, memoryview(data) as view:
+            check_dxl(view[:64], dxl_path)
+            os.makedirs(spool_dir, exist_ok=True)
+            reader = DxlReader(spool_dir)
+            size = len(view)
+            for offset in range(0, size, chunk_size):
+                reader.feed(view[offset:offset + chunk_size], final=offset + chunk_size >= size)
+                while reader.documents:
+                    yield reader.documents.popleft()
@@ -1,26 +1,31 @@
-import win32com.client
+from db_crawler import build_catalog, format_doc_count
+from session_pool import notes_session_factory
 
 # Configuration
 LOTUS_PASSWORD = ""  # Provide your Lotus Notes password if required
+COUNT_DOCUMENTS = True  # Counting reads every database's full document collection
 
 def list_nsf_databases():
     """Enumerates all available NSF databases on the Lotus Notes server."""
     
     # Initialize Lotus Notes session
-    session = win32com.client.Dispatch("Lotus.NotesSession")
-    session.Initialize(LOTUS_PASSWORD)  # Provide password if required
+    session = notes_session_factory(LOTUS_PASSWORD)
 
     # Get current server
     server = session.CurrentDatabase.Server
 
-    # Get database directory and list all databases
-    db_directory = session.GetDbDirectory(server)
-    db_list = db_directory.ListDbs()
+    # Catalog every database in the server's directory, largest first
+    catalog = sorted(build_catalog(session, server, COUNT_DOCUMENTS), key=lambda entry: entry.size, reverse=True)
 
     # Print available databases
     print("\nAvailable NSF Databases on Server:")
-    for db in db_list:
-        print(f"- Title: {db.Title}\n  File Path: {db.FilePath}\n")
+    for entry in catalog:
+        print(f"- Title: {entry.title}\n  File Path: {entry.file_path}")
+        if entry.error:
+            print(f"  Error: {entry.error}\n")
+        else:
+            print(f"  Size: {entry.size / 1048576:.1f} MB, Documents: {format_doc_count(entry.doc_count)}\n")
+    return catalog
 
 # Run the function
 try:
@@ -1,44 +1,42 @@
-import win32com.client
+import argparse
+import functools
+import logging
 import os
-import re
+import shutil
+import time
+
+from blob_store import BLOB_MODES, BlobStore
+from com_lifetime import release
+from com_trace import trace_session_factory
+from doc_snapshot import DocumentSnapshot
+from dxl_export import export_dxl, iter_dxl_documents
+from field_serializer import document_text
+from metrics import add_metrics_arguments, run_metrics, setup_from_args
+from path_planner import PathPlanner, sanitize_name
+from placement_store import LINK_MODES, PlacementStore
+from session_pool import collect_unids, notes_session_factory, open_database, release_session, run_sharded
+from sinks import SINK_KINDS, open_sink
+from throttle import Throttle, add_throttle_arguments, throttle_from_args
+
+logger = logging.getLogger(__name__)
 
 # Maximum length for folder names
 MAX_FOLDER_NAME_LENGTH = 100
 
 def sanitize_folder_name(name, max_length=MAX_FOLDER_NAME_LENGTH):
     """Sanitize and truncate folder names to be Windows-safe."""
-    if not name or not name.strip():
-        return "UnnamedDocument"
-    # Remove forbidden characters for Windows
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
-    # Replace multiple spaces or underscores with a single underscore
-    name = re.sub(r'[\s_]+', '_', name)
-    # Truncate to max_length and strip leading/trailing underscores
-    return name[:max_length].strip('_')
-
-def get_document_subject(doc):
-    """Retrieve the subject of a document, falling back to form name if missing."""
-    subject = None
-    for item in doc.Items:
-        if item.Name.lower() == "subject":
-            subject = item.Values[0] if item.Values else None
-            break
-    if not subject:
-        for item in doc.Items:
-            if item.Name.lower() == "form":
-                subject = f"Form_{item.Values[0]}" if item.Values else None
-                break
-    return subject or "UnnamedDocument"
-
-def get_document_folder_paths(doc):
+    return sanitize_name(name, max_length, "UnnamedDocument")
+
+def get_document_folder_paths(snapshot, raw=False):
     """
     Returns a list of folder paths (each as a list of folder parts) for a document,
     based on its hidden "$Folders" field. If none exist, returns a single path for "Uncategorized".
+    With raw=True the parts are returned unsanitized (for record sinks and the folder planner).
     """
-    try:
-        folder_names = doc.GetItemValue("$Folders")
-    except Exception:
-        folder_names = []
+    return folder_paths_of(snapshot.get("$Folders", []), raw)
+
+def folder_paths_of(folder_names, raw=False):
+    """Folder paths (lists of parts) for a document's "$Folders" values."""
     if not folder_names:
         folder_names = ["Uncategorized"]
 
@@ -47,97 +45,274 @@ def get_document_folder_paths(doc):
         # If the folder name includes hierarchy delimiters (e.g. backslash), split it
         parts = folder.split("\\")
         # Sanitize each part and ignore empty parts
-        sanitized_parts = [sanitize_folder_name(part) for part in parts if part.strip()]
+        sanitized_parts = [part if raw else sanitize_folder_name(part) for part in parts if part.strip()]
         if sanitized_parts:
             folder_paths.append(sanitized_parts)
         else:
             folder_paths.append(["Uncategorized"])
     return folder_paths
 
-def extract_nsf_data_all_documents(password, nsf_path, output_dir="output"):
+def collect_folder_index(collection):
+    """
+    Walk a document collection once, reading only each UniversalID and "$Folders".
+    Returns (UNIDs, raw folder paths of every document), for planning the folder tree.
+    """
+    unids = []
+    folder_paths = []
+    doc = collection.GetFirstDocument()
+    while doc:
+        next_doc = collection.GetNextDocument(doc)
+        unid = doc.UniversalID
+        if unid:
+            unids.append(unid)
+            folder_paths.extend(folder_paths_of(doc.GetItemValue("$Folders"), raw=True))
+        release(doc)
+        doc = next_doc
+    return unids, folder_paths
+
+def export_document(doc, planner, store, sink=None, blobs=None):
+    """
+    Writes one document (fields and attachments) into the first folder listed in its
+    "$Folders" field and links it into the others through the placement store.
+    The document's items are read once and reused for every folder.
+    Returns (UniversalID, COM calls spent reading the document, number of placements).
+    """
+    return write_document(DocumentSnapshot.from_document(doc), planner, store, sink, blobs)
+
+def write_document(snapshot, planner, store, sink=None, blobs=None):
+    """
+    Writes one snapshot (read over COM or parsed from DXL) into its folders.
+    With a record sink the document becomes a single record holding all its folders.
+    With a blob store, attachments are stored once per distinct content.
+    """
+    if blobs is not None:
+        blobs.wrap(snapshot)
+    if sink is not None:
+        folder_paths = get_document_folder_paths(snapshot, raw=True)
+        sink.write_document(snapshot, folder_paths)
+        return snapshot.unid, snapshot.com_calls, len(folder_paths)
+
+    # Determine the folder paths for this document (raw; the planner sanitizes them once)
+    folder_paths = get_document_folder_paths(snapshot, raw=True)
+    # Get the subject to use as the document folder name
+    subject = snapshot.subject()
+    doc_id = snapshot.unid[:8] or "unknown"  # Shortened for uniqueness
+    safe_subject = sanitize_folder_name(f"{subject}_{doc_id}")
+    text = None
+
+    # For each folder path the document belongs to, create the full directory structure
+    for folder_parts in folder_paths:
+        # Full path (e.g., output/Folder/Subfolder/...), created the first time it is seen
+        folder_path_full = planner.folder(folder_parts)
+        # Already extracted into another folder: link it instead of extracting again
+        if store.place(snapshot.unid, folder_path_full):
+            continue
+        # Create a folder for the document within that folder
+        doc_folder = os.path.join(folder_path_full, safe_subject)
+        with run_metrics.phase("makedirs"):
+            os.makedirs(doc_folder, exist_ok=True)
+
+        # Write document fields to a text file, rendered once for every folder
+        if text is None:
+            text = document_text(snapshot)
+        text_file_path = os.path.join(doc_folder, "document.txt")
+        with run_metrics.phase("write_text"), open(text_file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            run_metrics.add("bytes_written", f.tell())
+        logger.debug("Saved document to: %s (%d COM calls)", text_file_path, snapshot.com_calls)
+
+        # Extract attachments, if any
+        for attachment in snapshot.attachments:
+            attachment_path = os.path.join(doc_folder, sanitize_folder_name(attachment.name))
+            try:
+                attachment.extract(attachment_path)
+                logger.debug("Extracted attachment to: %s", attachment_path)
+            except Exception as e:
+                logger.error("Failed to extract attachment in document %s: %s", doc_id, e)
+                run_metrics.add("errors")
+        store.record(snapshot.unid, doc_folder)
+    return snapshot.unid, snapshot.com_calls, len(folder_paths)
+
+def extract_nsf_data_all_documents(password, nsf_path, output_dir="output", workers=1,
+                                   session_factory=notes_session_factory, use_processes=False,
+                                   link_mode="hardlink", sink_kind="folder", blob_mode=None, engine="com",
+                                   dxl_path=None, throttle=None, keep_dxl=False):
     """
     Extracts all documents from the NSF using db.AllDocuments.
     For each document, it uses the "$Folders" field to determine folder membership.
     Documents are placed in folder hierarchies based on their folder names.
+    With workers > 1 the UNIDs are split across that many workers, each with its own session.
+    A document in several folders is extracted once; `link_mode` picks how the other
+    folders get it (hardlink, symlink, copy or a manifest entry).
+    `sink_kind` "jsonl" or "parquet" streams one record per document instead; "tar" or
+    "zip" appends each document and its attachments to rolling archive shards.
+    `blob_mode` de-duplicates attachments by content hash (see blob_store.BLOB_MODES).
+    `engine` "dxl" has Notes export the whole database as DXL in one call and parses
+    that file instead of reading every item over COM (workers are not used then); the
+    file is written beside `output_dir` and removed afterwards unless `keep_dxl` is set.
+    With `dxl_path` (a DXL file saved by an earlier export) no Notes session is opened
+    at all, so the export can run offline, e.g. on a Linux batch node.
+    A `throttle` (see throttle.Throttle) keeps the COM reads within its latency
+    target, rate limit and quiet hours.
     """
-    session = win32com.client.Dispatch("Lotus.NotesSession")
-    session.Initialize(password)
-
-    db = session.GetDatabase("", nsf_path)
-    if not db.IsOpen:
-        db.Open()
+    if sink_kind != "folder" and use_processes:
+        raise ValueError("Record sinks are shared between workers; use threads instead of processes.")
+    throttle = throttle or Throttle()
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    store = PlacementStore(output_dir, link_mode)
+    sink = open_sink(sink_kind, output_dir, sanitize_folder_name)
+    blobs = BlobStore(output_dir, blob_mode) if blob_mode else None
+    planner = PathPlanner(output_dir, sanitize_folder_name)
+
+    session = db = None
+    try:
+        if dxl_path is None:
+            session = session_factory(password)
+            db = open_database(session, nsf_path)
+        if engine == "dxl" and dxl_path is None:
+            exported = export_via_dxl(session, db, nsf_path, output_dir, planner, store, sink, blobs,
+                                      throttle, keep_dxl)
+        elif dxl_path is not None:
+            exported = write_dxl_documents(dxl_path, planner, store, sink, blobs)
+        else:
+            exported = export_over_com(password, nsf_path, db, planner, store, sink, blobs, workers,
+                                       session_factory, use_processes, throttle)
+    finally:
+        if sink is not None:
+            sink.close()
+        run_metrics.stop()
+        if session is not None:
+            release_session(session_factory, session, db)
+    report_export(exported, link_mode, blobs, planner)
+    throttle.report()
 
+def export_over_com(password, nsf_path, db, planner, store, sink, blobs, workers, session_factory,
+                    use_processes, throttle):
+    """Read every document of db.AllDocuments over COM, on this thread or across `workers`."""
     collection = db.AllDocuments
-    doc = collection.GetFirstDocument()
-    doc_counter = 0
+    run_metrics.start(total=collection.Count)
 
+    if workers > 1:
+        if sink is None:
+            # The whole tree is planned before any worker starts, so collision suffixes come
+            # out the same whatever order (or process) the documents are written in. The
+            # "$Folders" are read in the pass that collects the UNIDs for sharding anyway.
+            unids, folder_paths = collect_folder_index(collection)
+            planner.plan(folder_paths)
+            print(f"[DEBUG] Created {planner.makedirs()} folders.")
+        else:
+            unids = collect_unids(collection)
+        return run_sharded(password, nsf_path, unids,
+                           functools.partial(export_document, planner=planner,
+                                             store=store, sink=sink, blobs=blobs),
+                           workers, session_factory=session_factory,
+                           use_processes=use_processes, throttle=throttle)
+
+    # On this thread the walk meets the folders in the same order every run, so the
+    # planner places each one as it is first seen (PathPlanner.folder)
+    exported = []
+    doc = collection.GetFirstDocument()
     while doc:
-        # Get the next document pointer before processing the current document
-        next_doc = collection.GetNextDocument(doc)
+        with throttle.slot():
+            # Get the next document pointer before processing the current document
+            with run_metrics.phase("open_doc"), throttle.measure():
+                next_doc = collection.GetNextDocument(doc)
+            exported.append(export_document(doc, planner, store, sink, blobs))
+        release(doc)
+        run_metrics.add("documents")
+        doc = next_doc  # Move to the next document in the collection
+    return exported
 
-        # Determine the folder paths for this document
-        folder_paths = get_document_folder_paths(doc)
-        # Get the subject to use as the document folder name
-        subject = get_document_subject(doc)
-        try:
-            doc_id = doc.UniversalID[:8]  # Shortened for uniqueness
-        except Exception:
-            doc_id = "unknown"
-        safe_subject = sanitize_folder_name(f"{subject}_{doc_id}")
-
-        # For each folder path the document belongs to, create the full directory structure
-        for folder_parts in folder_paths:
-            # Build the full path (e.g., output/Folder/Subfolder/...)
-            folder_path_full = os.path.join(output_dir, *folder_parts)
-            os.makedirs(folder_path_full, exist_ok=True)
-            # Create a folder for the document within that folder
-            doc_folder = os.path.join(folder_path_full, safe_subject)
-            os.makedirs(doc_folder, exist_ok=True)
+def export_via_dxl(session, db, nsf_path, output_dir, planner, store, sink, blobs, throttle, keep_dxl=False):
+    """
+    Export the database to DXL beside `output_dir` (one throttle slot for the whole
+    export, so quiet hours and the rate limit still apply) and write its documents.
+    The DXL file is removed afterwards unless `keep_dxl` asks to keep it for offline runs.
+    """
+    with throttle.slot():
+        dxl_path = export_database_dxl(session, db, nsf_path, output_dir)
+    try:
+        return write_dxl_documents(dxl_path, planner, store, sink, blobs)
+    finally:
+        if keep_dxl:
+            print(f"[INFO] DXL export kept at {dxl_path} (use it with --from-dxl).")
+        else:
+            os.remove(dxl_path)
 
-            # Write document fields to a text file
-            text_file_path = os.path.join(doc_folder, "document.txt")
-            with open(text_file_path, "w", encoding="utf-8") as f:
-                f.write(f"----- Document: {subject} ({doc_id}) -----\n")
-                for item in doc.Items:
-                    try:
-                        # Convert the item's values to string safely
-                        f.write(f"{item.Name}: {str(item.Values)}\n")
-                    except Exception as e:
-                        f.write(f"{item.Name}: <Error reading value: {e}>\n")
-                f.write("--------------------\n")
-            print(f"Saved document to: {text_file_path}")
-
-            # Extract attachments, if any
-            for item in doc.Items:
-                if hasattr(item, "EmbeddedObjects"):
-                    embedded_objects = item.EmbeddedObjects
-                    if not embedded_objects:
-                        continue
-                    try:
-                        if hasattr(embedded_objects, "Count"):
-                            for i in range(1, embedded_objects.Count + 1):
-                                embedded_obj = embedded_objects.Item(i)
-                                attachment_name = sanitize_folder_name(embedded_obj.Name)
-                                attachment_path = os.path.join(doc_folder, attachment_name)
-                                embedded_obj.ExtractFile(attachment_path)
-                                print(f"Extracted attachment to: {attachment_path}")
-                        elif hasattr(embedded_objects, "__iter__"):
-                            for embedded_obj in embedded_objects:
-                                attachment_name = sanitize_folder_name(embedded_obj.Name)
-                                attachment_path = os.path.join(doc_folder, attachment_name)
-                                embedded_obj.ExtractFile(attachment_path)
-                                print(f"Extracted attachment to: {attachment_path}")
-                    except Exception as e:
-                        print(f"Failed to extract attachment in document {doc_id}: {e}")
-
-        doc_counter += 1
-        doc = next_doc  # Move to the next document in the collection
+def export_database_dxl(session, db, nsf_path, output_dir):
+    """Export the database to <output_dir>-<database>.dxl, beside the output rather than in it."""
+    name = f"{os.path.basename(os.path.abspath(output_dir))}-{os.path.splitext(os.path.basename(nsf_path))[0]}.dxl"
+    dxl_path = os.path.join(os.path.dirname(os.path.abspath(output_dir)), name)
+    start = time.perf_counter()
+    export_dxl(session, db, dxl_path)
+    print(f"[INFO] DXL export written to {dxl_path} in {time.perf_counter() - start:.1f}s")
+    return dxl_path
 
-    print(f"Extracted {doc_counter} documents.")
+def write_dxl_documents(dxl_path, planner, store, sink, blobs):
+    """
+    Write every document parsed from a DXL file; attachments are decoded into a
+    spool directory and moved into place. Needs no Notes session.
+    """
+    spool_dir = os.path.join(planner.root, ".dxl-spool")
+    run_metrics.start()
+    exported = []
+    try:
+        for snapshot in iter_dxl_documents(dxl_path, spool_dir):
+            exported.append(write_document(snapshot, planner, store, sink, blobs))
+            run_metrics.add("documents")
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+    return exported
+
+def report_export(exported, link_mode, blobs, planner):
+    com_calls = sum(calls for _, calls, _ in exported)
+    placements = sum(count for _, _, count in exported)
+    print(f"Extracted {len(exported)} documents.")
+    print(f"Placements: {placements} ({placements - len(exported)} linked as '{link_mode}' "
+          f"instead of re-extracted).")
+    if exported:
+        print(f"COM calls: {com_calls} total, {com_calls / len(exported):.1f} per document.")
+    planner.report()
+    if blobs is not None:
+        blobs.report()
 
 if __name__ == '__main__':
-    # Replace with your actual password and NSF file path
-    extract_nsf_data_all_documents("", "FND-CHHAD-Reference-Libraryl.nsf")
+    parser = argparse.ArgumentParser(description="Extract all NSF documents into their $Folders hierarchy.")
+    parser.add_argument("nsf_path", nargs="?", default="FND-CHHAD-Reference-Libraryl.nsf")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel workers, each with its own NotesSession.")
+    parser.add_argument("--processes", action="store_true",
+                        help="Use worker processes instead of threads.")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="hardlink",
+                        help="How documents in several folders are placed after the first extraction.")
+    parser.add_argument("--sink", choices=SINK_KINDS, default="folder",
+                        help="Output format: a folder per document, one JSONL/Parquet file for the database, "
+                             "or rolling tar/zip shards indexed by UNID.")
+    parser.add_argument("--blobs", choices=BLOB_MODES,
+                        help="Store attachments once by content hash under blobs/ and hardlink, copy or only reference them.")
+    parser.add_argument("--engine", choices=("com", "dxl"), default="com",
+                        help="Read items over COM, or export the database to DXL once and parse that.")
+    parser.add_argument("--keep-dxl", action="store_true",
+                        help="With --engine dxl, keep the DXL export (beside the output directory) for --from-dxl runs.")
+    parser.add_argument("--from-dxl", metavar="DXL_PATH",
+                        help="Extract offline from a saved DXL export (no Notes client needed); nsf_path is ignored.")
+    parser.add_argument("--trace", metavar="PREFIX",
+                        help="Trace every COM call; writes PREFIX.txt (cost report) and PREFIX.folded (flamegraph).")
+    add_throttle_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_from_args(args)
+    session_factory, tracer = trace_session_factory(args.trace)
+    try:
+        extract_nsf_data_all_documents(args.password, args.nsf_path, args.output_dir,
+                                       workers=args.workers, use_processes=args.processes,
+                                       link_mode=args.link_mode, sink_kind=args.sink, blob_mode=args.blobs,
+                                       engine=args.engine, dxl_path=args.from_dxl, keep_dxl=args.keep_dxl,
+                                       throttle=throttle_from_args(args), session_factory=session_factory)
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace)
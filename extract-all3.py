@@ -1,6 +1,27 @@
-import win32com.client
+import argparse
+import functools
 import os
-import re
+import shutil
+from collections import Counter
+
+from blob_store import BLOB_MODES, BlobStore
+from checkpoint import open_checkpoint
+from com_lifetime import add_lifetime_arguments, release, watchdog_from_args
+from com_trace import trace_session_factory
+from delta_export import (is_deletion_stub, modified_documents, remove_outputs,
+                          split_deletions, tombstone_document)
+from field_serializer import document_text
+from fts_index import open_index
+from metrics import add_metrics_arguments, run_metrics, setup_from_args
+from path_planner import PathPlanner, sanitize_name
+from pipeline import QUEUE_SIZE, WRITERS, Pipeline, spool_attachments
+from placement_store import LINK_MODES, PlacementStore
+from selection import add_selection_arguments, select_documents, selection_from_args, snapshot_document
+from session_pool import collect_unids, notes_session_factory, open_database, release_session, run_sharded
+from throttle import Throttle, add_throttle_arguments, throttle_from_args
+from sinks import SINK_KINDS, open_sink
+from threads import THREAD_MODES, THREADS_NAME, build_thread_index
+from view_categories import gather_view_categories
 
 NSF_PATH = "FND-CHHAD-Reference-Libraryl.nsf"
 LOTUS_PASSWORD = ""  # If needed
@@ -11,184 +32,454 @@ OUTPUT_DIR = "output_blended_debug"
 MAX_FOLDER_NAME_LENGTH = 100
 
 def sanitize_folder_name(name, max_length=MAX_FOLDER_NAME_LENGTH):
-    if not name or not name.strip():
-        return "UnnamedDocument"
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
-    name = re.sub(r'[\s_]+', '_', name)
-    return name[:max_length].strip('_')
-
-def get_document_subject(doc):
-    subject = None
-    for item in doc.Items:
-        if item.Name.lower() == "subject":
-            subject = item.Values[0] if item.Values else None
-            break
-    if not subject:
-        for item in doc.Items:
-            if item.Name.lower() == "form":
-                subject = f"Form_{item.Values[0]}" if item.Values else None
-                break
-    return subject or "UnnamedDocument"
-
-def extract_document(doc, folder_path):
-    subject = get_document_subject(doc)
-    try:
-        doc_id = doc.UniversalID[:8]
-    except Exception:
-        doc_id = "unknown"
+    return sanitize_name(name, max_length, "UnnamedDocument")
+
+def render_document(snapshot):
+    """Folder name and document.txt contents for a snapshot (no COM or disk access)."""
+    doc_id = snapshot.unid[:8] or "unknown"
+    return sanitize_folder_name(f"{snapshot.subject()}_{doc_id}"), document_text(snapshot)
 
-    doc_folder_name = sanitize_folder_name(f"{subject}_{doc_id}")
+def extract_document(snapshot, folder_path, store=None, rendered=None):
+    """Write the document folder under `folder_path` and return its path."""
+    # Already extracted under another category: link it instead of extracting again
+    placed = store.place(snapshot.unid, folder_path) if store is not None else None
+    if placed:
+        return placed
+
+    doc_folder_name, text = rendered or render_document(snapshot)
     doc_folder_path = os.path.join(folder_path, doc_folder_name)
-    os.makedirs(doc_folder_path, exist_ok=True)
+    with run_metrics.phase("makedirs"):
+        os.makedirs(doc_folder_path, exist_ok=True)
 
     # Write fields
     text_file_path = os.path.join(doc_folder_path, "document.txt")
-    with open(text_file_path, "w", encoding="utf-8") as f:
-        f.write(f"----- Document: {subject} ({doc_id}) -----\n")
-        for item in doc.Items:
-            try:
-                f.write(f"{item.Name}: {item.Values}\n")
-            except Exception as e:
-                f.write(f"{item.Name}: <Error reading value: {e}>\n")
-        f.write("--------------------\n")
+    with run_metrics.phase("write_text"), open(text_file_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        run_metrics.add("bytes_written", f.tell())
 
     # Attachments
-    for item in doc.Items:
-        if hasattr(item, "EmbeddedObjects"):
-            embedded_objects = item.EmbeddedObjects
-            if not embedded_objects:
-                continue
-            if hasattr(embedded_objects, "Count"):
-                for i in range(1, embedded_objects.Count + 1):
-                    embedded_obj = embedded_objects.Item(i)
-                    attachment_name = sanitize_folder_name(embedded_obj.Name)
-                    attachment_path = os.path.join(doc_folder_path, attachment_name)
-                    embedded_obj.ExtractFile(attachment_path)
-
-def gather_view_categories(db, view_name):
+    for attachment in snapshot.attachments:
+        attachment_name = sanitize_folder_name(attachment.name)
+        attachment_path = os.path.join(doc_folder_path, attachment_name)
+        attachment.extract(attachment_path)
+
+    if store is not None:
+        store.record(snapshot.unid, doc_folder_path)
+    return doc_folder_path
+
+def document_category_paths(snapshot, doc_id_to_paths):
+    """
+    Raw (unsanitized) category paths for a document: the view-based paths if the view
+    listed it, otherwise its 'Category' field. Returns ("view" or "fallback", paths).
+    """
+    # Some docs might not have a valid UniversalID
+    # but that's rare unless they are design docs.
+    doc_id_full = snapshot.unid or "UNKNOWN_UNID"
+
+    # If doc ID is in our dictionary, use the view-based paths
+    cat_path_list = doc_id_to_paths.get(doc_id_full)
+    # cat_path_list is a list of category paths, e.g. [ ["CatA"], ["CatB","SubB"] ]
+    if cat_path_list:
+        return "view", [[x for x in cat_path if x.strip()] for cat_path in cat_path_list]
+
+    # 3) Fallback to doc's 'Category' field (also used when the view gave an empty path)
+    category_values = snapshot.get("Category")
+    if not category_values:
+        category_values = ["Uncategorized"]
+    category_paths = []
+    for cat in category_values:
+        cat = cat.strip() or "Uncategorized"
+        parts = [p for p in cat.split("\\") if p.strip()]
+        category_paths.append(parts or ["Uncategorized"])
+    return "fallback", category_paths
+
+def category_folders(planner, category_paths):
+    """Output folder for each raw category path, from the precomputed folder tree."""
+    return [planner.folder(parts) for parts in category_paths]
+
+def parent_folders(snapshot, store):
+    """The parent's document folder, to nest a response in; empty if the parent wasn't extracted."""
+    parent = snapshot.parent()
+    folder = store.canonical(parent) if parent and store is not None else None
+    return [folder] if folder else []
+
+def view_category_paths(doc_id_to_paths):
+    """Every distinct category path of the view map, as document_category_paths returns them."""
+    return {tuple(x for x in cat_path if x.strip())
+            for cat_path_list in doc_id_to_paths.values() for cat_path in cat_path_list}
+
+def check_blended_document(doc, checkpoint=None, db_key=None, sink=None, index=None):
+    """
+    Checkpoint pre-check, before any item is read. Returns (result, LastModified,
+    previous output paths); `result` is set when there is nothing to export because
+    the document is unchanged ("skipped") or was deleted and got tombstoned.
+    """
+    if checkpoint is None:
+        return None, None, []
+    unid = doc.UniversalID
+    if is_deletion_stub(doc):
+        tombstone_document(checkpoint, db_key, unid, sink, index)
+        return ("deleted", 2, 0), None, []
+    last_modified = str(doc.LastModified)
+    previous = checkpoint.get(db_key, unid)
+    if previous is None:
+        return None, last_modified, []
+    if previous.last_modified == last_modified:
+        return ("skipped", 3, 0), last_modified, []
+    return None, last_modified, previous.paths
+
+def write_blended_document(snapshot, category_paths, folder_paths, store=None, checkpoint=None,
+                           db_key=None, last_modified=None, sink=None, rendered=None, index=None):
+    """Write the document into each category folder (or the record sink), index it and mark it done."""
+    if sink is not None:
+        paths = [sink.write_document(snapshot, category_paths)]
+    else:
+        paths = []
+        for folder_path in folder_paths:
+            paths.append(extract_document(snapshot, folder_path, store, rendered))
+
+    if index is not None:
+        index.add(snapshot, category_paths, paths)
+    if checkpoint is not None and snapshot.unid:
+        checkpoint.mark(db_key, snapshot.unid, last_modified, paths,
+                        [attachment.name for attachment in snapshot.attachments])
+
+def export_blended_document(doc, doc_id_to_paths, planner, store=None, checkpoint=None, db_key=None,
+                            sink=None, blobs=None, index=None, selection=None, threads=None, nested=False):
     """
-    Build a dict: doc_id -> [ [catPath1], [catPath2], ... ]
-    Each catPath is a list of category strings.
+    Extract one document under its view-based category paths, falling back to
+    its 'Category' field. Returns ("view", "fallback", "skipped" or "deleted", COM calls
+    spent on the document, number of category placements).
+    With a checkpoint, documents already exported with the same LastModified are
+    skipped before any of their items are read, a modified document replaces its
+    previous output, and a deletion stub tombstones it.
+    With a record sink, the document becomes one record instead of folders.
+    With a blob store, attachments are stored once per distinct content.
+    With a search index, the document's text is indexed next to its output paths.
+    With a selection, only its projected fields (and attachments, if any) are read.
+    With a thread index, the document records its thread; `nested` extracts a response
+    into its parent's folder instead of its own categories.
     """
-    doc_id_to_paths = {}
-
-    print(f"\n[DEBUG] Attempting to open view: '{view_name}'")
-    view = db.GetView(view_name)
-    if not view:
-        print(f"[DEBUG] View '{view_name}' not found. Returning empty mapping.")
-        return doc_id_to_paths
-
-    all_entries = view.AllEntries
-    entry_count = 0
-
-    entry = all_entries.GetFirstEntry()
-    current_path = []
-    while entry:
-        entry_count += 1
-        next_entry = all_entries.GetNextEntry(entry)
-
-        if entry.IsCategory:
-            cat_name = entry.ColumnValues[0] or "Uncategorized"
-            # Adjust current_path based on the category level
-            while len(current_path) >= entry.Level:
-                current_path.pop()
-            current_path.append(cat_name)
-
-        elif entry.IsDocument:
-            doc = entry.Document
-            if doc is not None:
-                uid = doc.UniversalID
-                if uid:
-                    if uid not in doc_id_to_paths:
-                        doc_id_to_paths[uid] = []
-                    doc_id_to_paths[uid].append(list(current_path))  # copy current category path
-
-        entry = next_entry
-
-    print(f"[DEBUG] View '{view_name}' opened. Entries found: {entry_count}")
-    print(f"[DEBUG] Documents found in this view: {len(doc_id_to_paths)} unique doc IDs.\n")
-    return doc_id_to_paths
-
-def blended_export(password, nsf_path, view_name, output_dir="output"):
-    session = win32com.client.Dispatch("Lotus.NotesSession")
-    session.Initialize(password)
-
-    db = session.GetDatabase("", nsf_path)
-    if not db.IsOpen:
-        raise Exception(f"Unable to open NSF at '{nsf_path}'")
+    result, last_modified, previous_paths = check_blended_document(doc, checkpoint, db_key, sink, index)
+    if result is not None:
+        return result
+    # Rewritten in place; also drops categories the document has left
+    remove_outputs(previous_paths)
+
+    snapshot = snapshot_document(doc, selection)
+    if blobs is not None:
+        blobs.wrap(snapshot)
+    if threads is not None:
+        snapshot.thread = threads.root(snapshot.unid)
+    source, category_paths = document_category_paths(snapshot, doc_id_to_paths)
+    folder_paths = []
+    if sink is None:
+        folder_paths = (nested and parent_folders(snapshot, store)) or category_folders(planner, category_paths)
+    write_blended_document(snapshot, category_paths, folder_paths,
+                           store, checkpoint, db_key, last_modified, sink, index=index)
+    return source, snapshot.com_calls, len(folder_paths) if sink is None else len(category_paths)
+
+class BlendedJob:
+    """One document travelling through the pipeline stages."""
+
+    def __init__(self, result=None, snapshot=None, last_modified=None, previous_paths=()):
+        self.result = result
+        self.snapshot = snapshot
+        self.last_modified = last_modified
+        self.previous_paths = previous_paths
+        self.source = None
+        self.category_paths = []
+        self.folder_paths = []
+        self.rendered = None
+
+class BlendedTally:
+    """Running totals of the per-document results, so a long run keeps no list of them."""
+
+    def __init__(self):
+        self.sources = Counter()
+        self.documents = 0
+        self.com_calls = 0
+        self.placements = 0
+        self.linked = 0
+
+    def add(self, result):
+        source, calls, count = result
+        self.sources[source] += 1
+        self.documents += 1
+        self.com_calls += calls
+        self.placements += count
+        self.linked += max(count - 1, 0)
+
+    def extend(self, results):
+        for result in results:
+            self.add(result)
+
+def read_blended_documents(all_docs, spool_dir, checkpoint=None, db_key=None, sink=None, blobs=None,
+                           index=None, selection=None, throttle=None, watchdog=None):
+    """
+    Pipeline reader stage, on the COM thread: checkpoint pre-check, snapshot and
+    attachment spooling. Yields a BlendedJob per document; the document itself is
+    released before its job is handed on (attachments are already spooled).
+    """
+    throttle = throttle or Throttle()
+    doc = all_docs.GetFirstDocument()
+    while doc:
+        with throttle.slot():
+            with run_metrics.phase("open_doc"), throttle.measure():
+                next_doc = all_docs.GetNextDocument(doc)
+            result, last_modified, previous_paths = check_blended_document(doc, checkpoint, db_key, sink, index)
+            if result is not None:
+                job = BlendedJob(result)
+            else:
+                snapshot = snapshot_document(doc, selection)
+                if blobs is not None:
+                    blobs.wrap(snapshot)
+                job = BlendedJob(None, spool_attachments(snapshot, spool_dir), last_modified, previous_paths)
+            release(doc)
+        yield job
+        if watchdog is not None:
+            # The collection can't be reopened mid-walk, so the reader only forces cleanups
+            watchdog.check()
+        doc = next_doc
+
+def serialize_blended_job(job, doc_id_to_paths, planner, sink=None):
+    """Pipeline serializer stage: category paths, sanitized folders and document.txt text."""
+    if job.result is None:
+        job.source, job.category_paths = document_category_paths(job.snapshot, doc_id_to_paths)
+        if sink is None:
+            job.folder_paths = category_folders(planner, job.category_paths)
+            job.rendered = render_document(job.snapshot)
+    return job
+
+def write_blended_job(job, store=None, checkpoint=None, db_key=None, sink=None, index=None):
+    """Pipeline writer stage: all disk I/O for one document."""
+    run_metrics.add("documents")
+    if job.result is not None:
+        return job.result
+    remove_outputs(job.previous_paths)
+    write_blended_document(job.snapshot, job.category_paths, job.folder_paths, store, checkpoint,
+                           db_key, job.last_modified, sink, job.rendered, index)
+    return job.source, job.snapshot.com_calls, len(job.category_paths)
+
+def blended_export(password, nsf_path, view_name, output_dir="output", workers=1,
+                   session_factory=notes_session_factory, use_processes=False,
+                   link_mode="hardlink", checkpoint_path=None, incremental=False, sink_kind="folder",
+                   pipeline=False, queue_size=QUEUE_SIZE, writers=WRITERS, blob_mode=None,
+                   index_path=None, selection=None, throttle=None, watchdog=None, threads=None):
+    """
+    Export every document of the NSF under its view categories.
+    With `checkpoint_path`, processed documents are recorded in a SQLite manifest and
+    a rerun (e.g. after a crash) skips everything that was already exported.
+    With `incremental`, only documents created, modified or deleted since the previous
+    incremental run's high-water mark are fetched (requires a checkpoint).
+    `sink_kind` "jsonl" or "parquet" streams one record per document into output_dir
+    instead of building the folder tree; "tar" or "zip" writes rolling archive shards.
+    With `pipeline`, one COM reader thread feeds a serializer and `writers` disk writer
+    threads through queues of at most `queue_size` documents.
+    `blob_mode` de-duplicates attachments by content hash (see blob_store.BLOB_MODES).
+    With `index_path`, subjects, categories and text items go into an SQLite FTS5
+    index there, searchable with `python fts_index.py <index_path> <query>`.
+    A `selection` (see selection.Selection) exports only the documents a server-side
+    formula/full-text search returns, reading only its projected fields.
+    A `throttle` (see throttle.Throttle) adapts the in-flight workers to the server's
+    COM latency and applies its rate limit and quiet hours.
+    Every document is released as soon as it is written. With a `watchdog`
+    (see com_lifetime.Watchdog) documents are opened by UNID, even with one worker,
+    so the session can be recycled when the process grows past its limits.
+    With `threads` (see threads.THREAD_MODES), response documents are indexed by their
+    $Ref parent up front and exported by UNID thread by thread, each thread on one
+    worker. Records carry their thread's UNID and threads.jsonl lists every response's
+    parent; "nested" also extracts each response inside its parent's document folder.
+    """
+    if incremental and not checkpoint_path:
+        raise ValueError("Incremental export needs a checkpoint file to keep its high-water mark.")
+    selected = selection is not None and selection.filtered()
+    if incremental and selected:
+        raise ValueError("A document search can't be combined with an incremental export; "
+                         "the search wouldn't return deletion stubs.")
+    if (sink_kind != "folder" or index_path) and use_processes:
+        raise ValueError("Record sinks and the search index are shared between workers; "
+                         "use threads instead of processes.")
+    if pipeline and workers > 1:
+        raise ValueError("The pipeline has a single COM reader; scale it with writers, not workers.")
+    if threads is not None and threads not in THREAD_MODES:
+        raise ValueError(f"Unknown thread mode '{threads}', expected one of {THREAD_MODES}")
+    if threads and pipeline:
+        raise ValueError("Threaded exports open documents by UNID in thread order; they can't use the pipeline.")
+    if threads == "nested" and (sink_kind != "folder" or checkpoint_path):
+        raise ValueError("Nested threads extract responses into their parent's folder; they need the folder "
+                         "sink and a full run without a checkpoint.")
+    throttle = throttle or Throttle()
+    session = session_factory(password)
+    db = open_database(session, nsf_path)
 
     print("[DEBUG] Database opened successfully.")
     os.makedirs(output_dir, exist_ok=True)
+    store = PlacementStore(output_dir, link_mode)
+    sink = open_sink(sink_kind, output_dir, sanitize_folder_name, append=bool(checkpoint_path))
+    blobs = BlobStore(output_dir, blob_mode) if blob_mode else None
+    index = open_index(index_path)
+
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = open_checkpoint(checkpoint_path)
+        print(f"[DEBUG] Checkpoint '{checkpoint_path}': {checkpoint.count(nsf_path)} documents already exported.")
 
     # 1) Gather categories from the view
     doc_id_to_paths = gather_view_categories(db, view_name)
+    # ...and lay out the whole category tree once, up front (with a selection, only the
+    # folders its documents land in are created, as they come)
+    planner = PathPlanner(output_dir, sanitize_folder_name)
+    if sink is None and not selected:
+        planner.plan(view_category_paths(doc_id_to_paths))
+        print(f"[DEBUG] Created {planner.makedirs()} category folders.")
+    # ...and where each response document belongs, from the $Ref items alone
+    thread_index = build_thread_index(db) if threads else None
 
-    # 2) Iterate all docs in the DB
-    all_docs = db.AllDocuments
-    doc = all_docs.GetFirstDocument()
-    doc_count = 0
-    fallback_count = 0
-    view_count = 0
-
-    while doc:
-        doc_id_full = doc.UniversalID
-        # Some docs might not have a valid UniversalID
-        # but that's rare unless they are design docs.
-        doc_id_full = doc_id_full or "UNKNOWN_UNID"
-
-        next_doc = all_docs.GetNextDocument(doc)
-
-        # If doc ID is in our dictionary, use the view-based paths
-        if doc_id_full in doc_id_to_paths:
-            cat_path_list = doc_id_to_paths[doc_id_full]
-            # cat_path_list is a list of category paths, e.g. [ ["CatA"], ["CatB","SubB"] ]
-            if cat_path_list:
-                for cat_path in cat_path_list:
-                    # Sanitize each category part
-                    sanitized_parts = [sanitize_folder_name(x) for x in cat_path if x.strip()]
-                    folder_path = os.path.join(output_dir, *sanitized_parts)
-                    os.makedirs(folder_path, exist_ok=True)
-
-                    extract_document(doc, folder_path)
-                view_count += 1
+    # 2) Iterate all docs in the DB, the selected ones, or only the changes since the last run
+    if incremental:
+        since = checkpoint.get_watermark(nsf_path)
+        all_docs, until = modified_documents(session, db, since)
+        print(f"[DEBUG] Incremental export: {all_docs.Count} changed documents since {since or 'the beginning'}.")
+    else:
+        all_docs = select_documents(db, selection)
+    run_metrics.start(total=all_docs.Count)
+    export = functools.partial(export_blended_document, doc_id_to_paths=doc_id_to_paths,
+                               planner=planner, store=store,
+                               checkpoint=checkpoint, db_key=nsf_path, sink=sink, blobs=blobs,
+                               index=index, selection=selection, threads=thread_index,
+                               nested=threads == "nested")
+    tally = BlendedTally()
+    try:
+        if workers > 1 or thread_index is not None or (watchdog is not None and not pipeline):
+            deleted = []
+            if incremental:
+                # Deletion stubs can't be reopened by UNID; tombstone them here
+                unids, deleted = split_deletions(all_docs)
+                for unid in deleted:
+                    tombstone_document(checkpoint, nsf_path, unid, sink, index)
             else:
-                # If there's an empty category path from the view, fallback
-                fallback_count += 1
-                category_values = doc.GetItemValue("Category")
-                if not category_values:
-                    category_values = ["Uncategorized"]
-                for cat in category_values:
-                    cat = cat.strip() or "Uncategorized"
-                    parts = cat.split("\\")
-                    parts = [sanitize_folder_name(p) for p in parts if p.strip()]
-                    if not parts:
-                        parts = ["Uncategorized"]
-                    folder_path = os.path.join(output_dir, *parts)
-                    os.makedirs(folder_path, exist_ok=True)
-                    extract_document(doc, folder_path)
+                unids = collect_unids(all_docs)
+            if thread_index is not None:
+                unids = thread_index.order(unids)
+            tally.extend([("deleted", 2, 0)] * len(deleted))
+            tally.extend(run_sharded(password, nsf_path, unids, export, workers,
+                                     session_factory=session_factory, use_processes=use_processes,
+                                     shard_done=checkpoint.flush if checkpoint is not None else None,
+                                     throttle=throttle, watchdog=watchdog,
+                                     group_of=thread_index.root if thread_index is not None else None))
+        elif pipeline:
+            spool_dir = os.path.join(output_dir, ".spool")
+            os.makedirs(spool_dir, exist_ok=True)
+            stages = Pipeline(
+                functools.partial(serialize_blended_job, doc_id_to_paths=doc_id_to_paths,
+                                  planner=planner, sink=sink),
+                functools.partial(write_blended_job, store=store, checkpoint=checkpoint,
+                                  db_key=nsf_path, sink=sink, index=index),
+                queue_size=queue_size, writers=writers)
+            try:
+                tally.extend(stages.run(read_blended_documents(all_docs, spool_dir, checkpoint, nsf_path,
+                                                            sink, blobs, index, selection, throttle,
+                                                            watchdog)))
+            finally:
+                shutil.rmtree(spool_dir, ignore_errors=True)
+            stages.report()
         else:
-            # 3) Fallback to doc's 'Category' field
-            fallback_count += 1
-            category_values = doc.GetItemValue("Category")
-            if not category_values:
-                category_values = ["Uncategorized"]
-            for cat in category_values:
-                cat = cat.strip() or "Uncategorized"
-                parts = cat.split("\\")
-                parts = [sanitize_folder_name(p) for p in parts if p.strip()]
-                if not parts:
-                    parts = ["Uncategorized"]
-                folder_path = os.path.join(output_dir, *parts)
-                os.makedirs(folder_path, exist_ok=True)
-                extract_document(doc, folder_path)
-
-        doc_count += 1
-        doc = next_doc
+            doc = all_docs.GetFirstDocument()
+            while doc:
+                with throttle.slot():
+                    with run_metrics.phase("open_doc"), throttle.measure():
+                        next_doc = all_docs.GetNextDocument(doc)
+                    tally.add(export(doc))
+                release(doc)
+                run_metrics.add("documents")
+                doc = next_doc
+        if incremental:
+            checkpoint.set_watermark(nsf_path, until)
+    finally:
+        if sink is not None:
+            sink.close()
+        if index is not None:
+            index.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        run_metrics.stop()
+        release_session(session_factory, session, db)
 
+    sources = tally.sources
     print("\n[DEBUG] Finished blended export.")
-    print(f"[DEBUG] Total documents processed: {doc_count}")
-    print(f"[DEBUG] Documents using view-based categories: {view_count}")
-    print(f"[DEBUG] Documents using fallback category field: {fallback_count}\n")
+    print(f"[DEBUG] Total documents processed: {tally.documents}")
+    print(f"[DEBUG] Documents using view-based categories: {sources['view']}")
+    print(f"[DEBUG] Documents using fallback category field: {sources['fallback']}")
+    print(f"[DEBUG] Documents skipped (already in checkpoint): {sources['skipped']}")
+    print(f"[DEBUG] Documents tombstoned (deleted): {sources['deleted']}")
+    print(f"[DEBUG] Category placements: {tally.placements} "
+          f"({tally.linked} linked as '{link_mode}' instead of re-extracted)")
+    if tally.documents:
+        print(f"[DEBUG] COM calls reading documents: {tally.com_calls} "
+              f"({tally.com_calls / tally.documents:.1f} per document)\n")
+    planner.report()
+    if thread_index is not None:
+        thread_index.write(os.path.join(output_dir, THREADS_NAME))
+        thread_index.report()
+    throttle.report()
+    if watchdog is not None:
+        watchdog.report()
+    if blobs is not None:
+        blobs.report()
+    if index is not None:
+        print(f"[DEBUG] Search index: {index.count} documents indexed into {index_path}")
 
 if __name__ == '__main__':
-    blended_export(LOTUS_PASSWORD, NSF_PATH, VIEW_NAME, OUTPUT_DIR)
+    parser = argparse.ArgumentParser(description="Export NSF documents into view-based category folders.")
+    parser.add_argument("--nsf-path", default=NSF_PATH)
+    parser.add_argument("--password", default=LOTUS_PASSWORD)
+    parser.add_argument("--view-name", default=VIEW_NAME)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel workers, each with its own NotesSession.")
+    parser.add_argument("--processes", action="store_true",
+                        help="Use worker processes instead of threads.")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="hardlink",
+                        help="How documents in several categories are placed after the first extraction.")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="SQLite checkpoint file; rerun with the same file to resume an interrupted export.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only export documents changed since the last incremental run (needs --checkpoint).")
+    parser.add_argument("--sink", choices=SINK_KINDS, default="folder",
+                        help="Output format: a folder per document, one JSONL/Parquet file for the database, "
+                             "or rolling tar/zip shards indexed by UNID.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Split COM reads, serialization and disk writes into pipelined stages.")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="Pipeline backpressure: documents buffered between two stages.")
+    parser.add_argument("--writers", type=int, default=WRITERS,
+                        help="Pipeline disk writer threads.")
+    parser.add_argument("--blobs", choices=BLOB_MODES,
+                        help="Store attachments once by content hash under blobs/ and hardlink, copy or only reference them.")
+    parser.add_argument("--index", metavar="PATH",
+                        help="Also build an SQLite full-text index of the documents at PATH (see fts_index.py).")
+    parser.add_argument("--trace", metavar="PREFIX",
+                        help="Trace every COM call; writes PREFIX.txt (cost report) and PREFIX.folded (flamegraph).")
+    parser.add_argument("--threads", choices=THREAD_MODES,
+                        help="Export response documents thread by thread: 'reference' records each response's "
+                             "parent and thread, 'nested' also puts it inside its parent's folder.")
+    add_selection_arguments(parser)
+    add_throttle_arguments(parser)
+    add_lifetime_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_from_args(args)
+    session_factory, tracer = trace_session_factory(args.trace)
+    try:
+        blended_export(args.password, args.nsf_path, args.view_name, args.output_dir,
+                       workers=args.workers, use_processes=args.processes,
+                       link_mode=args.link_mode, checkpoint_path=args.checkpoint,
+                       incremental=args.incremental, sink_kind=args.sink,
+                       pipeline=args.pipeline, queue_size=args.queue_size, writers=args.writers,
+                       blob_mode=args.blobs, index_path=args.index, selection=selection_from_args(args),
+                       throttle=throttle_from_args(args), watchdog=watchdog_from_args(args),
+                       threads=args.threads, session_factory=session_factory)
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace)
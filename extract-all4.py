@@ -1,6 +1,20 @@
-import win32com.client
+import argparse
+import logging
 import os
-import re
+
+from blob_store import BLOB_MODES, BlobStore
+from com_lifetime import release
+from com_trace import trace_session_factory
+from field_serializer import document_text
+from fts_index import open_index
+from metrics import add_metrics_arguments, run_metrics, setup_from_args
+from path_planner import PathPlanner, sanitize_name
+from placement_store import LINK_MODES, PlacementStore
+from selection import add_selection_arguments, selected_unids, selection_from_args, snapshot_document
+from session_pool import notes_session_factory, open_database, release_session
+from view_categories import view_navigator
+
+logger = logging.getLogger(__name__)
 
 #NSF_PATH = "FND-CHHAD-Reference-Libraryl.nsf"
 NSF_PATH = "names.nsf"
@@ -14,168 +28,187 @@ MAX_FOLDER_NAME_LENGTH = 100
 
 def sanitize_folder_name(name, max_length=MAX_FOLDER_NAME_LENGTH):
     """Removes invalid characters and truncates for Windows-safe folder names."""
-    if not name or not name.strip():
-        return "Unnamed"
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
-    name = re.sub(r'[\s_]+', '_', name)
-    return name[:max_length].strip('_')
-
-def get_document_subject(doc):
-    """Return 'Subject' field, or fallback to 'Form' if needed."""
-    subject = None
-    for item in doc.Items:
-        if item.Name.lower() == "subject":
-            subject = item.Values[0] if item.Values else None
-            break
-    if not subject:
-        for item in doc.Items:
-            if item.Name.lower() == "form":
-                subject = f"Form_{item.Values[0]}" if item.Values else None
-                break
-    return subject or "UnnamedDocument"
-
-def extract_document(doc, folder_path):
+    return sanitize_name(name, max_length, "Unnamed")
+
+def extract_document(snapshot, folder_path, store=None):
     """
     Creates a subfolder named after doc subject + short UniversalID,
     writes fields to 'document.txt', and extracts attachments robustly.
     """
-    subject = get_document_subject(doc)
-    try:
-        doc_id = doc.UniversalID[:8]
-    except Exception:
-        doc_id = "unknown"
+    subject = snapshot.subject()
+    doc_id = snapshot.unid[:8] or "unknown"
 
     doc_folder_name = sanitize_folder_name(f"{subject}_{doc_id}")
     doc_folder_path = os.path.join(folder_path, doc_folder_name)
-    os.makedirs(doc_folder_path, exist_ok=True)
+    with run_metrics.phase("makedirs"):
+        os.makedirs(doc_folder_path, exist_ok=True)
 
     # Write all fields to a text file
     text_file_path = os.path.join(doc_folder_path, "document.txt")
-    with open(text_file_path, "w", encoding="utf-8") as f:
-        f.write(f"----- Document: {subject} ({doc_id}) -----\n")
-        for item in doc.Items:
-            try:
-                f.write(f"{item.Name}: {item.Values}\n")
-            except Exception as e:
-                f.write(f"{item.Name}: <Error reading value: {e}>\n")
-        f.write("--------------------\n")
+    with run_metrics.phase("write_text"), open(text_file_path, "w", encoding="utf-8") as f:
+        f.write(document_text(snapshot))
+        run_metrics.add("bytes_written", f.tell())
 
     # Extract attachments (robust approach)
-    for item in doc.Items:
-        # Skip items with no EmbeddedObjects
-        if not hasattr(item, "EmbeddedObjects"):
-            continue
-
-        embedded_objects = item.EmbeddedObjects
-        if not embedded_objects:
-            continue
-
+    for attachment in snapshot.attachments:
+        attachment_name = attachment.name or "UntitledAttachment"
+        safe_name = sanitize_folder_name(attachment_name)
+        attachment_path = os.path.join(doc_folder_path, safe_name)
         try:
-            # If it's a COM collection (has Count)
-            if hasattr(embedded_objects, "Count"):
-                for i in range(1, embedded_objects.Count + 1):
-                    embedded_obj = embedded_objects.Item(i)
-                    attachment_name = embedded_obj.Name or "UntitledAttachment"
-                    safe_name = sanitize_folder_name(attachment_name)
-                    attachment_path = os.path.join(doc_folder_path, safe_name)
-                    try:
-                        embedded_obj.ExtractFile(attachment_path)
-                        print(f"Extracted attachment '{attachment_name}' to {attachment_path}")
-                    except Exception as e:
-                        print(f"Failed to extract attachment '{attachment_name}': {e}")
-
-            # Else if it's a Python iterable
-            elif hasattr(embedded_objects, "__iter__"):
-                for embedded_obj in embedded_objects:
-                    attachment_name = embedded_obj.Name or "UntitledAttachment"
-                    safe_name = sanitize_folder_name(attachment_name)
-                    attachment_path = os.path.join(doc_folder_path, safe_name)
-                    try:
-                        embedded_obj.ExtractFile(attachment_path)
-                        print(f"Extracted attachment '{attachment_name}' to {attachment_path}")
-                    except Exception as e:
-                        print(f"Failed to extract attachment '{attachment_name}': {e}")
-
-            else:
-                print(f"EmbeddedObjects in item '{item.Name}' is neither a COM collection nor an iterable.")
+            attachment.extract(attachment_path)
+            logger.debug("Extracted attachment '%s' to %s", attachment_name, attachment_path)
         except Exception as e:
-            print(f"Error processing embedded objects in item '{item.Name}': {e}")
+            logger.error("Failed to extract attachment '%s': %s", attachment_name, e)
+            run_metrics.add("errors")
 
-def extract_all_views_with_categories(password, nsf_path, output_dir="output_all_views_categories"):
+    if store is not None:
+        store.record(snapshot.unid, doc_folder_path)
+    return doc_folder_path
+
+def extract_all_views_with_categories(password, nsf_path, output_dir="output_all_views_categories",
+                                      link_mode="hardlink", blob_mode=None, index_path=None,
+                                      selection=None, session_factory=notes_session_factory):
     """
     1) Enumerate ALL views in the NSF.
     2) For each view:
        - Create a folder named after the view.
        - For each document entry, parse the first column for a backslash-delimited category path.
        - Extract the doc under that category path, with a subfolder named after the doc's subject + short UID.
+    A document listed in several views/categories is extracted once and linked elsewhere
+    according to `link_mode` (hardlink, symlink, copy or a manifest entry).
+    `blob_mode` stores each distinct attachment once by content hash (see blob_store.BLOB_MODES).
+    `index_path` builds an SQLite FTS5 index of the documents and every path they were
+    placed at (search it with fts_index.py).
+    With a `selection` (see selection.Selection), the matching UNIDs are searched for on
+    the server first; view entries of other documents are skipped without opening them,
+    and only the projected fields are read.
     """
-    session = win32com.client.Dispatch("Lotus.NotesSession")
-    session.Initialize(password)
-
-    db = session.GetDatabase("", nsf_path)
-    if not db.IsOpen:
-        raise Exception(f"Unable to open NSF at '{nsf_path}'")
-
-    os.makedirs(output_dir, exist_ok=True)
-
-    views = db.Views
-    print(f"[INFO] Found {len(views)} views in the database.\n")
-
-    view_count = 0
-    for view in views:
-        view_name = view.Name
-        # Optional: skip hidden/system views
-        # if view_name.startswith("(") or view_name.startswith("$"):
-        #     continue
-
-        safe_view_name = sanitize_folder_name(view_name)
-        view_folder = os.path.join(output_dir, safe_view_name)
-        os.makedirs(view_folder, exist_ok=True)
-
-        print(f"[INFO] Processing view '{view_name}' -> folder '{safe_view_name}'")
-
-        all_entries = view.AllEntries
-        entry = all_entries.GetFirstEntry()
-        doc_count = 0
-
-        while entry:
-            next_entry = all_entries.GetNextEntry(entry)
-            if entry.IsDocument:
-                doc = entry.Document
-                if doc:
-                    # Get the category path from the specified column
-                    col_vals = entry.ColumnValues
-                    if len(col_vals) > CATEGORY_COLUMN_INDEX:
-                        cat_string = str(col_vals[CATEGORY_COLUMN_INDEX])
-                    else:
-                        cat_string = ""
-
-                    cat_string = cat_string.strip()
-                    if not cat_string:
-                        cat_string = "Uncategorized"
-
-                    # Split on backslash for multi-level categories
-                    parts = [p.strip() for p in cat_string.split("\\") if p.strip()]
-                    if not parts:
-                        parts = ["Uncategorized"]
-
-                    # Sanitize each part
-                    parts = [sanitize_folder_name(p) for p in parts]
-
-                    # Build final folder path: e.g. output/viewName/CatA/SubCatB
-                    final_folder_path = os.path.join(view_folder, *parts)
-                    os.makedirs(final_folder_path, exist_ok=True)
-
-                    # Extract the doc
-                    extract_document(doc, final_folder_path)
-                    doc_count += 1
-
-            entry = next_entry
-
-        print(f"[INFO] Extracted {doc_count} documents from view '{view_name}'\n")
-        view_count += 1
+    session = session_factory(password)
+    db = index = None
+    try:
+        db = open_database(session, nsf_path)
+
+        os.makedirs(output_dir, exist_ok=True)
+        store = PlacementStore(output_dir, link_mode)
+        blobs = BlobStore(output_dir, blob_mode) if blob_mode else None
+        index = open_index(index_path)
+        planner = PathPlanner(output_dir, sanitize_folder_name)
+        selected = selected_unids(db, selection)
+        unselected = 0
+
+        views = db.Views
+        print(f"[INFO] Found {len(views)} views in the database.\n")
+        run_metrics.start()
+
+        view_count = 0
+        for view in views:
+            view_name = view.Name
+            # Optional: skip hidden/system views
+            # if view_name.startswith("(") or view_name.startswith("$"):
+            #     continue
+
+            view_folder = planner.folder((view_name,))
+
+            print(f"[INFO] Processing view '{view_name}' -> folder '{os.path.basename(view_folder)}'")
+
+            # Stream the view through a read-ahead navigator; nothing is collected up front
+            doc_count = 0
+            with view_navigator(view) as nav:
+                entry = nav.GetFirst()
+
+                while entry:
+                    next_entry = nav.GetNext(entry)
+                    if entry.IsDocument:
+                        unid = entry.UniversalID
+                        if selected is not None and unid not in selected:
+                            unselected += 1
+                            release(entry)
+                            entry = next_entry
+                            continue
+                        cached = store.canonical(unid) is not None
+                        # Documents listed by an earlier view come from the UNID cache, unopened
+                        with run_metrics.phase("open_doc"):
+                            doc = None if cached else entry.Document
+                        if cached or doc:
+                            # Get the category path from the specified column
+                            col_vals = entry.ColumnValues
+                            if len(col_vals) > CATEGORY_COLUMN_INDEX:
+                                cat_string = str(col_vals[CATEGORY_COLUMN_INDEX])
+                            else:
+                                cat_string = ""
+
+                            cat_string = cat_string.strip()
+                            if not cat_string:
+                                cat_string = "Uncategorized"
+
+                            # Split on backslash for multi-level categories
+                            parts = [p.strip() for p in cat_string.split("\\") if p.strip()]
+                            if not parts:
+                                parts = ["Uncategorized"]
+
+                            # Final folder path, e.g. output/viewName/CatA/SubCatB (sanitized and
+                            # created once per distinct category by the planner)
+                            final_folder_path = planner.folder((view_name, *parts))
+
+                            # Extract the doc, unless another view already did and it can be linked
+                            placed = store.place(unid, final_folder_path)
+                            if not placed:
+                                snapshot = snapshot_document(doc, selection)
+                                if blobs is not None:
+                                    blobs.wrap(snapshot)
+                                doc_folder_path = extract_document(snapshot, final_folder_path, store)
+                                run_metrics.add("documents")
+                                if index is not None:
+                                    index.add(snapshot, [[view_name] + parts], [doc_folder_path])
+                            elif index is not None:
+                                index.add_placement(unid, placed)
+                            doc_count += 1
+                        release(doc)
+
+                    release(entry)
+                    entry = next_entry
+
+            print(f"[INFO] Extracted {doc_count} documents from view '{view_name}'\n")
+            view_count += 1
+    finally:
+        run_metrics.stop()
+        if index is not None:
+            index.close()
+        release_session(session_factory, session, db)
 
     print(f"[DONE] Processed {view_count} views total.")
+    print(f"[DONE] UNID cache: {store.extracted} documents extracted, {store.linked} placements "
+          f"linked as '{link_mode}' (saved {store.linked} extractions)")
+    if selected is not None:
+        print(f"[DONE] Selection: {len(selected)} documents selected, {unselected} view entries skipped.")
+    planner.report()
+    if blobs is not None:
+        blobs.report()
+    if index is not None:
+        print(f"[DONE] Search index: {index.count} documents indexed into {index_path}")
 
 if __name__ == '__main__':
-    extract_all_views_with_categories(LOTUS_PASSWORD, NSF_PATH, OUTPUT_DIR)
+    parser = argparse.ArgumentParser(description="Export every view of an NSF into category folders.")
+    parser.add_argument("--nsf-path", default=NSF_PATH)
+    parser.add_argument("--password", default=LOTUS_PASSWORD)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="hardlink",
+                        help="How documents listed in several views are placed after the first extraction.")
+    parser.add_argument("--blobs", choices=BLOB_MODES,
+                        help="Store attachments once by content hash under blobs/ and hardlink, copy or only reference them.")
+    parser.add_argument("--index", metavar="PATH",
+                        help="Also build an SQLite full-text index of the documents at PATH (see fts_index.py).")
+    parser.add_argument("--trace", metavar="PREFIX",
+                        help="Trace every COM call; writes PREFIX.txt (cost report) and PREFIX.folded (flamegraph).")
+    add_selection_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_from_args(args)
+    session_factory, tracer = trace_session_factory(args.trace)
+    try:
+        extract_all_views_with_categories(args.password, args.nsf_path, args.output_dir, link_mode=args.link_mode,
+                                          blob_mode=args.blobs, index_path=args.index,
+                                          selection=selection_from_args(args), session_factory=session_factory)
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace)
@@ -1,6 +1,18 @@
-import win32com.client
+import argparse
+import functools
 import os
-import re
+
+from checkpoint import open_checkpoint
+from com_lifetime import add_lifetime_arguments, release, watchdog_from_args
+from com_trace import trace_session_factory
+from db_crawler import build_catalog, catalog_databases, crawl, database_folder_name
+from doc_snapshot import DocumentSnapshot
+from field_serializer import document_text
+from metrics import add_metrics_arguments, run_metrics, setup_from_args
+from path_planner import PathPlanner, sanitize_name
+from placement_store import LINK_MODES, PlacementStore
+from session_pool import notes_session_factory, release_session
+from view_categories import create_view_navigator
 
 LOTUS_PASSWORD = ""  # If needed
 OUTPUT_DIR = "output_all_dbs"
@@ -8,57 +20,30 @@ CATEGORY_COLUMN_INDEX = 0
 MAX_FOLDER_NAME_LENGTH = 100
 
 def sanitize_folder_name(name, max_length=MAX_FOLDER_NAME_LENGTH):
-    if not name or not name.strip():
-        return "Unnamed"
-    name = re.sub(r'[<>:"/\\|?*]', '_', name)
-    name = re.sub(r'[\s_]+', '_', name)
-    return name[:max_length].strip('_')
-
-def get_document_subject(doc):
-    subject = None
-    for item in doc.Items:
-        if item.Name.lower() == "subject":
-            subject = item.Values[0] if item.Values else None
-            break
-    if not subject:
-        for item in doc.Items:
-            if item.Name.lower() == "form":
-                subject = f"Form_{item.Values[0]}" if item.Values else None
-                break
-    return subject or "UnnamedDocument"
-
-def extract_document(doc, folder_path):
-    subject = get_document_subject(doc)
-    try:
-        doc_id = doc.UniversalID[:8]
-    except Exception:
-        doc_id = "unknown"
+    return sanitize_name(name, max_length, "Unnamed")
+
+def extract_document(snapshot, folder_path, store=None):
+    subject = snapshot.subject()
+    doc_id = snapshot.unid[:8] or "unknown"
     
     doc_folder_name = sanitize_folder_name(f"{subject}_{doc_id}")
     doc_folder_path = os.path.join(folder_path, doc_folder_name)
-    os.makedirs(doc_folder_path, exist_ok=True)
+    with run_metrics.phase("makedirs"):
+        os.makedirs(doc_folder_path, exist_ok=True)
     
     text_file_path = os.path.join(doc_folder_path, "document.txt")
-    with open(text_file_path, "w", encoding="utf-8") as f:
-        f.write(f"----- Document: {subject} ({doc_id}) -----\n")
-        for item in doc.Items:
-            try:
-                value = item.Values
-                # Dump only if the value is text (either a string or list of strings)
-                if isinstance(value, str):
-                    f.write(f"{item.Name}: {value}\n")
-                elif isinstance(value, list) and all(isinstance(v, str) for v in value):
-                    f.write(f"{item.Name}: {'; '.join(value)}\n")
-            except Exception as e:
-                f.write(f"{item.Name}: <Error reading value: {e}>\n")
-        f.write("--------------------\n")
+    with run_metrics.phase("write_text"), open(text_file_path, "w", encoding="utf-8") as f:
+        # Every item, typed; numbers, dates and names used to be dropped here
+        f.write(document_text(snapshot))
+        run_metrics.add("bytes_written", f.tell())
 
-def extract_document_old(doc, folder_path):
-    subject = get_document_subject(doc)
-    try:
-        doc_id = doc.UniversalID[:8]
-    except Exception:
-        doc_id = "unknown"
+    if store is not None:
+        store.record(snapshot.unid, doc_folder_path)
+    return doc_folder_path
+
+def extract_document_old(snapshot, folder_path):
+    subject = snapshot.subject()
+    doc_id = snapshot.unid[:8] or "unknown"
     
     doc_folder_name = sanitize_folder_name(f"{subject}_{doc_id}")
     doc_folder_path = os.path.join(folder_path, doc_folder_name)
@@ -67,11 +52,11 @@ def extract_document_old(doc, folder_path):
     text_file_path = os.path.join(doc_folder_path, "document.txt")
     with open(text_file_path, "w", encoding="utf-8") as f:
         f.write(f"----- Document: {subject} ({doc_id}) -----\n")
-        for item in doc.Items:
-            try:
-                f.write(f"{item.Name}: {item.Values}\n")
-            except Exception as e:
-                f.write(f"{item.Name}: <Error reading value: {e}>\n")
+        for item in snapshot.items:
+            if item.error is not None:
+                f.write(f"{item.name}: <Error reading value: {item.error}>\n")
+            else:
+                f.write(f"{item.name}: {item.values}\n")
         f.write("--------------------\n")
 
 def extract_all_objects(password, db, output_dir):
@@ -86,48 +71,127 @@ def extract_all_objects(password, db, output_dir):
     except Exception as e:
         print(f"[ERROR] Failed to enumerate design elements in {db.Title}: {e}")
 
-def extract_all_views_with_categories(password, db, output_dir):
+def entry_category_parts(entry):
+    """Raw category path of a document entry, from its category column."""
+    col_vals = entry.ColumnValues
+    cat_string = (str(col_vals[CATEGORY_COLUMN_INDEX])
+                  if len(col_vals) > CATEGORY_COLUMN_INDEX
+                  else "Uncategorized")
+    return [p.strip() for p in cat_string.split("\\") if p.strip()] or ["Uncategorized"]
+
+def export_view_entry(entry, planner, view_name, store, checkpoint=None, db_key=None):
+    """
+    Place one view entry's document under its category folder. The UNID cache
+    (placement store) is consulted with the entry's UniversalID before the document
+    is opened, so each document is pulled from COM once per database. A document an
+    earlier run recorded in the checkpoint is reused only if its LastModified is
+    unchanged; a modified one is extracted again.
+    Returns "extracted", "cached", "skipped" (already placed by an earlier run) or
+    "missing" (the entry has no document, e.g. it was deleted).
+    """
+    # Sanitized and created once per distinct category by the planner
+    final_folder_path = planner.folder((view_name, *entry_category_parts(entry)))
+    unid = entry.UniversalID
+
+    doc = None
+    done = checkpoint.get(db_key, unid) if checkpoint is not None else None
+    if done is not None and store.canonical(unid) is None:
+        # First placement this run: opening the document for its LastModified is the
+        # one open this UNID gets anyway
+        with run_metrics.phase("open_doc"):
+            doc = entry.Document
+        if not doc:
+            return "missing"
+        if checkpoint.is_done(db_key, unid, str(doc.LastModified)):
+            store.adopt(unid, done.paths[0])
+        else:
+            done = None
+    if done is not None and store.canonical(unid) is not None:
+        # Exported by an earlier run: skip this placement, or link to that copy below
+        if any(os.path.dirname(path) == final_folder_path for path in done.paths):
+            release(doc)
+            return "skipped"
+
+    # Extracted once per database; other views link to the first copy
+    placed = store.place(unid, final_folder_path)
+    if placed:
+        release(doc)
+        if checkpoint is not None:
+            checkpoint.add_path(db_key, unid, placed)
+        return "cached"
+
+    if doc is None:
+        with run_metrics.phase("open_doc"):
+            doc = entry.Document
+        if not doc:
+            return "missing"
+    snapshot = DocumentSnapshot.from_document(doc)
+    placed = extract_document(snapshot, final_folder_path, store)
+    if checkpoint is not None:
+        # A fresh copy replaces whatever an earlier run recorded; only document.txt is written
+        checkpoint.mark(db_key, unid, str(doc.LastModified), [placed], [])
+    release(doc)
+    return "extracted"
+
+def extract_all_views_with_categories(password, db, output_dir, link_mode="hardlink", checkpoint=None,
+                                      watchdog=None):
+    """
+    Export every view of `db`. View entries and documents are released as soon as
+    they are placed; the `watchdog` (com_lifetime.Watchdog) forces cleanups when the
+    process grows past its limits (the crawler gives every database a fresh session).
+    """
     os.makedirs(output_dir, exist_ok=True)
+    store = PlacementStore(output_dir, link_mode)
+    planner = PathPlanner(output_dir, sanitize_folder_name)
+    db_key = db.FilePath
+    stats = {"extracted": 0, "cached": 0, "skipped": 0, "missing": 0}
     views = db.Views
     print(f"[INFO] Found {len(views)} views in the database {db.Title}.")
-    
+
+    # Folders are planned as the walk meets them: one navigation pass per view, in
+    # view order, so collision suffixes still come out the same on every run
     for view in views:
         view_name = view.Name
-        safe_view_name = sanitize_folder_name(view_name)
-        view_folder = os.path.join(output_dir, safe_view_name)
-        os.makedirs(view_folder, exist_ok=True)
+        view_folder = planner.folder((view_name,))
         
-        print(f"[INFO] Processing view '{view_name}' -> folder '{safe_view_name}'")
+        print(f"[INFO] Processing view '{view_name}' -> folder '{os.path.basename(view_folder)}'")
         
-        all_entries = view.AllEntries
-        entries_list = []
+        # Stream the view: only the current and the look-ahead entry are alive at once
+        auto_update = view.AutoUpdate
         try:
-            entry = all_entries.GetFirstEntry()
-        except Exception as e:
-            print(f"[ERROR] Failed to get first entry for view '{view_name}': {e}")
-            continue
-        
-        while entry:
-            entries_list.append(entry)
             try:
-                entry = all_entries.GetNextEntry(entry)
+                nav = create_view_navigator(view)
+                entry = nav.GetFirst()
             except Exception as e:
-                print(f"[ERROR] Failed to get next entry in view '{view_name}': {e}")
-                break
+                print(f"[ERROR] Failed to get first entry for view '{view_name}': {e}")
+                continue
         
-        for entry in entries_list:
-            if entry.IsDocument:
-                doc = entry.Document
-                if doc:
-                    col_vals = entry.ColumnValues
-                    cat_string = (str(col_vals[CATEGORY_COLUMN_INDEX])
-                                  if len(col_vals) > CATEGORY_COLUMN_INDEX
-                                  else "Uncategorized")
-                    
-                    parts = [sanitize_folder_name(p.strip()) for p in cat_string.split("\\") if p.strip()]
-                    final_folder_path = os.path.join(view_folder, *parts) if parts else os.path.join(view_folder, "Uncategorized")
-                    os.makedirs(final_folder_path, exist_ok=True)
-                    extract_document(doc, final_folder_path)
+            while entry:
+                try:
+                    next_entry = nav.GetNext(entry)
+                except Exception as e:
+                    print(f"[ERROR] Failed to get next entry in view '{view_name}': {e}")
+                    next_entry = None
+                if entry.IsDocument:
+                    status = export_view_entry(entry, planner, view_name, store, checkpoint, db_key)
+                    stats[status] += 1
+                    if status == "extracted":
+                        run_metrics.add("documents")
+                    if watchdog is not None:
+                        watchdog.check()
+                release(entry)
+                entry = next_entry
+        finally:
+            view.AutoUpdate = auto_update
+
+    print(f"[INFO] UNID cache: {stats['extracted']} documents extracted, "
+          f"{stats['cached']} placements linked as '{link_mode}' "
+          f"(saved {stats['cached']} extractions), "
+          f"{stats['skipped']} placements skipped (already in checkpoint), "
+          f"{stats['missing']} entries without a document")
+    planner.report()
+    if watchdog is not None:
+        watchdog.report()
 
 
 def extract_all_views_with_categories_old(password, db, output_dir):
@@ -160,26 +224,81 @@ def extract_all_views_with_categories_old(password, db, output_dir):
                     parts = [sanitize_folder_name(p.strip()) for p in cat_string.split("\\") if p.strip()]
                     final_folder_path = os.path.join(view_folder, *parts) if parts else os.path.join(view_folder, "Uncategorized")
                     os.makedirs(final_folder_path, exist_ok=True)
-                    extract_document(doc, final_folder_path)
+                    extract_document(DocumentSnapshot.from_document(doc), final_folder_path)
 
-def enumerate_all_databases(password, output_dir):
-    session = win32com.client.Dispatch("Lotus.NotesSession")
-    session.Initialize(password)
+def export_database(password, output_dir, link_mode, checkpoint_path, db, watchdog=None):
+    """Crawler job for one database; runs in a worker process with its own session."""
+    db_output_dir = os.path.join(output_dir, database_folder_name(db, sanitize_folder_name))
+    checkpoint = open_checkpoint(checkpoint_path) if checkpoint_path else None
+    print(f"[INFO] Processing database: {db.Title}")
+    try:
+        extract_all_objects(password, db, db_output_dir)
+        extract_all_views_with_categories(password, db, db_output_dir, link_mode, checkpoint, watchdog)
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
+    return db_output_dir
 
-    # Get all address books (NSF databases)
-    dbs = session.AddressBooks  # Includes local and remote NSF files
+def enumerate_all_databases(password, output_dir, link_mode="hardlink", checkpoint_path=None,
+                            concurrency=1, server=None, session_factory=notes_session_factory, watchdog=None,
+                            count_documents=True):
+    """
+    Export every view of every address book database (or, with `server`, every database
+    in that server's data directory; "" is the local data directory). Databases are
+    catalogued first, then exported largest first by up to `concurrency` worker processes.
+    With `checkpoint_path`, each exported placement is recorded in a SQLite manifest so
+    an interrupted run resumes where it stopped instead of starting over. With
+    count_documents=False the catalog skips the document counts (see catalog_entry).
+    """
+    session = session_factory(password)
+    try:
+        if server is None:
+            # Get all address books (NSF databases), includes local and remote NSF files
+            catalog = catalog_databases(session.AddressBooks, count_documents=count_documents)
+        else:
+            catalog = build_catalog(session, server, count_documents)
+    finally:
+        release_session(session_factory, session)
 
-    print(f"[INFO] Found {len(dbs)} databases in the workspace.")
+    print(f"[INFO] Found {len(catalog)} databases in the workspace.")
 
-    for db in dbs:
-        if not db.IsOpen:
-            db.Open()  # This is an illustrative call; refer to your API documentation.
-        db_output_dir = os.path.join(output_dir, sanitize_folder_name(db.Title))
-        print(f"[INFO] Processing database: {db.Title}")
-        extract_all_objects(password, db, db_output_dir)
-        extract_all_views_with_categories(password, db, db_output_dir)
+    job = functools.partial(export_database, password, output_dir, link_mode, checkpoint_path, watchdog=watchdog)
+    # Worker processes keep their own metrics; the progress line covers in-process crawls
+    counted = count_documents and concurrency <= 1
+    run_metrics.start(total=sum(entry.doc_count or 0 for entry in catalog) if counted else None)
+    try:
+        crawl(password, catalog, job, output_dir, concurrency, session_factory)
+    finally:
+        run_metrics.stop()
 
     print("[DONE] Processed all databases.")
 
 if __name__ == '__main__':
-    enumerate_all_databases(LOTUS_PASSWORD, OUTPUT_DIR)
+    parser = argparse.ArgumentParser(description="Export every view of every address book database.")
+    parser.add_argument("--password", default=LOTUS_PASSWORD)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--link-mode", choices=LINK_MODES, default="hardlink",
+                        help="How documents listed in several views are placed after the first extraction.")
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="SQLite checkpoint file; rerun with the same file to resume an interrupted export.")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Databases exported in parallel, each in its own process.")
+    parser.add_argument("--server", default=None,
+                        help="Crawl this server's data directory (\"\" for local) instead of the address books.")
+    parser.add_argument("--no-doc-count", dest="count_documents", action="store_false",
+                        help="Catalog databases by size only; counting reads every document collection.")
+    parser.add_argument("--trace", metavar="PREFIX",
+                        help="Trace every COM call; writes PREFIX.txt (cost report) and PREFIX.folded (flamegraph).")
+    add_lifetime_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    setup_from_args(args)
+    session_factory, tracer = trace_session_factory(args.trace)
+    try:
+        enumerate_all_databases(args.password, args.output_dir, link_mode=args.link_mode,
+                                checkpoint_path=args.checkpoint, concurrency=args.concurrency,
+                                server=args.server, watchdog=watchdog_from_args(args),
+                                session_factory=session_factory, count_documents=args.count_documents)
+    finally:
+        if tracer is not None:
+            tracer.write(args.trace)
@@ -0,0 +1,836 @@
+"""
+In-process stand-in for the Lotus.NotesSession COM surface the extractors use, so they
+can run (and be benchmarked) without Windows or a Notes client.
+
+    notes = FakeNotes({"library.nsf": CorpusSpec(documents=5000)}, latency=0.0005)
+    blended_export("", "library.nsf", VIEW_NAME, "out", session_factory=notes)
+    print(notes.total_calls(), notes.bytes_extracted)
+
+Documents are generated lazily and deterministically from their index, so any number of
+sessions (threads or processes) see the same corpus. Every COM-style member access
+(capitalized attribute or method) is counted per "Class.Member" and can be delayed by
+an injected per-call latency.
+"""
+import binascii
+import datetime
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+from doc_snapshot import DATETIMES, NAMES, NUMBERS, RICHTEXT, TEXT
+
+CATEGORIZED_VIEW = "English\\Document\\By Category"
+FLAT_VIEW = "All Documents"
+BASE_TIME = datetime.datetime(2020, 1, 1)
+
+CorpusSpec = namedtuple("CorpusSpec", [
+    "documents",                 # number of data documents
+    "items_per_document",        # items per document, including Subject/Form/Category/Body
+    "attachments_per_document",  # mean attachments per document (0 for none)
+    "attachment_sizes",          # attachment sizes in bytes, drawn uniformly
+    "shared_attachments",        # fraction of attachments that are the same few shared files
+    "category_depth",            # levels in each category path
+    "categories_per_level",      # distinct categories at each level
+    "folder_ratio",              # fraction of documents also filed in $Folders
+    "unviewed_ratio",            # fraction of documents missing from the categorized view
+    "title",
+    "seed",
+    "forms",                     # form names, assigned round-robin by document index
+    "response_ratio",            # fraction of documents that are responses to an earlier document
+], defaults=(1000, 12, 1.0, (20_000, 150_000, 1_500_000), 0.2, 2, 5, 0.3, 0.05, None, 0, ("Memo",), 0.0))
+
+SHARED_FILES = ("logo.jpg", "template.docx", "policy.pdf", "banner.png", "signature.gif")
+
+
+class ComObject:
+    """Base for fake COM objects: capitalized member access is counted and delayed."""
+
+    def __getattribute__(self, name):
+        if name[:1].isupper():
+            object.__getattribute__(self, "_notes").call(type(self).__name__, name)
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        if name[:1].isupper():
+            object.__getattribute__(self, "_notes").call(type(self).__name__, name)
+        object.__setattr__(self, name, value)
+
+    def _members(self, **members):
+        """Initial member values; setting them here isn't a counted call."""
+        for name, value in members.items():
+            object.__setattr__(self, name, value)
+
+    @property
+    def _oleobj_(self):
+        return self
+
+    @_oleobj_.setter
+    def _oleobj_(self, value):
+        # com_lifetime.release() sets it to None, like dropping a pywin32 proxy's interface
+        if value is None:
+            object.__getattribute__(self, "_notes").untrack(self)
+
+
+class FakeNotes:
+    """
+    The fake backend and a session factory in one: `FakeNotes(...)(password)` returns a
+    FakeSession. `databases` maps file paths to CorpusSpecs. `latency` seconds are added
+    to every counted call; `call_latency` overrides it per member name (e.g. ExtractFile).
+    `load_latency` seconds more are added per other call in flight at the same time, like
+    a server slowing down under concurrent load. With `retain_handles`, documents and
+    view entries stay alive (like Notes back-end objects) until they are released
+    (com_lifetime.release) or their session is.
+    """
+
+    def __init__(self, databases=None, latency=0.0, call_latency=None, server="", load_latency=0.0,
+                 retain_handles=False):
+        self.databases = databases if databases is not None else {"fake.nsf": CorpusSpec()}
+        self.latency = latency
+        self.call_latency = call_latency or {}
+        self.load_latency = load_latency
+        self.in_flight = 0
+        self.retain_handles = retain_handles
+        # id(object) -> (session, object) for every object handed out and not yet released
+        self.live = {}
+        self.server = server
+        self.calls = Counter()
+        self.bytes_extracted = 0
+        # Per-database change log used by GetModifiedDocuments: index -> change number
+        self.changes = {path: {} for path in self.databases}
+        self.deleted = {path: set() for path in self.databases}
+        self.clock = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["live"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, password):
+        session = FakeSession(self)
+        session.Initialize(password)
+        return session
+
+    def release(self, session):
+        """Session factory hook (see session_pool.release_session): drops the session's objects."""
+        with self._lock:
+            self.live = {key: (owner, obj) for key, (owner, obj) in self.live.items() if owner is not session}
+
+    def hand_out(self, session, obj):
+        if self.retain_handles:
+            with self._lock:
+                self.live[id(obj)] = (session, obj)
+        return obj
+
+    def untrack(self, obj):
+        with self._lock:
+            self.live.pop(id(obj), None)
+
+    def live_handles(self):
+        return len(self.live)
+
+    def call(self, class_name, member):
+        with self._lock:
+            self.calls[f"{class_name}.{member}"] += 1
+            busy = self.in_flight
+            self.in_flight += 1
+        try:
+            delay = self.call_latency.get(member, self.latency) + self.load_latency * busy
+            if delay:
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_extracted = 0
+
+    def modify(self, nsf_path, indices):
+        """Mark documents as modified, for incremental (GetModifiedDocuments) runs."""
+        with self._lock:
+            for index in indices:
+                self.clock += 1
+                self.changes[nsf_path][index] = self.clock
+
+    def delete(self, nsf_path, indices):
+        """Delete documents; they come back from GetModifiedDocuments as deletion stubs."""
+        with self._lock:
+            for index in indices:
+                self.clock += 1
+                self.changes[nsf_path][index] = self.clock
+                self.deleted[nsf_path].add(index)
+
+
+class FakeDateTime(ComObject):
+    """A NotesDateTime holding one moment (an aware datetime)."""
+
+    def __init__(self, notes, moment):
+        self._notes = notes
+        self._moment = moment
+
+    @property
+    def LocalTime(self):
+        return self._moment.astimezone().strftime("%m/%d/%Y %I:%M:%S %p")
+
+    @property
+    def LSGMTTime(self):
+        return self._moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+    @property
+    def LSLocalTime(self):
+        return self._moment.astimezone().replace(tzinfo=None)
+
+    @LSLocalTime.setter
+    def LSLocalTime(self, value):
+        # A naive value is in this machine's time zone, as in Notes
+        self._moment = value.astimezone(datetime.timezone.utc)
+
+
+class FakeSession(ComObject):
+    def __init__(self, notes):
+        self._notes = notes
+        self._databases = {}
+
+    def Initialize(self, password=""):
+        pass
+
+    def GetDatabase(self, server, nsf_path):
+        return self._database(server, nsf_path)
+
+    def _database(self, server, nsf_path):
+        db = self._databases.get(nsf_path)
+        if db is None:
+            db = self._databases[nsf_path] = FakeDatabase(self._notes, server or self._notes.server, nsf_path)
+            db._session = self
+        return db
+
+    def GetDbDirectory(self, server):
+        return FakeDbDirectory(self, server)
+
+    def CreateDateTime(self, text):
+        if text == "Today":
+            return FakeDateTime(self._notes, datetime.datetime.now(datetime.timezone.utc))
+        return FakeDateTime(self._notes, datetime.datetime.strptime(text, "%m/%d/%Y %I:%M:%S %p").astimezone())
+
+    def CreateStream(self):
+        return FakeStream(self._notes)
+
+    def CreateDXLExporter(self):
+        return FakeDXLExporter(self._notes)
+
+    @property
+    def AddressBooks(self):
+        # Every fake database, so the address-book crawl covers the whole fake directory
+        return tuple(self._database("", path) for path in self._notes.databases)
+
+    @property
+    def CurrentDatabase(self):
+        return self._database("", next(iter(self._notes.databases)))
+
+
+class FakeDbDirectory(ComObject):
+    def __init__(self, session, server):
+        self._notes = session._notes
+        self._session = session
+        self._server = server
+        self._paths = iter(())
+
+    def GetFirstDatabase(self, file_type):
+        self._paths = iter(list(self._notes.databases))
+        return self._next()
+
+    def GetNextDatabase(self):
+        return self._next()
+
+    def _next(self):
+        path = next(self._paths, None)
+        return self._session._database(self._server, path) if path else None
+
+
+class FakeDatabase(ComObject):
+    def __init__(self, notes, server, nsf_path):
+        self._notes = notes
+        self._spec = notes.databases.get(nsf_path)
+        self._path = nsf_path
+        self._views = None
+        self._session = None
+        # Like NotesSession.GetDatabase: existing databases come back open
+        self._members(Server=server, FilePath=nsf_path, IsOpen=self._spec is not None, IsFTIndexed=True)
+
+    def Open(self):
+        if self._spec is None:
+            raise Exception(f"Database {self._path} has not been opened yet")
+        self._members(IsOpen=True)
+
+    @property
+    def Title(self):
+        return self._spec.title or os.path.splitext(os.path.basename(self._path))[0]
+
+    @property
+    def Size(self):
+        spec = self._spec
+        mean_attachment = sum(spec.attachment_sizes) / len(spec.attachment_sizes) if spec.attachment_sizes else 0
+        return float(spec.documents * (spec.items_per_document * 64 + spec.attachments_per_document * mean_attachment))
+
+    @property
+    def AllDocuments(self):
+        return FakeDocumentCollection(self, self._live_indices())
+
+    @property
+    def Views(self):
+        return self._view_list()
+
+    def _view_list(self):
+        if self._views is None:
+            self._views = (FakeView(self, CATEGORIZED_VIEW, categorized=True),
+                           FakeView(self, FLAT_VIEW, categorized=False))
+        return self._views
+
+    def GetView(self, name):
+        for view in self._view_list():
+            if view._name.lower() == name.lower():
+                return view
+        return None
+
+    def GetDocumentByUNID(self, unid):
+        index = unid_index(unid)
+        if index is None or not 0 <= index < self._spec.documents or index in self._notes.deleted[self._path]:
+            raise Exception(f"Invalid universal id: {unid}")
+        return self._notes.hand_out(self._session, FakeDocument(self, index))
+
+    def GetModifiedDocuments(self, since=None, note_class=1):
+        changes = self._notes.changes[self._path]
+        if since is None:
+            indices = range(self._spec.documents)
+        else:
+            after = since._moment
+            indices = sorted(i for i, change in changes.items() if change_time(change) > after)
+        collection = FakeDocumentCollection(self, list(indices))
+        collection._members(UntilTime=FakeDateTime(self._notes, change_time(self._notes.clock)))
+        return collection
+
+    def Search(self, formula, since=None, max_docs=0):
+        """
+        Supports @All, @IsResponseDoc, `Item = "a" : "b"` and `@Modified > @Date(...)`
+        clauses joined by &.
+        """
+        if since is not None:
+            raise Exception("The fake only supports Search without a cutoff date")
+        clauses = [_formula_clause(clause) for clause in _split_formula(formula)]
+        indices = [i for i in self._live_indices() if all(clause(FakeDocument(self, i)) for clause in clauses)]
+        return FakeDocumentCollection(self, indices[:max_docs or None])
+
+    def FTSearch(self, query, max_docs=0):
+        return FakeDocumentCollection(self, _ft_matches(self, self._live_indices(), query)[:max_docs or None])
+
+    def _live_indices(self):
+        deleted = self._notes.deleted[self._path]
+        return [i for i in range(self._spec.documents) if i not in deleted]
+
+    def CreateNoteCollection(self, select_all):
+        return FakeNoteCollection(self)
+
+    def category_path(self, index):
+        """Category path of a document: its leaf (index modulo leaf count) spelled out per level."""
+        spec = self._spec
+        leaf = index % (spec.categories_per_level ** spec.category_depth)
+        parts = []
+        for level in range(spec.category_depth):
+            leaf, digit = divmod(leaf, spec.categories_per_level)
+            parts.append(f"Topic {level + 1}.{digit}")
+        return parts
+
+    def parent_index(self, index):
+        """Index of the document `index` responds to, or None for a main document."""
+        spec = self._spec
+        if not spec.response_ratio or not index:
+            return None
+        rng = _rng(spec, index, 2)
+        if rng.random() >= spec.response_ratio:
+            return None
+        # Replies land close to what they answer
+        return rng.randrange(max(0, index - 20), index)
+
+    def in_categorized_view(self, index):
+        spec = self._spec
+        if not spec.unviewed_ratio:
+            return True
+        return _rng(spec, index, 1).random() >= spec.unviewed_ratio
+
+
+class FakeDocumentCollection(ComObject):
+    def __init__(self, db, indices):
+        self._notes = db._notes
+        self._db = db
+        self._indices = indices
+        self._position = {index: pos for pos, index in enumerate(indices)}
+
+    @property
+    def Count(self):
+        return len(self._indices)
+
+    def GetFirstDocument(self):
+        return self._document(0)
+
+    def GetNextDocument(self, doc):
+        return self._document(self._position[doc._index] + 1)
+
+    def _document(self, pos):
+        if pos >= len(self._indices):
+            return None
+        return self._notes.hand_out(self._db._session, FakeDocument(self._db, self._indices[pos]))
+
+    def FTSearch(self, query, max_docs=0):
+        """Narrows the collection in place, like NotesDocumentCollection.FTSearch."""
+        self._indices = _ft_matches(self._db, self._indices, query)[:max_docs or None]
+        self._position = {index: pos for pos, index in enumerate(self._indices)}
+        return len(self._indices)
+
+
+def _split_formula(formula):
+    clauses = [clause.strip() for clause in formula.split(" & ")]
+    return [clause[1:-1].strip() if clause.startswith("(") and clause.endswith(")") else clause
+            for clause in clauses]
+
+
+def _formula_clause(clause):
+    """A predicate over FakeDocuments for one supported selection formula clause."""
+    if clause == "@All":
+        return lambda doc: True
+    if clause == "@IsResponseDoc":
+        return lambda doc: doc._db.parent_index(doc._index) is not None
+    match = re.fullmatch(r"@Modified > @Date\(([\d; ]+)\)", clause)
+    if match:
+        cutoff = datetime.datetime(*(int(part) for part in match.group(1).split(";")))
+        return lambda doc: doc._last_modified() > cutoff
+    match = re.fullmatch(r'(\$?\w+) = ("(?:[^"\\]|\\.)*"(?: : "(?:[^"\\]|\\.)*")*)', clause)
+    if match:
+        wanted = {re.sub(r"\\(.)", r"\1", value).lower()
+                  for value in re.findall(r'"((?:[^"\\]|\\.)*)"', match.group(2))}
+        name = match.group(1)
+        return lambda doc: any(str(value).lower() in wanted for value in doc._item_values(name))
+    raise Exception(f"Formula clause not supported by the fake: {clause}")
+
+
+def _ft_matches(db, indices, query):
+    """Indices whose item text contains every word of the query (case-insensitive)."""
+    words = [word.lower() for word in query.replace('"', " ").split() if word.upper() not in ("AND", "OR")]
+    matches = []
+    for index in indices:
+        text = " ".join(str(value) for item in FakeDocument(db, index)._item_list()
+                        for value in item._values).lower()
+        if all(word in text for word in words):
+            matches.append(index)
+    return matches
+
+
+class FakeNoteCollection(ComObject):
+    def __init__(self, db):
+        self._notes = db._notes
+        self._db = db
+        self._indices = []
+        self._members(SelectDocuments=False)
+
+    def BuildCollection(self):
+        if self.SelectDocuments:
+            deleted = self._notes.deleted[self._db._path]
+            self._indices = [i for i in range(self._db._spec.documents) if i not in deleted]
+
+    @property
+    def Count(self):
+        return len(self._indices)
+
+
+class FakeStream(ComObject):
+    def __init__(self, notes):
+        self._notes = notes
+        self._file = None
+
+    def Open(self, path, charset="UTF-8"):
+        self._file = open(path, "ab")
+        return True
+
+    def Close(self):
+        self._file.close()
+
+
+class FakeDXLExporter(ComObject):
+    """Writes the selected documents as DXL, in the shape a Notes DXLExporter produces."""
+
+    def __init__(self, notes):
+        self._notes = notes
+        self._members(OutputDOCTYPE=True)
+        self._input = None
+        self._output = None
+
+    def SetInput(self, source):
+        self._input = source
+
+    def SetOutput(self, stream):
+        self._output = stream
+
+    def Process(self):
+        source = self._input
+        db = source._db
+        write = self._output._file.write
+        write(f"<?xml version='1.0' encoding='utf-8'?>\n<database xmlns='http://www.lotus.com/dxl' "
+              f"version='9.0' title={quoteattr(db.Title)} path={quoteattr(db._path)}>\n".encode())
+        for index in source._indices:
+            document = FakeDocument(db, index)
+            write(f"<document form='Memo'>\n<noteinfo noteid='{document._note_id()}' "
+                  f"unid='{document_unid(index)}' sequence='1'>\n<modified><datetime>"
+                  f"{_dxl_datetime(document._last_modified())}</datetime></modified>\n</noteinfo>\n".encode())
+            attachments = []
+            for item in document._item_list():
+                write(_dxl_item(item).encode())
+                if item._type == RICHTEXT:
+                    attachments.extend(item._embedded)
+            for attachment in attachments:
+                write(f"<item name='$FILE' summary='true'><object><file hosttype='msdos' compression='none' "
+                      f"name={quoteattr(attachment._name)}><filedata>\n".encode())
+                for chunk in attachment._chunks():
+                    write(binascii.b2a_base64(chunk))
+                write(b"</filedata></file></object></item>\n")
+                with self._notes._lock:
+                    self._notes.bytes_extracted += attachment._size
+            write(b"</document>\n")
+        write(b"</database>\n")
+
+
+def _dxl_datetime(value):
+    return value.strftime("%Y%m%dT%H%M%S,00")
+
+
+def _dxl_item(item):
+    """One <item> element for a FakeItem's values."""
+    item_type = item._type
+    values = item._values
+    if item_type == RICHTEXT:
+        body = "".join(f"<par>{escape(str(value))}</par>" for value in values)
+        return f"<item name={quoteattr(item._name)}><richtext>{body}</richtext></item>\n"
+    flag = " names='true'" if item_type == NAMES else ""
+    if item_type == NUMBERS:
+        kind, text = "number", [repr(value) for value in values]
+    elif item_type == DATETIMES:
+        kind, text = "datetime", [_dxl_datetime(value) for value in values]
+    else:
+        kind, text = "text", [escape(str(value)) for value in values]
+    elements = "".join(f"<{kind}>{value}</{kind}>" for value in text)
+    if len(values) != 1:
+        elements = f"<{kind}list>{elements}</{kind}list>"
+    return f"<item name={quoteattr(item._name)}{flag}>{elements}</item>\n"
+
+
+def change_time(change):
+    """When change number `change` happened: the fake's clock ticks one second per change."""
+    return BASE_TIME.replace(tzinfo=datetime.timezone.utc) + datetime.timedelta(seconds=change)
+
+
+def document_unid(index):
+    return f"FA4E{index:028X}"
+
+
+def unid_index(unid):
+    if not unid or not unid.startswith("FA4E"):
+        return None
+    try:
+        return int(unid[4:], 16)
+    except ValueError:
+        return None
+
+
+def _rng(spec, index, stream=0):
+    return random.Random(f"{spec.seed}:{stream}:{index}")
+
+
+class FakeDocument(ComObject):
+    def __init__(self, db, index):
+        self._notes = db._notes
+        self._db = db
+        self._index = index
+        self._items = None
+
+    @property
+    def UniversalID(self):
+        return document_unid(self._index)
+
+    @property
+    def NoteID(self):
+        return self._note_id()
+
+    def _note_id(self):
+        return f"{(self._index + 1) * 4 + 2:X}"
+
+    @property
+    def IsDeleted(self):
+        return self._deleted()
+
+    @property
+    def IsValid(self):
+        return not self._deleted()
+
+    def _deleted(self):
+        return self._index in self._notes.deleted[self._db._path]
+
+    @property
+    def LastModified(self):
+        return self._last_modified()
+
+    def _last_modified(self):
+        change = self._notes.changes[self._db._path].get(self._index, 0)
+        return BASE_TIME + datetime.timedelta(days=self._index % 1000, seconds=change)
+
+    @property
+    def Items(self):
+        return self._item_list()
+
+    def _item_list(self):
+        if self._deleted():
+            raise Exception("Document has been deleted")
+        if self._items is None:
+            self._items = tuple(self._build_items())
+        return self._items
+
+    def GetItemValue(self, name):
+        return self._item_values(name)
+
+    def _item_values(self, name):
+        item = self._item(name)
+        return item._values if item is not None else ()
+
+    def GetFirstItem(self, name):
+        return self._item(name)
+
+    def _item(self, name):
+        for item in self._item_list():
+            if item._name.lower() == name.lower():
+                return item
+        return None
+
+    def _build_items(self):
+        spec = self._db._spec
+        notes = self._notes
+        index = self._index
+        rng = _rng(spec, index)
+        category = "\\".join(self._db.category_path(index))
+        change = notes.changes[self._db._path].get(index, 0)
+        parent = self._db.parent_index(index)
+        subject = f"Document {index}" if parent is None else f"Re: Document {parent} ({index})"
+        items = [
+            FakeItem(notes, "Subject", TEXT, (subject + (f" (rev {change})" if change else ""),)),
+            FakeItem(notes, "Form", TEXT, (spec.forms[index % len(spec.forms)],)),
+            FakeItem(notes, "Category", TEXT, (category,)),
+            FakeItem(notes, "Authors", NAMES, (f"CN=Author {index % 7}/O=Fake",)),
+            FakeItem(notes, "DocNumber", NUMBERS, (float(index),)),
+            FakeItem(notes, "PublishedDate", DATETIMES, (BASE_TIME + datetime.timedelta(days=index % 1000),)),
+        ]
+        if parent is not None:
+            items.append(FakeItem(notes, "$Ref", TEXT, (document_unid(parent),)))
+        if rng.random() < spec.folder_ratio:
+            items.append(FakeItem(notes, "$Folders", TEXT, (category, f"Archive\\{index % 4}")))
+        filler = max(0, spec.items_per_document - len(items) - 1)
+        for n in range(filler):
+            items.append(FakeItem(notes, f"Field{n}", TEXT, (f"value {index}.{n} " * rng.randint(1, 8),)))
+
+        attachments = []
+        if spec.attachments_per_document and spec.attachment_sizes:
+            count = int(spec.attachments_per_document) + (rng.random() < spec.attachments_per_document % 1)
+            for n in range(count):
+                if rng.random() < spec.shared_attachments:
+                    shared = rng.randrange(len(SHARED_FILES))
+                    name = SHARED_FILES[shared]
+                    size = spec.attachment_sizes[shared % len(spec.attachment_sizes)]
+                    seed = f"shared:{shared}"
+                else:
+                    name = f"attachment_{index}_{n}.pdf"
+                    size = rng.choice(spec.attachment_sizes)
+                    seed = f"{spec.seed}:{index}:{n}"
+                attachments.append(FakeEmbeddedObject(notes, name, size, seed))
+        items.append(FakeItem(notes, "Body", RICHTEXT, (f"Body of document {index}",), tuple(attachments)))
+        return items
+
+
+class FakeItem(ComObject):
+    def __init__(self, notes, name, item_type, values, embedded_objects=None):
+        self._notes = notes
+        self._name = name
+        self._type = item_type
+        self._values = values
+        self._embedded = embedded_objects or ()
+        self._released = False
+        for embedded_obj in self._embedded:
+            embedded_obj._item = self
+        self._members(Name=name, Type=item_type, Values=values)
+        if item_type == RICHTEXT:
+            self._members(EmbeddedObjects=self._embedded)
+
+    @property
+    def _oleobj_(self):
+        return self
+
+    @_oleobj_.setter
+    def _oleobj_(self, value):
+        # Like Notes, a released rich text item takes its embedded objects with it
+        if value is None:
+            self._released = True
+
+
+class FakeEmbeddedObject(ComObject):
+    def __init__(self, notes, name, size, seed):
+        self._notes = notes
+        self._seed = seed
+        self._size = size
+        self._name = name
+        self._item = None
+        self._members(Name=name, FileSize=size)
+
+    def ExtractFile(self, path):
+        if self._item is not None and self._item._released:
+            raise RuntimeError(f"Notes error: the item holding '{self._name}' has been released")
+        with open(path, "wb") as f:
+            for chunk in self._chunks():
+                f.write(chunk)
+        with self._notes._lock:
+            self._notes.bytes_extracted += self._size
+
+    def _chunks(self):
+        """The attachment's deterministic content, 4 KB at a time (a multiple of 3, for base64)."""
+        header = f"{self._seed}\n".encode()
+        pattern = (header * (4095 // len(header) + 1))[:4095]
+        remaining = self._size
+        while remaining > 0:
+            chunk = pattern[:remaining]
+            yield chunk
+            remaining -= len(chunk)
+
+
+class FakeView(ComObject):
+    def __init__(self, db, name, categorized):
+        self._notes = db._notes
+        self._db = db
+        self._categorized = categorized
+        self._index = None
+        self._name = name
+        self._members(Name=name, AutoUpdate=True)
+
+    def _entries(self):
+        """View index as (level, category name) and (None, document index) rows, built once."""
+        if self._index is None:
+            db = self._db
+            spec = db._spec
+            deleted = self._notes.deleted[db._path]
+            rows = []
+            if self._categorized:
+                leaves = spec.categories_per_level ** spec.category_depth
+                previous = []
+                for leaf in range(leaves):
+                    docs = [i for i in range(leaf, spec.documents, leaves)
+                            if i not in deleted and db.in_categorized_view(i)]
+                    if not docs:
+                        continue
+                    path = db.category_path(leaf)
+                    shared = 0
+                    while shared < len(previous) and previous[shared] == path[shared]:
+                        shared += 1
+                    for level in range(shared, len(path)):
+                        rows.append((level + 1, path[level]))
+                    previous = path
+                    rows.extend((None, i) for i in docs)
+            else:
+                rows = [(None, i) for i in range(spec.documents) if i not in deleted]
+            self._index = rows
+        return self._index
+
+    @property
+    def AllEntries(self):
+        return FakeViewEntryCollection(self)
+
+    def CreateViewNav(self):
+        return FakeViewNavigator(self)
+
+    def _entry(self, pos):
+        rows = self._entries()
+        if pos >= len(rows):
+            return None
+        return self._notes.hand_out(self._db._session, FakeViewEntry(self, pos, *rows[pos]))
+
+
+class FakeViewEntryCollection(ComObject):
+    def __init__(self, view):
+        self._notes = view._notes
+        self._view = view
+
+    @property
+    def Count(self):
+        return len(self._view._entries())
+
+    def GetFirstEntry(self):
+        return self._view._entry(0)
+
+    def GetNextEntry(self, entry):
+        return self._view._entry(entry._pos + 1)
+
+
+class FakeViewNavigator(ComObject):
+    def __init__(self, view):
+        self._notes = view._notes
+        self._view = view
+        self._members(BufferMaxEntries=0, EntryOptions=0)
+
+    def GetFirst(self):
+        return self._view._entry(0)
+
+    def GetNext(self, entry):
+        return self._view._entry(entry._pos + 1)
+
+
+class FakeViewEntry(ComObject):
+    def __init__(self, view, pos, level, value):
+        self._notes = view._notes
+        self._view = view
+        self._pos = pos
+        self._level = level
+        self._value = value
+
+    @property
+    def IsCategory(self):
+        return self._level is not None
+
+    @property
+    def IsDocument(self):
+        return self._level is None
+
+    @property
+    def Level(self):
+        return self._level if self._level is not None else 0
+
+    @property
+    def UniversalID(self):
+        return document_unid(self._value) if self._level is None else ""
+
+    @property
+    def ColumnValues(self):
+        if self._level is not None:
+            return (self._value,)
+        category = "\\".join(self._view._db.category_path(self._value))
+        return (category, f"Document {self._value}")
+
+    @property
+    def Document(self):
+        if self._level is not None:
+            return None
+        return self._notes.hand_out(self._view._db._session, FakeDocument(self._view._db, self._value))
@@ -0,0 +1,150 @@
+"""
+Typed item serialization for document.txt and the record sinks.
+
+Items are formatted by their NotesItem.Type instead of through repr() of the COM
+tuple: text, names, readers/authors and rich text stay text, numbers stay numbers
+and date/times become ISO-8601 (nan and inf become strings, which JSON lacks). In
+document.txt a single value is written as one JSON value and several as a JSON array,
+so multi-line text stays on its item's line; records always carry a JSON array. A
+whole document is rendered into one string, so the extractors write it with a single call.
+"""
+import datetime
+import json
+import math
+import operator
+from itertools import repeat
+
+from doc_snapshot import AUTHORS, DATETIMES, NAMES, NUMBERS, READERS, RICHTEXT, TEXT
+
+FOOTER = "--------------------\n"
+# Item types pywin32 already hands over as str (numbers come as float)
+TEXT_TYPES = frozenset((TEXT, NAMES, READERS, AUTHORS, RICHTEXT))
+_FAST_TYPES = TEXT_TYPES | {NUMBERS, DATETIMES}
+_ISOFORMAT = datetime.datetime.isoformat
+_EPOCH = datetime.datetime.min
+_DAYS = operator.attrgetter("days")
+_SECONDS = operator.attrgetter("seconds")
+_MICROSECONDS = operator.attrgetter("microseconds")
+_TZINFO = operator.attrgetter("tzinfo")
+_UTCOFFSET = operator.methodcaller("utcoffset")
+
+
+def plain_value(value):
+    """One COM value as a JSON type (pywintypes datetimes are datetime subclasses)."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [plain_value(v) for v in value]
+    return str(value)
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, allow_nan=False, default=plain_value)
+
+
+class _DayText(dict):
+    """Days since datetime.min -> "YYYY-MM-DDT", filled in as days are met."""
+
+    def __missing__(self, days):
+        text = self[days] = (_EPOCH + datetime.timedelta(days=days)).date().isoformat() + "T"
+        return text
+
+
+class _TimeText(dict):
+    """Seconds since midnight -> "HH:MM:SS" (at most 86400 entries)."""
+
+    def __missing__(self, seconds):
+        hours, rest = divmod(seconds, 3600)
+        text = self[seconds] = f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+        return text
+
+
+class _OffsetText(dict):
+    """utcoffset() -> the "+HH:MM" isoformat() appends ("" for naive values)."""
+
+    def __missing__(self, offset):
+        text = self[offset] = "" if offset is None else _EPOCH.replace(
+            year=2000, tzinfo=datetime.timezone(offset)).isoformat()[19:]
+        return text
+
+
+_DAY_TEXT = _DayText()
+_TIME_TEXT = _TimeText()
+_OFFSET_TEXT = _OffsetText()
+
+
+def isoformat_all(values):
+    """
+    isoformat() of many datetimes sharing one tzinfo: each distinct day, time of day and
+    UTC offset is formatted once per run and the rest happens in C-level maps. Values
+    with microseconds go through isoformat(); anything else raises TypeError.
+    """
+    tzinfo = getattr(values[0], "tzinfo", None)
+    # Naive minus aware raises; aware values must share the tzinfo, so that subtraction
+    # ignores the offset and gives wall-clock days and seconds
+    if tzinfo is not None and not all(map(operator.is_, map(_TZINFO, values), repeat(tzinfo))):
+        raise TypeError("values do not share one tzinfo")
+    deltas = list(map(operator.sub, values, repeat(_EPOCH.replace(tzinfo=tzinfo), len(values))))
+    if any(map(_MICROSECONDS, deltas)):
+        return list(map(_ISOFORMAT, values))
+    text = map(operator.add, map(_DAY_TEXT.__getitem__, map(_DAYS, deltas)),
+               map(_TIME_TEXT.__getitem__, map(_SECONDS, deltas)))
+    if tzinfo is None:
+        return list(text)
+    return list(map(operator.add, text, map(_OFFSET_TEXT.__getitem__, map(_UTCOFFSET, values))))
+
+
+def json_values(item_type, values):
+    """Item values as a list of JSON types; rich text's single string becomes a one-element list."""
+    if values is None:
+        return []
+    if isinstance(values, str) or not isinstance(values, (list, tuple)):
+        values = (values,)
+    if item_type in TEXT_TYPES:
+        return list(values)
+    # Empty date fields come back as ("",); time zone aware values keep their offset
+    return [plain_value(v) for v in values]
+
+
+def format_values(item_type, values):
+    """
+    Item values as document.txt text: a single value as JSON, several as a JSON array.
+    Text and number lists take one encoder call, which escapes the text and refuses
+    nan/inf, with no per-value plain_value(); date/times are formatted by isoformat_all()
+    and, as ISO-8601 has nothing to escape, quoted in one join. Anything else (nan, empty
+    dates, mixed time zones) goes through json_values.
+    """
+    if isinstance(values, (list, tuple)) and values and item_type in _FAST_TYPES:
+        try:
+            if item_type == DATETIMES:
+                text = '", "'.join(isoformat_all(values))
+                return f'"{text}"' if len(values) == 1 else f'["{text}"]'
+            return _ENCODER.encode(values[0] if len(values) == 1 else values)
+        except (AttributeError, TypeError, ValueError):
+            pass
+    converted = json_values(item_type, values)
+    return _ENCODER.encode(converted[0] if len(converted) == 1 else converted)
+
+
+def item_line(name, item_type, values, error=None):
+    if error is not None:
+        return f"{name}: <Error reading value: {error}>\n"
+    return f"{name}: {format_values(item_type, values)}\n"
+
+
+def item_record(item):
+    """One ItemSnapshot as a record sink item."""
+    return {"name": item.name, "type": item.type,
+            "values": json_values(item.type, item.values) if item.error is None else None,
+            "error": item.error}
+
+
+def document_text(snapshot):
+    """document.txt contents for a snapshot, as one string."""
+    lines = [f"----- Document: {snapshot.subject()} ({snapshot.unid[:8] or 'unknown'}) -----\n"]
+    lines.extend(item_line(item.name, item.type, item.values, item.error) for item in snapshot.items)
+    lines.append(FOOTER)
+    return "".join(lines)
@@ -0,0 +1,151 @@
+import argparse
+import sqlite3
+import threading
+import time
+
+from doc_snapshot import AUTHORS, NAMES, READERS, RICHTEXT, TEXT
+
+# Item types whose values go into the searchable body
+TEXT_TYPES = (TEXT, RICHTEXT, NAMES, READERS, AUTHORS)
+# bm25 weights for the unid, subject, categories and body columns
+WEIGHTS = (0.0, 10.0, 4.0, 1.0)
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    unid UNINDEXED, subject, categories, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS placements (
+    unid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (unid, path)
+);
+"""
+
+_SEARCH = f"""
+SELECT documents.unid, documents.subject,
+       snippet(documents, 3, '[', ']', '...', 12),
+       bm25(documents, {", ".join(map(str, WEIGHTS))}) AS score,
+       (SELECT group_concat(path, char(10)) FROM placements WHERE placements.unid = documents.unid)
+FROM documents WHERE documents MATCH ? ORDER BY score LIMIT ?
+"""
+
+
+def document_body(snapshot):
+    """Text, names and rich text values of the document's own (non-$) items, one per line."""
+    lines = []
+    for item in snapshot.items:
+        if item.type not in TEXT_TYPES or item.error is not None or item.name.startswith("$"):
+            continue
+        values = item.values if isinstance(item.values, (list, tuple)) else (item.values,)
+        lines.extend(str(value) for value in values if value)
+    return "\n".join(lines)
+
+
+class FtsIndex:
+    """
+    SQLite FTS5 index of exported documents: subject, category paths and text items,
+    plus every output path the document was written or linked to. Documents are
+    buffered and inserted in one transaction every `batch_size`; re-adding a UNID
+    (a modified document) replaces its row. Safe to share between worker threads.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        # unid -> (subject, categories, body) to (re)insert, or None to delete; the last change wins
+        self._documents = {}
+        self._placements = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        raise TypeError("The search index can't be shared with worker processes; use threads.")
+
+    def add(self, snapshot, category_paths, paths):
+        """Index (or re-index) a document written to `paths`."""
+        categories = "\n".join("\\".join(parts) for parts in category_paths)
+        with self._lock:
+            self._documents[snapshot.unid] = (snapshot.subject(), categories, document_body(snapshot))
+            self._placements[snapshot.unid] = list(paths)
+            self.count += 1
+            if len(self._documents) >= self.batch_size:
+                self._flush_locked()
+
+    def add_placement(self, unid, path):
+        """Record one more path (e.g. a linked placement) for an indexed document."""
+        with self._lock:
+            self._placements.setdefault(unid, []).append(path)
+
+    def remove(self, unid):
+        with self._lock:
+            self._documents[unid] = None
+            self._placements[unid] = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._documents and not self._placements:
+            return
+        with self._conn:
+            # Replaced and removed documents lose their row and their earlier paths
+            replaced = [(unid,) for unid in self._documents]
+            self._conn.executemany("DELETE FROM documents WHERE unid = ?", replaced)
+            self._conn.executemany("DELETE FROM placements WHERE unid = ?", replaced)
+            self._conn.executemany(
+                "INSERT INTO documents (unid, subject, categories, body) VALUES (?, ?, ?, ?)",
+                [(unid, *row) for unid, row in self._documents.items() if row is not None])
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO placements (unid, path) VALUES (?, ?)",
+                [(unid, path) for unid, paths in self._placements.items() for path in paths])
+        self._documents = {}
+        self._placements = {}
+
+    def search(self, query, limit=20):
+        """[(unid, subject, snippet, bm25 score, [paths]), ...], best match first."""
+        with self._lock:
+            rows = self._conn.execute(_SEARCH, (query, limit)).fetchall()
+        return [(unid, subject, snippet, score, paths.split("\n") if paths else [])
+                for unid, subject, snippet, score, paths in rows]
+
+    def close(self):
+        """Flush, merge the index segments for faster queries and close."""
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.execute("INSERT INTO documents (documents) VALUES ('optimize')")
+            self._conn.close()
+
+
+def open_index(path):
+    """FtsIndex at `path`, or None when no index was asked for."""
+    return FtsIndex(path) if path else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Search an export's full-text index.")
+    parser.add_argument("index_path")
+    parser.add_argument("query", nargs="+",
+                        help="FTS5 query, e.g. budget AND subject:2019, or \"exact phrase\".")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = FtsIndex(args.index_path)
+    start = time.perf_counter()
+    try:
+        hits = index.search(" ".join(args.query), args.limit)
+    except sqlite3.OperationalError as e:
+        raise SystemExit(f"[ERROR] {e} (quote terms with punctuation, e.g. '\"2.3\"')")
+    elapsed = time.perf_counter() - start
+    for unid, subject, snippet, score, paths in hits:
+        print(f"{-score:8.2f}  {subject}  ({unid})")
+        print(f"          {' '.join(snippet.split())}")
+        for path in paths:
+            print(f"          {path}")
+    print(f"[INFO] {len(hits)} hits in {elapsed * 1000:.1f} ms")
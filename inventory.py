@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from delta_export import TOMBSTONE_NAME
+
+# Files the extractors write themselves; everything else in the tree is an attachment
+TEXT_NAMES = frozenset(("document.txt", TOMBSTONE_NAME))
+# Attachment size histogram upper bounds in bytes; the last bucket is open-ended
+SIZE_BUCKETS = (1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20, 100 << 20)
+CACHE_NAME = "inventory_cache.json"
+
+
+def _size_label(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:g} {unit}"
+        size /= 1024
+    return f"{size:g} TB"
+
+
+SIZE_LABELS = [f"< {_size_label(bound)}" for bound in SIZE_BUCKETS] + [f">= {_size_label(SIZE_BUCKETS[-1])}"]
+
+
+def scan_directory(path):
+    """
+    Summary of the files directly inside `path`: per-extension [count, bytes], the
+    attachment size histogram and the names of its subdirectories.
+    """
+    extensions = {}
+    histogram = [0] * (len(SIZE_BUCKETS) + 1)
+    subdirs = []
+    errors = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                    continue
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                errors += 1
+                continue
+            extension = os.path.splitext(entry.name)[1].lower() or "(none)"
+            totals = extensions.setdefault(extension, [0, 0])
+            totals[0] += 1
+            totals[1] += size
+            if entry.name not in TEXT_NAMES:
+                bucket = 0
+                while bucket < len(SIZE_BUCKETS) and size >= SIZE_BUCKETS[bucket]:
+                    bucket += 1
+                histogram[bucket] += 1
+    return {"extensions": extensions, "histogram": histogram, "subdirs": subdirs, "errors": errors}
+
+
+def _scan(path, cached):
+    """(summary, rescanned): the cached summary if the directory's mtime is unchanged."""
+    mtime = os.stat(path).st_mtime_ns
+    if cached is not None and cached.get("mtime") == mtime:
+        return cached, False
+    summary = scan_directory(path)
+    summary["mtime"] = mtime
+    return summary, True
+
+
+def scan_tree(root, workers=8, cache=None):
+    """
+    Walk `root` with `workers` threads, one os.scandir per directory, and return
+    ({relative directory path: summary}, directories rescanned).
+    A directory whose mtime matches `cache` (an earlier result) is not listed again.
+    Its mtime changes when entries are added, removed or renamed, not when an existing
+    file is rewritten in place, which the extractors don't do.
+    """
+    cache = cache or {}
+    results = {}
+    rescanned = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan, root, cache.get(".")): "."}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                relative = pending.pop(future)
+                try:
+                    summary, fresh = future.result()
+                except OSError as e:
+                    print(f"[WARN] Could not scan '{os.path.join(root, relative)}': {e}")
+                    continue
+                results[relative] = summary
+                rescanned += fresh
+                for name in summary["subdirs"]:
+                    child = os.path.normpath(os.path.join(relative, name))
+                    pending[pool.submit(_scan, os.path.join(root, child), cache.get(child))] = child
+    return results, rescanned
+
+
+def summarize(results):
+    """Totals over every directory: files, bytes, per-extension counts and the size histogram."""
+    extensions = {}
+    histogram = [0] * (len(SIZE_BUCKETS) + 1)
+    errors = 0
+    for summary in results.values():
+        for extension, (count, size) in summary["extensions"].items():
+            totals = extensions.setdefault(extension, [0, 0])
+            totals[0] += count
+            totals[1] += size
+        for bucket, count in enumerate(summary["histogram"]):
+            histogram[bucket] += count
+        errors += summary["errors"]
+    ordered = sorted(extensions.items(), key=lambda item: item[1][0], reverse=True)
+    return {
+        "directories": len(results),
+        "files": sum(count for count, _ in extensions.values()),
+        "bytes": sum(size for _, size in extensions.values()),
+        "extensions": {extension: {"files": count, "bytes": size} for extension, (count, size) in ordered},
+        "attachment_sizes": dict(zip(SIZE_LABELS, histogram)),
+        "errors": errors,
+    }
+
+
+def load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, results):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+    os.replace(tmp_path, path)
+
+
+def write_text_reports(root, results, totals, report_dir):
+    """directories.txt, extension_counts.txt and attachment_sizes.txt, in UTF-8."""
+    with open(os.path.join(report_dir, "directories.txt"), "w", encoding="utf-8") as f:
+        for relative in sorted(results):
+            f.write(os.path.abspath(os.path.join(root, relative)) + "\n")
+    with open(os.path.join(report_dir, "extension_counts.txt"), "w", encoding="utf-8") as f:
+        for extension, values in totals["extensions"].items():
+            f.write(f"{extension}: {values['files']} ({values['bytes'] / 1048576:.1f} MB)\n")
+    with open(os.path.join(report_dir, "attachment_sizes.txt"), "w", encoding="utf-8") as f:
+        for label, count in totals["attachment_sizes"].items():
+            f.write(f"{label}: {count}\n")
+
+
+def write_json_report(root, results, totals, report_dir):
+    report = dict(totals, root=os.path.abspath(root),
+                  folders=[os.path.abspath(os.path.join(root, relative)) for relative in sorted(results)])
+    with open(os.path.join(report_dir, "inventory.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def inventory(root, report_dir=".", report_format="text", workers=8, cache_path=None):
+    """Scan an export tree and write its folder listing, extension counts and size histogram."""
+    os.makedirs(report_dir, exist_ok=True)
+    cache_path = cache_path or os.path.join(report_dir, CACHE_NAME)
+    start = time.perf_counter()
+    cache = load_cache(cache_path)
+    results, rescanned = scan_tree(root, workers, cache)
+    totals = summarize(results)
+    if report_format == "json":
+        write_json_report(root, results, totals, report_dir)
+    else:
+        write_text_reports(root, results, totals, report_dir)
+    save_cache(cache_path, results)
+
+    print(f"[INFO] {totals['directories']} folders ({rescanned} rescanned, "
+          f"{totals['directories'] - rescanned} unchanged), {totals['files']} files, "
+          f"{totals['bytes'] / 1048576:.1f} MB in {time.perf_counter() - start:.2f}s")
+    if totals["errors"]:
+        print(f"[WARN] {totals['errors']} entries could not be read.")
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inventory an export tree: folders, extensions, sizes.")
+    parser.add_argument("root", help="Export output directory to scan.")
+    parser.add_argument("--report-dir", default=".", help="Where the reports and the scan cache go.")
+    parser.add_argument("--format", choices=("text", "json"), default="text",
+                        help="text: directories.txt, extension_counts.txt, attachment_sizes.txt; json: inventory.json.")
+    parser.add_argument("--workers", type=int, default=8, help="Directories scanned in parallel.")
+    parser.add_argument("--cache", metavar="PATH",
+                        help=f"Directory mtime cache (default: <report-dir>/{CACHE_NAME}).")
+    args = parser.parse_args()
+    inventory(args.root, args.report_dir, args.format, args.workers, args.cache)
@@ -0,0 +1,242 @@
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Per-document phases timed into latency histograms
+PHASES = ("open_doc", "read_items", "write_text", "extract_attachment", "makedirs", "throttle")
+# Histogram upper bounds in seconds (Prometheus "le" buckets); the last bucket is +Inf
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+COUNTERS = ("documents", "attachments", "bytes_written", "errors")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+PREFIX = "lotus_leap"
+
+
+def configure_logging(level="INFO"):
+    """Per-document messages go through logging, formatted like the scripts' own prints."""
+    logging.basicConfig(level=getattr(logging, level.upper()), format="[%(levelname)s] %(message)s",
+                        stream=sys.stdout)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO",
+                        help="DEBUG also logs every saved document and attachment.")
+    parser.add_argument("--progress", type=float, default=2.0, metavar="SECONDS",
+                        help="Live progress line interval (0 disables it).")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="Periodically write Prometheus textfile-collector metrics to PATH.")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Periodically write the metrics as JSON to PATH.")
+
+
+def setup_from_args(args):
+    """Apply add_metrics_arguments options: logging level and the metrics reporter."""
+    configure_logging(args.log_level)
+    run_metrics.configure(interval=args.progress, textfile=args.metrics_textfile,
+                          json_path=args.metrics_json)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Phase:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Counters (documents, attachments, bytes written, errors) and per-phase latency
+    histograms for one export run, with an optional reporter thread that redraws a
+    progress line and rewrites Prometheus textfile/JSON dumps every `interval` seconds.
+    Worker processes keep their own copy; only threads report into the parent's.
+    """
+
+    def __init__(self):
+        self.interval = 0
+        self.textfile = None
+        self.json_path = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reporter = None
+        self.reset()
+
+    def reset(self, total=None):
+        with self._lock:
+            self.total = total
+            self.counters = dict.fromkeys(COUNTERS, 0)
+            self.histograms = {name: Histogram() for name in PHASES}
+            self.started = time.time()
+
+    def configure(self, interval=0, textfile=None, json_path=None):
+        self.interval = interval or 0
+        self.textfile = textfile
+        self.json_path = json_path
+
+    def start(self, total=None):
+        """Reset for a new run of `total` documents (None if unknown) and start reporting."""
+        self.stop()
+        self.reset(total)
+        if self.interval > 0 or self.textfile or self.json_path:
+            self._stop.clear()
+            self._reporter = threading.Thread(target=self._report_loop, name="metrics-reporter", daemon=True)
+            self._reporter.start()
+
+    def stop(self):
+        """Stop the reporter, then draw the final progress line and dumps."""
+        if self._reporter is None:
+            return
+        self._stop.set()
+        self._reporter.join()
+        self._reporter = None
+        self._report(final=True)
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def phase(self, name):
+        """Context manager timing one phase into its histogram."""
+        return _Phase(self, name)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.histograms[name].observe(seconds)
+
+    def _report_loop(self):
+        interval = self.interval if self.interval > 0 else 10.0
+        while not self._stop.wait(interval):
+            self._report()
+
+    def _report(self, final=False):
+        if self.interval > 0:
+            line = self.progress_line()
+            if sys.stderr.isatty():
+                sys.stderr.write("\r" + line.ljust(100) + ("\n" if final else ""))
+            else:
+                sys.stderr.write(line + "\n")
+            sys.stderr.flush()
+        try:
+            self.dump()
+        except OSError as e:
+            logging.getLogger(__name__).warning("Could not write metrics: %s", e)
+
+    def snapshot(self):
+        """Plain dict of the current counters, rates, ETA and phase histograms."""
+        with self._lock:
+            counters = dict(self.counters)
+            total = self.total
+            histograms = {name: (list(h.counts), h.count, h.sum, h.quantile(0.5), h.quantile(0.95))
+                          for name, h in self.histograms.items()}
+        elapsed = max(time.time() - self.started, 1e-9)
+        docs_per_sec = counters["documents"] / elapsed
+        eta = None
+        if total is not None and docs_per_sec > 0:
+            eta = max(total - counters["documents"], 0) / docs_per_sec
+        return {
+            "elapsed_seconds": elapsed,
+            "total_documents": total,
+            **counters,
+            "documents_per_second": docs_per_sec,
+            "attachments_per_second": counters["attachments"] / elapsed,
+            "bytes_per_second": counters["bytes_written"] / elapsed,
+            "eta_seconds": eta,
+            "phases": {
+                name: {"count": count, "sum_seconds": total_seconds, "p50_seconds": p50, "p95_seconds": p95,
+                       "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], counts))}
+                for name, (counts, count, total_seconds, p50, p95) in histograms.items()
+            },
+        }
+
+    def progress_line(self):
+        data = self.snapshot()
+        done = data["documents"]
+        if data["total_documents"]:
+            position = f"{done}/{data['total_documents']} docs ({done / data['total_documents']:.0%})"
+        else:
+            position = f"{done} docs"
+        eta = data["eta_seconds"]
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "--:--:--"
+        slowest = max(data["phases"].items(), key=lambda item: item[1]["sum_seconds"])
+        return (f"[PROGRESS] {position}, {data['documents_per_second']:.1f} docs/s, "
+                f"{data['attachments_per_second']:.1f} att/s, {data['bytes_written'] / 1048576:.1f} MB, "
+                f"{data['errors']} errors, ETA {eta_text}, most time in {slowest[0]}")
+
+    def prometheus_text(self):
+        data = self.snapshot()
+        lines = []
+        for name in COUNTERS:
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {data[name]}")
+        for name in ("documents_per_second", "eta_seconds", "total_documents"):
+            if data[name] is not None:
+                lines.append(f"# TYPE {PREFIX}_{name} gauge")
+                lines.append(f"{PREFIX}_{name} {data[name]}")
+        lines.append(f"# TYPE {PREFIX}_phase_seconds histogram")
+        for phase, values in data["phases"].items():
+            cumulative = 0
+            for bound, count in values["buckets"].items():
+                cumulative += count
+                lines.append(f'{PREFIX}_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+            lines.append(f'{PREFIX}_phase_seconds_sum{{phase="{phase}"}} {values["sum_seconds"]}')
+            lines.append(f'{PREFIX}_phase_seconds_count{{phase="{phase}"}} {values["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        """Rewrite the configured textfile/JSON dumps (atomically, for the textfile collector)."""
+        if self.textfile:
+            _write_atomic(self.textfile, self.prometheus_text())
+        if self.json_path:
+            _write_atomic(self.json_path, json.dumps(self.snapshot(), indent=2))
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Default registry shared by the extractors and the modules they use
+run_metrics = Metrics()
@@ -0,0 +1,128 @@
+import functools
+import hashlib
+import os
+import re
+import sys
+import threading
+
+from metrics import run_metrics
+
+# Maximum length for folder names
+MAX_FOLDER_NAME_LENGTH = 100
+# Windows MAX_PATH (other platforms get no limit), and the room kept below a category
+# folder for the shortest document in it: \<subject>_<UNID prefix>\document.txt
+WINDOWS_MAX_PATH = 260
+DEFAULT_MAX_PATH = WINDOWS_MAX_PATH if sys.platform == "win32" else None
+RESERVED_LENGTH = len("\\_12345678\\document.txt")
+
+_FORBIDDEN = re.compile(r'[<>:"/\\|?*]')
+_SEPARATORS = re.compile(r'[\s_]+')
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def sanitize_name(name, max_length=MAX_FOLDER_NAME_LENGTH, empty="UnnamedDocument"):
+    """Windows-safe, truncated folder name; memoized, since category names repeat constantly."""
+    if not name or not name.strip():
+        return empty
+    # Remove forbidden characters for Windows, then collapse runs of spaces/underscores
+    name = _SEPARATORS.sub("_", _FORBIDDEN.sub("_", name))
+    return name[:max_length].strip("_")
+
+
+class PathPlanner:
+    """
+    Maps raw category paths (lists of unsanitized parts) to output folders under `root`.
+    Each distinct path is sanitized once; two different names that sanitize to the same
+    folder (ignoring case, as Windows does) get "_2", "_3"... suffixes. With a `max_path`
+    (Windows only by default), a part is shortened with a hash of its raw name only if
+    not even the shortest document would fit below its folder; the limit counts from the
+    absolute root, measured once. `plan` sorts its input, so a planned tree comes out
+    identical on every run; `makedirs` then creates it in one pass. After that `folder`
+    is a dictionary lookup. Paths first seen by `folder` are planned and created on the
+    spot, so their suffixes depend on the order they are met in: plan before sharding.
+    """
+
+    def __init__(self, root, sanitize=sanitize_name, max_path=DEFAULT_MAX_PATH, reserved=RESERVED_LENGTH):
+        self.root = root
+        self.sanitize = sanitize
+        self.max_folder_length = max_path - reserved if max_path else None
+        self._root_length = len(os.path.abspath(root))
+        self.collisions = 0
+        self.shortened = 0
+        # tuple(raw parts) -> folder, planned and (in _ready) created
+        self._folders = {}
+        self._ready = {}
+        # folder -> {lowercased child name: normalized raw name}
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def plan(self, category_paths):
+        """Plan every raw category path, in sorted order so collisions resolve the same way each run."""
+        with self._lock:
+            for parts in sorted({tuple(parts) for parts in category_paths if parts}):
+                self._plan(parts)
+
+    def makedirs(self):
+        """Create every planned folder that doesn't exist yet; returns how many were made."""
+        with self._lock:
+            pending = {parts: folder for parts, folder in self._folders.items() if parts not in self._ready}
+            parents = {os.path.dirname(folder) for folder in pending.values()}
+            with run_metrics.phase("makedirs"):
+                for folder in sorted(set(pending.values()) - parents):
+                    os.makedirs(folder, exist_ok=True)
+            self._ready.update(pending)
+            return len(pending)
+
+    def folder(self, parts):
+        """Existing output folder for one raw category path."""
+        parts = tuple(parts)
+        folder = self._ready.get(parts)
+        if folder is None:
+            with self._lock:
+                folder = self._plan(parts)
+                with run_metrics.phase("makedirs"):
+                    os.makedirs(folder, exist_ok=True)
+                self._ready[parts] = folder
+        return folder
+
+    def _plan(self, parts):
+        folder = self._folders.get(parts)
+        if folder is None:
+            parent = self._plan(parts[:-1]) if len(parts) > 1 else self.root
+            folder = self._folders[parts] = os.path.join(parent, self._child_name(parent, parts[-1]))
+        return folder
+
+    def _child_name(self, parent, raw):
+        children = self._children.setdefault(parent, {})
+        normalized = " ".join(str(raw).split()).lower()
+        name = self.sanitize(raw)
+        budget = None
+        if self.max_folder_length is not None:
+            budget = self.max_folder_length - (self._root_length + len(parent) - len(self.root)) - 1
+        if budget is not None and len(name) > budget:
+            digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:6]
+            name = f"{name[:max(budget - 7, 1)].rstrip('_')}~{digest}"
+            self.shortened += 1
+        candidate = name
+        suffix = 1
+        while children.get(candidate.lower(), normalized) != normalized:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        if suffix > 1:
+            self.collisions += 1
+        children[candidate.lower()] = normalized
+        return candidate
+
+    def report(self):
+        if self.collisions or self.shortened:
+            print(f"[INFO] Folder planner: {len(self._folders)} category folders, {self.collisions} name "
+                  f"collisions suffixed, {self.shortened} names shortened for the Windows path limit.")
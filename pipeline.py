@@ -0,0 +1,208 @@
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+from metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+# Default backpressure: documents buffered between stages, and disk writer threads
+QUEUE_SIZE = 64
+WRITERS = 4
+
+_DONE = object()
+
+
+class SpooledAttachment:
+    """
+    An attachment already extracted on the COM thread into the spool directory.
+    `extract` moves it into place without touching COM; later calls copy the first copy.
+    """
+
+    __slots__ = ("name", "spool_path", "placed_path")
+
+    def __init__(self, name, spool_path):
+        self.name = name
+        self.spool_path = spool_path
+        self.placed_path = None
+
+    def extract(self, path):
+        if self.placed_path is None:
+            shutil.move(self.spool_path, path)
+            self.placed_path = path
+        else:
+            shutil.copy2(self.placed_path, path)
+
+    def size(self):
+        return os.path.getsize(self.placed_path or self.spool_path)
+
+
+def spool_attachments(snapshot, spool_dir):
+    """
+    ExtractFile every attachment of the snapshot into spool_dir (must run on the COM
+    thread) and swap the snapshot's COM handles for spooled files. Blob store
+    attachments are ingested straight into the blob directory instead.
+    """
+    spooled = []
+    for index, attachment in enumerate(snapshot.attachments):
+        if hasattr(attachment, "ingest"):
+            try:
+                attachment.ingest()
+                spooled.append(attachment)
+            except Exception as e:
+                logger.error("Failed to extract attachment '%s': %s", attachment.name, e)
+                run_metrics.add("errors")
+            continue
+        spool_path = os.path.join(spool_dir, f"{snapshot.unid or 'unknown'}-{index}")
+        try:
+            attachment.extract(spool_path)
+        except Exception as e:
+            logger.error("Failed to extract attachment '%s': %s", attachment.name, e)
+            run_metrics.add("errors")
+            continue
+        spooled.append(SpooledAttachment(attachment.name, spool_path))
+    snapshot.attachments = spooled
+    return snapshot
+
+
+class StageStats:
+    """Time one stage's threads spent working, starved (waiting for input) and blocked (queue full)."""
+
+    def __init__(self, name, threads=1):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, starved=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.items += items
+
+    def utilization(self, elapsed):
+        return self.busy / (elapsed * self.threads) if elapsed else 0.0
+
+
+class Pipeline:
+    """
+    Reader -> serializer -> writers, connected by bounded queues.
+    The reader runs on the calling thread (the one that owns the COM session) and only
+    makes COM calls; `serialize(item)` runs on one thread and `write(item)` on a pool of
+    `writers` threads doing the disk I/O. A full queue blocks the stage feeding it,
+    so at most `queue_size` items wait between two stages.
+    """
+
+    def __init__(self, serialize, write, queue_size=QUEUE_SIZE, writers=WRITERS):
+        self.serialize = serialize
+        self.write = write
+        self.writers = max(1, writers)
+        self._serialize_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._results = []
+        self._results_lock = threading.Lock()
+        self._error = None
+        self.stats = [StageStats("reader"), StageStats("serializer"),
+                      StageStats("writers", self.writers)]
+        self.elapsed = 0.0
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+
+    def _put(self, q, item, stats):
+        start = time.perf_counter()
+        q.put(item)
+        stats.add(blocked=time.perf_counter() - start)
+
+    def _serializer(self):
+        stats = self.stats[1]
+        while True:
+            start = time.perf_counter()
+            item = self._serialize_queue.get()
+            stats.add(starved=time.perf_counter() - start)
+            if item is _DONE:
+                break
+            if self._error is not None:
+                continue  # drain so the reader never blocks on a dead pipeline
+            start = time.perf_counter()
+            try:
+                item = self.serialize(item)
+            except Exception as e:
+                self._fail(e)
+                continue
+            stats.add(busy=time.perf_counter() - start, items=1)
+            self._put(self._write_queue, item, stats)
+        for _ in range(self.writers):
+            self._write_queue.put(_DONE)
+
+    def _writer(self):
+        stats = self.stats[2]
+        while True:
+            start = time.perf_counter()
+            item = self._write_queue.get()
+            stats.add(starved=time.perf_counter() - start)
+            if item is _DONE:
+                break
+            if self._error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.write(item)
+            except Exception as e:
+                self._fail(e)
+                continue
+            stats.add(busy=time.perf_counter() - start, items=1)
+            with self._results_lock:
+                self._results.append(result)
+
+    def run(self, items):
+        """
+        Drive the reader over `items` (an iterator whose next() does the COM work) on
+        this thread and return the writers' results once every stage has drained.
+        """
+        threads = [threading.Thread(target=self._serializer, name="pipeline-serializer")]
+        threads += [threading.Thread(target=self._writer, name=f"pipeline-writer-{i}")
+                    for i in range(self.writers)]
+        for thread in threads:
+            thread.start()
+
+        stats = self.stats[0]
+        start_run = time.perf_counter()
+        try:
+            iterator = iter(items)
+            while self._error is None:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.add(busy=time.perf_counter() - start, items=1)
+                self._put(self._serialize_queue, item, stats)
+        finally:
+            self._serialize_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - start_run
+
+        if self._error is not None:
+            raise self._error
+        return self._results
+
+    def report(self):
+        """Print per-stage utilization; the busiest stage is the one limiting throughput."""
+        print(f"[INFO] Pipeline finished in {self.elapsed:.2f}s")
+        for stats in self.stats:
+            label = f"{stats.name} x{stats.threads}" if stats.threads > 1 else stats.name
+            print(f"[INFO]   {label:<12} {stats.items:>7} items, "
+                  f"{stats.utilization(self.elapsed):6.1%} busy, "
+                  f"starved {stats.starved:.2f}s, blocked {stats.blocked:.2f}s")
+        bottleneck = max(self.stats, key=lambda stats: stats.utilization(self.elapsed))
+        print(f"[INFO]   bottleneck: {bottleneck.name}")
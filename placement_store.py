@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import threading
+
+# How additional placements of an already-extracted document are materialized
+LINK_MODES = ("hardlink", "symlink", "manifest", "copy")
+MANIFEST_NAME = "placements.jsonl"
+
+
+class PlacementStore:
+    """
+    Extract once, place many: the first folder a UNID is extracted into becomes its
+    canonical copy, and every later placement (another $Folders entry, category path
+    or view) is a hardlink/symlink/copy of that folder or just a manifest line.
+    """
+
+    def __init__(self, output_dir, link_mode="hardlink"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode '{link_mode}', expected one of {LINK_MODES}")
+        self.output_dir = output_dir
+        self.link_mode = link_mode
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.extracted = 0
+        self.linked = 0
+        self._canonical = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes get their own copy; locks don't pickle
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def canonical(self, unid):
+        """Folder the document was first extracted into, or None."""
+        with self._lock:
+            return self._canonical.get(unid)
+
+    def adopt(self, unid, doc_folder_path):
+        """Reuse a copy extracted by an earlier run (e.g. known from a checkpoint)."""
+        if os.path.isdir(doc_folder_path):
+            with self._lock:
+                self._canonical.setdefault(unid, doc_folder_path)
+
+    def record(self, unid, doc_folder_path):
+        """Register a freshly extracted document folder as the canonical copy."""
+        with self._lock:
+            self._canonical.setdefault(unid, doc_folder_path)
+            self.extracted += 1
+
+    def place(self, unid, folder_path):
+        """
+        Place an already-extracted document under `folder_path` and return the placed
+        document folder. Returns None when the UNID hasn't been extracted yet (the caller
+        must extract it).
+        """
+        source = self.canonical(unid) if unid else None
+        if source is None:
+            return None
+
+        dest = os.path.join(folder_path, os.path.basename(source))
+        if os.path.normcase(os.path.abspath(dest)) != os.path.normcase(os.path.abspath(source)):
+            if self.link_mode == "manifest":
+                self._write_manifest(unid, source, dest)
+            elif self.link_mode == "symlink":
+                self._symlink(source, dest)
+            else:
+                self._link_files(source, dest, copy=self.link_mode == "copy")
+        with self._lock:
+            self.linked += 1
+        return dest
+
+    def _write_manifest(self, unid, source, dest):
+        line = json.dumps({"unid": unid, "path": dest, "source": source}, ensure_ascii=False)
+        with self._lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _symlink(self, source, dest):
+        if os.path.islink(dest):
+            os.unlink(dest)
+        elif os.path.isdir(dest):
+            # Left over from an earlier run in another mode; refresh its files instead
+            self._link_files(source, dest)
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.symlink(os.path.relpath(source, os.path.dirname(dest)), dest, target_is_directory=True)
+        except OSError as e:
+            # Windows needs developer mode or admin rights for symlinks
+            print(f"[WARN] Symlink failed for '{dest}' ({e}); hardlinking files instead.")
+            self._link_files(source, dest)
+
+    def _link_files(self, source, dest, copy=False):
+        os.makedirs(dest, exist_ok=True)
+        for entry in os.scandir(source):
+            if not entry.is_file():
+                continue
+            target = os.path.join(dest, entry.name)
+            if os.path.exists(target):
+                os.unlink(target)
+            if not copy:
+                try:
+                    os.link(entry.path, target)
+                    continue
+                except OSError:
+                    # Different volume or filesystem without hardlinks
+                    pass
+            shutil.copy2(entry.path, target)
@@ -0,0 +1,132 @@
+"""
+Server-side document selection and field projection.
+
+A Selection narrows an export to the documents matching a Notes formula, a full-text
+query, a list of forms and/or a modification cutoff. Those conditions are pushed down
+to NotesDatabase.Search/FTSearch, so documents outside the selection are never opened.
+Its `fields` projection reads only the named items (plus the ones the extractors need
+for folder names) instead of every item of every document.
+"""
+import datetime
+from collections import namedtuple
+
+from doc_snapshot import DocumentSnapshot
+from session_pool import collect_unids
+
+# Items every projection keeps: the folder name (Subject, else Form), the fallback category
+# and the parent of a response document
+REQUIRED_FIELDS = ("Subject", "Form", "Category", "$Ref")
+# Default FT_MAX_SEARCH_RESULTS of a Domino server; FTSearch silently stops there
+FT_RESULT_LIMIT = 5000
+
+
+class Selection(namedtuple("Selection", ["formula", "query", "forms", "modified_after", "fields", "attachments"],
+                           defaults=(None, None, (), None, None, True))):
+    """
+    `formula`: a Notes selection formula, e.g. 'Status = "Final"'.
+    `query`: a full-text query (best with a full-text indexed database).
+    `forms`: form names; documents of any of them match.
+    `modified_after`: a datetime; only documents modified after it match.
+    `fields`: item names to read (None reads every item).
+    `attachments`: False skips embedded objects.
+    """
+    __slots__ = ()
+
+    def filtered(self):
+        return bool(self.formula or self.query or self.forms or self.modified_after)
+
+    def search_formula(self):
+        """The formula, forms and cutoff as one selection formula, or None if there are none."""
+        clauses = []
+        if self.formula:
+            clauses.append(f"({self.formula})")
+        if self.forms:
+            clauses.append("(Form = " + " : ".join(_formula_string(form) for form in self.forms) + ")")
+        if self.modified_after:
+            # @Date rather than a date string, so the cutoff doesn't depend on the client locale
+            cutoff = self.modified_after
+            clauses.append(f"(@Modified > @Date({cutoff.year}; {cutoff.month}; {cutoff.day}; "
+                           f"{cutoff.hour}; {cutoff.minute}; {cutoff.second}))")
+        return " & ".join(clauses) or None
+
+    def projection(self):
+        """Item names DocumentSnapshot.from_document should read, or None for all of them."""
+        if self.fields is None:
+            return None
+        return tuple(dict.fromkeys((*REQUIRED_FIELDS, *self.fields)))
+
+    def describe(self):
+        parts = []
+        if self.search_formula():
+            parts.append(f"formula {self.search_formula()}")
+        if self.query:
+            parts.append(f"full-text query '{self.query}'")
+        if self.fields is not None:
+            parts.append(f"fields {', '.join(self.projection())}")
+        if not self.attachments:
+            parts.append("no attachments")
+        return "; ".join(parts) or "all documents"
+
+
+def _formula_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def select_documents(db, selection=None):
+    """
+    The database's documents narrowed by `selection`, searched on the server:
+    db.Search for the formula part, then FTSearch to refine it by the full-text query.
+    """
+    if selection is None or not selection.filtered():
+        return db.AllDocuments
+    formula = selection.search_formula()
+    if selection.query and not db.IsFTIndexed:
+        print("[WARN] The database has no full-text index; the full-text query will be slow.")
+    if formula is None:
+        collection = db.FTSearch(selection.query, 0)
+    else:
+        collection = db.Search(formula, None, 0)
+        if selection.query:
+            # Refines the collection in place to the documents also matching the query
+            collection.FTSearch(selection.query, 0)
+    if selection.query and collection.Count >= FT_RESULT_LIMIT:
+        print(f"[WARN] The full-text query returned {collection.Count} documents, the server's default "
+              f"result limit; raise FT_MAX_SEARCH_RESULTS if documents are missing.")
+    print(f"[INFO] Selection ({selection.describe()}): {collection.Count} documents.")
+    return collection
+
+
+def selected_unids(db, selection=None):
+    """UNIDs of the selected documents, or None when every document is selected."""
+    if selection is None or not selection.filtered():
+        return None
+    return set(collect_unids(select_documents(db, selection)))
+
+
+def snapshot_document(doc, selection=None):
+    """DocumentSnapshot of `doc` reading only the items and attachments `selection` asks for."""
+    if selection is None:
+        return DocumentSnapshot.from_document(doc)
+    return DocumentSnapshot.from_document(doc, selection.projection(), selection.attachments)
+
+
+def add_selection_arguments(parser):
+    group = parser.add_argument_group("selection")
+    group.add_argument("--formula", help="Only export documents matching this Notes selection formula.")
+    group.add_argument("--query", help="Only export documents matching this full-text query.")
+    group.add_argument("--form", dest="forms", action="append", default=[], metavar="FORM",
+                       help="Only export documents of this form (repeatable).")
+    group.add_argument("--modified-after", type=datetime.datetime.fromisoformat, metavar="DATE",
+                       help="Only export documents modified after this ISO date/time, e.g. 2023-06-30.")
+    group.add_argument("--fields", nargs="+", metavar="ITEM",
+                       help=f"Only read these items (always with {', '.join(REQUIRED_FIELDS)}); attachments "
+                            f"come from the rich text items listed, e.g. Body.")
+    group.add_argument("--no-attachments", dest="attachments", action="store_false",
+                       help="Don't extract attachments.")
+
+
+def selection_from_args(args):
+    """Selection from the add_selection_arguments options, or None if none were given."""
+    selection = Selection(args.formula, args.query, tuple(args.forms), args.modified_after,
+                          tuple(args.fields) if args.fields else None, args.attachments)
+    return selection if selection != Selection() else None
@@ -0,0 +1,167 @@
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from com_lifetime import release
+from metrics import run_metrics
+from throttle import Throttle
+
+logger = logging.getLogger(__name__)
+
+
+class NotesSessionFactory:
+    """
+    Creates an initialized Lotus.NotesSession for the calling thread or process.
+    COM is initialized per worker, so every worker owns its own session.
+    """
+
+    def __call__(self, password):
+        import pythoncom
+        import win32com.client
+
+        pythoncom.CoInitialize()
+        session = win32com.client.Dispatch("Lotus.NotesSession")
+        session.Initialize(password)
+        return session
+
+    def release(self, session):
+        import pythoncom
+
+        # Drop the interface while COM is still initialized; `del` would only unbind the name
+        release(session)
+        pythoncom.CoUninitialize()
+
+
+# Default factory; any callable taking the password and returning a session works,
+# which is what lets the pool run against a fake session on Linux.
+notes_session_factory = NotesSessionFactory()
+
+
+def release_session(session_factory, session, *objects):
+    """
+    Release `objects` opened through the session (e.g. its database), then give the
+    factory a chance to tear down per-worker state (e.g. COM). Without a factory hook
+    the session itself is released.
+    """
+    release(*objects)
+    hook = getattr(session_factory, "release", None)
+    if hook is not None:
+        hook(session)
+    else:
+        release(session)
+
+
+def open_database(session, nsf_path, server=""):
+    db = session.GetDatabase(server, nsf_path)
+    if not db.IsOpen:
+        db.Open()
+    if not db.IsOpen:
+        raise Exception(f"Unable to open NSF at '{nsf_path}'")
+    return db
+
+
+def collect_unids(collection):
+    """Walk a document collection once, reading only each UniversalID."""
+    unids = []
+    doc = collection.GetFirstDocument()
+    while doc:
+        next_doc = collection.GetNextDocument(doc)
+        unid = doc.UniversalID
+        if unid:
+            unids.append(unid)
+        doc = next_doc
+    return unids
+
+
+def split_shards(unids, workers, group_of=None):
+    """
+    Split the UNID list into at most `workers` contiguous shards.
+    Contiguous runs keep each worker close to NoteID order on the server.
+    With `group_of`, a shard boundary never falls between two neighbouring UNIDs of
+    the same group (e.g. a response thread), so each group stays on one worker.
+    """
+    workers = max(1, min(workers, len(unids)))
+    size, extra = divmod(len(unids), workers)
+    shards = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        if group_of is not None:
+            while start < end < len(unids) and group_of(unids[end]) == group_of(unids[end - 1]):
+                end += 1
+        shards.append(unids[start:end])
+        start = end
+    return [shard for shard in shards if shard]
+
+
+def _run_shard(session_factory, password, server, nsf_path, unids, process_document, shard_done=None,
+               throttle=None, watchdog=None):
+    """
+    Worker body: open a private session and database, then process each UNID,
+    holding a throttle slot per document. Each document is released once processed;
+    when the watchdog says so, the session is recycled between two documents.
+    """
+    throttle = throttle or Throttle()
+    session = session_factory(password)
+    db = None
+    try:
+        db = open_database(session, nsf_path, server)
+        results = []
+        for unid in unids:
+            with throttle.slot():
+                try:
+                    with run_metrics.phase("open_doc"), throttle.measure():
+                        doc = db.GetDocumentByUNID(unid)
+                except Exception as e:
+                    logger.error("Unable to open document %s: %s", unid, e)
+                    run_metrics.add("errors")
+                    continue
+                results.append(process_document(doc))
+                release(doc)
+            run_metrics.add("documents")
+            if watchdog is not None and watchdog.check():
+                release_session(session_factory, session, db)
+                session = db = None
+                session = session_factory(password)
+                db = open_database(session, nsf_path, server)
+                watchdog.recycled()
+        if shard_done is not None:
+            shard_done()
+        return results
+    finally:
+        if session is not None:
+            release_session(session_factory, session, db)
+
+
+def run_sharded(password, nsf_path, unids, process_document, workers,
+                session_factory=notes_session_factory, use_processes=False, server="",
+                shard_done=None, throttle=None, watchdog=None, group_of=None):
+    """
+    Process `unids` across `workers` threads (or processes), each with its own session.
+    `process_document(doc)` is called once per document; the per-shard result lists
+    are merged back in UNID order. `shard_done()` runs inside the worker once its shard
+    is finished (e.g. to flush buffered state). With processes, these callables and
+    `session_factory` must be picklable (module-level functions or partials of them).
+    A `throttle` (threads only) bounds how many workers have a document in flight.
+    A `watchdog` (com_lifetime.Watchdog) makes workers recycle their session when the
+    process grows past its limits. `group_of(unid)` keeps groups of neighbouring UNIDs
+    (see split_shards) in one shard, processed in list order.
+    """
+    if use_processes and throttle is not None and throttle.active():
+        raise ValueError("The throttle is shared between workers; use threads instead of processes.")
+    shards = split_shards(unids, workers, group_of)
+    if not shards:
+        return []
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    run_shard = functools.partial(_run_shard, session_factory, password, server, nsf_path,
+                                  process_document=process_document, shard_done=shard_done,
+                                  throttle=None if use_processes else throttle, watchdog=watchdog)
+    print(f"[INFO] Processing {len(unids)} documents with {len(shards)} "
+          f"{'processes' if use_processes else 'threads'}.")
+
+    results = []
+    with executor_class(max_workers=len(shards)) as executor:
+        for shard_results in executor.map(run_shard, shards):
+            results.extend(shard_results)
+    return results
@@ -0,0 +1,217 @@
+import abc
+import datetime
+import json
+import logging
+import os
+import threading
+
+from field_serializer import item_record
+from metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+SINK_KINDS = ("folder", "jsonl", "parquet", "tar", "zip")
+
+
+def document_record(snapshot, category_paths, attachments):
+    """
+    One output record: UNID, subject, parent and thread (for responses), category paths,
+    typed items and attachment refs.
+    """
+    return {
+        "unid": snapshot.unid,
+        "subject": snapshot.subject(),
+        "parent": snapshot.parent(),
+        "thread": snapshot.thread,
+        "categories": [list(parts) for parts in category_paths],
+        "items": [item_record(item) for item in snapshot.items],
+        "attachments": attachments,
+        "deleted": False,
+    }
+
+
+class RecordSink(abc.ABC):
+    """
+    Base for sinks that stream one record per document instead of a folder per document.
+    Attachments are extracted to `<attachments_dir>/<UNID>/<name>` and referenced by path.
+    Subclasses implement `_write`, called under the lock. Safe to share between worker threads.
+    """
+
+    def __init__(self, path, attachments_dir, sanitize):
+        self.path = path
+        self.attachments_dir = attachments_dir
+        self.sanitize = sanitize
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        raise TypeError(f"{type(self).__name__} can't be shared with worker processes; use threads.")
+
+    def write_document(self, snapshot, category_paths):
+        """Extract attachments, append the record and return the sink path."""
+        attachments = []
+        if snapshot.attachments:
+            doc_dir = os.path.join(self.attachments_dir, snapshot.unid or "unknown")
+            os.makedirs(doc_dir, exist_ok=True)
+            for attachment in snapshot.attachments:
+                attachment_path = os.path.join(doc_dir, self.sanitize(attachment.name))
+                try:
+                    # Blob store attachments may live elsewhere and carry their content hash
+                    placed = attachment.extract(attachment_path) or attachment_path
+                    ref = {"name": attachment.name,
+                           "path": os.path.relpath(placed, os.path.dirname(self.path))}
+                    if getattr(attachment, "sha256", None):
+                        ref["sha256"] = attachment.sha256
+                    attachments.append(ref)
+                except Exception as e:
+                    logger.error("Failed to extract attachment '%s': %s", attachment.name, e)
+                    run_metrics.add("errors")
+        record = self._record(snapshot, category_paths, attachments)
+        with self._lock, run_metrics.phase("write_text"):
+            self._write(record)
+            self.count += 1
+        return self.path
+
+    def write_tombstone(self, unid):
+        """Record that a previously exported document was deleted."""
+        record = {"unid": unid, "subject": None, "parent": None, "thread": None, "categories": [], "items": [],
+                  "attachments": [], "deleted": True}
+        with self._lock:
+            self._write(record)
+
+    def _record(self, snapshot, category_paths, attachments):
+        return document_record(snapshot, category_paths, attachments)
+
+    @abc.abstractmethod
+    def _write(self, record):
+        """Append one record (a document or a tombstone); the caller holds the lock."""
+
+    def close(self):
+        pass
+
+
+class JsonlSink(RecordSink):
+    """One JSON object per line; flushed every `batch_size` records."""
+
+    def __init__(self, path, attachments_dir, sanitize, batch_size=1000, append=False):
+        super().__init__(path, attachments_dir, sanitize)
+        self.batch_size = batch_size
+        self._buffer = []
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        self._buffer.append(line)
+        run_metrics.add("bytes_written", len(line) + 1)
+        if len(self._buffer) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+
+class ParquetSink(RecordSink):
+    """
+    Columnar output through pyarrow, one row group per `row_group_size` records.
+    Item values are split by type into text, number and datetime lists.
+    """
+
+    def __init__(self, path, attachments_dir, sanitize, row_group_size=5000):
+        super().__init__(path, attachments_dir, sanitize)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("The parquet sink needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self.row_group_size = row_group_size
+        self._rows = []
+        item = pa.struct([
+            ("name", pa.string()),
+            ("type", pa.int32()),
+            ("text", pa.list_(pa.string())),
+            ("numbers", pa.list_(pa.float64())),
+            ("datetimes", pa.list_(pa.timestamp("us"))),
+            ("error", pa.string()),
+        ])
+        attachment = pa.struct([("name", pa.string()), ("path", pa.string()), ("sha256", pa.string())])
+        self.schema = pa.schema([
+            ("unid", pa.string()),
+            ("subject", pa.string()),
+            ("parent", pa.string()),
+            ("thread", pa.string()),
+            ("categories", pa.list_(pa.list_(pa.string()))),
+            ("items", pa.list_(item)),
+            ("attachments", pa.list_(attachment)),
+            ("deleted", pa.bool_()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def _record(self, snapshot, category_paths, attachments):
+        record = document_record(snapshot, category_paths, attachments)
+        items = []
+        # Typed columns come from the raw snapshot values (native datetimes and floats)
+        for item in snapshot.items:
+            raw = item.values
+            values = list(raw) if isinstance(raw, (list, tuple)) else ([] if raw is None else [raw])
+            text, numbers, datetimes = [], [], []
+            if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                numbers = [float(v) for v in values]
+            elif values and all(isinstance(v, datetime.datetime) for v in values):
+                # The column is naive: values with an offset are stored as UTC
+                datetimes = [v.astimezone(datetime.timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+                             for v in values]
+            else:
+                text = [str(v) for v in values]
+            items.append({"name": item.name, "type": item.type, "text": text,
+                          "numbers": numbers, "datetimes": datetimes, "error": item.error})
+        record["items"] = items
+        return record
+
+    def _write(self, record):
+        self._rows.append(record)
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            table = self._pa.Table.from_pylist(self._rows, schema=self.schema)
+            self._writer.write_table(table, row_group_size=len(self._rows))
+            self._rows = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+
+
+def open_sink(kind, output_dir, sanitize, append=False):
+    """
+    Record sink for `kind` inside output_dir, or None for the classic folder tree.
+    With `append` (resumed or incremental runs) JSONL appends to the existing file and
+    Parquet starts a new timestamped part file next to the earlier ones, and the
+    tar/zip archive sinks continue with new shards.
+    """
+    if kind == "folder":
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    attachments_dir = os.path.join(output_dir, "attachments")
+    if kind == "jsonl":
+        return JsonlSink(os.path.join(output_dir, "documents.jsonl"), attachments_dir, sanitize,
+                         append=append)
+    if kind == "parquet":
+        name = "documents.parquet"
+        if append:
+            name = f"documents-{datetime.datetime.now():%Y%m%dT%H%M%S}.parquet"
+        return ParquetSink(os.path.join(output_dir, name), attachments_dir, sanitize)
+    if kind in ("tar", "zip"):
+        from archive_sink import ArchiveSink
+        return ArchiveSink(output_dir, kind, sanitize, append=append)
+    raise ValueError(f"Unknown sink '{kind}', expected one of {SINK_KINDS}")
@@ -0,0 +1,56 @@
+import glob
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_sink import ArchiveSink, document_members, read_member
+from doc_snapshot import DocumentSnapshot
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from field_serializer import document_text
+from path_planner import sanitize_name
+from session_pool import open_database
+
+NSF_PATH = "fake.nsf"
+
+
+@pytest.mark.parametrize("kind", ["tar", "zip"])
+def test_members_read_back_through_the_offset_index(tmp_path, kind):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=12, items_per_document=6, attachments_per_document=1.5,
+                                            attachment_sizes=(700, 5000))})
+    db = open_database(notes(""), NSF_PATH)
+    output_dir = str(tmp_path / "out")
+    os.makedirs(output_dir)
+    sink = ArchiveSink(output_dir, kind, sanitize_name, shard_size=20000)
+    expected = {}
+    for i in range(12):
+        snapshot = DocumentSnapshot.from_document(db.GetDocumentByUNID(document_unid(i)))
+        members = {"document.txt": document_text(snapshot).encode("utf-8")}
+        for n, attachment in enumerate(snapshot.attachments):
+            path = str(tmp_path / f"{i}_{n}")
+            attachment.extract(path)
+            with open(path, "rb") as f:
+                members[attachment.name] = f.read()
+        expected[snapshot.unid] = members
+        sink.write_document(snapshot, [["Category", str(i % 3)]])
+    sink.close()
+
+    shards = sorted(glob.glob(os.path.join(output_dir, f"documents-*.{kind}")))
+    assert len(shards) > 1
+    for unid, members in expected.items():
+        assert sorted(name for name, *_ in document_members(output_dir, unid)) == sorted(members)
+        for name, content in members.items():
+            assert read_member(output_dir, unid, name) == content
+
+    # The shards are ordinary archives too
+    archived = 0
+    for shard in shards:
+        if kind == "tar":
+            with tarfile.open(shard) as archive:
+                archived += len(archive.getmembers())
+        else:
+            with zipfile.ZipFile(shard) as archive:
+                assert archive.testzip() is None
+                archived += len(archive.namelist())
+    assert archived == sum(map(len, expected.values()))
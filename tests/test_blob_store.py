@@ -0,0 +1,60 @@
+import os
+
+import blob_store
+from blob_store import BLOB_DIR, REFERENCES_NAME, BlobStore, file_sha256
+from doc_snapshot import DocumentSnapshot
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from session_pool import open_database
+
+NSF_PATH = "fake.nsf"
+# Every attachment is one of the fake's five shared files, all of the same size
+SPEC = CorpusSpec(documents=20, items_per_document=6, attachments_per_document=1, attachment_sizes=(5000,),
+                  shared_attachments=1.0)
+
+
+def _place_all(notes, blobs, tmp_path):
+    db = open_database(notes(""), NSF_PATH)
+    placed = []
+    for i in range(SPEC.documents):
+        snapshot = blobs.wrap(DocumentSnapshot.from_document(db.GetDocumentByUNID(document_unid(i))))
+        for attachment in snapshot.attachments:
+            path = str(tmp_path / f"{i}_{attachment.name}")
+            attachment.extract(path)
+            placed.append((attachment.name, path))
+    return placed
+
+
+def _blobs_on_disk(root):
+    return [name for folder, _, names in os.walk(os.path.join(root, BLOB_DIR))
+            if os.path.basename(folder) != "tmp" for name in names if name != REFERENCES_NAME]
+
+
+def test_name_and_size_precheck_skips_extracting_and_hashing(tmp_path, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(blob_store, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    notes = FakeNotes({NSF_PATH: SPEC})
+    blobs = BlobStore(str(tmp_path / "out"), "copy")
+    placed = _place_all(notes, blobs, tmp_path)
+    distinct = len({name for name, _ in placed})
+    assert len(hashed) == blobs.extracted == notes.calls["FakeEmbeddedObject.ExtractFile"] == distinct
+    assert blobs.skipped == len(placed) - distinct
+    # Every placement still gets the content of its own file
+    contents = {}
+    for name, path in placed:
+        with open(path, "rb") as f:
+            content = f.read()
+        assert contents.setdefault(name, content) == content
+
+
+def test_duplicate_content_is_stored_once(tmp_path):
+    notes = FakeNotes({NSF_PATH: SPEC})
+    blobs = BlobStore(str(tmp_path / "out"), "reference", precheck=False)
+    placed = _place_all(notes, blobs, tmp_path)
+    distinct = len({name for name, _ in placed})
+    assert notes.calls["FakeEmbeddedObject.ExtractFile"] == len(placed)
+    assert blobs.duplicates == len(placed) - distinct
+    assert len(_blobs_on_disk(blobs.output_dir)) == distinct
+    assert os.listdir(os.path.join(blobs.root, "tmp")) == []
+    with open(blobs.references_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == len(placed)
+
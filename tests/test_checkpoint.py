@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+from bench_export import load_script
+from checkpoint import open_checkpoint
+from fake_notes import CATEGORIZED_VIEW, CorpusSpec, FakeNotes, document_unid
+
+NSF_PATH = "fake.nsf"
+
+
+@pytest.fixture(scope="module")
+def extract_all3():
+    return load_script("extract-all3")
+
+
+def _export(extract_all3, notes, output_dir, checkpoint_path, **options):
+    notes.reset_counters()
+    extract_all3.blended_export("", NSF_PATH, CATEGORIZED_VIEW, str(output_dir), session_factory=notes,
+                                checkpoint_path=str(checkpoint_path), **options)
+    return notes.calls["FakeDocument.Items"]
+
+
+def _tree(root):
+    return sorted(os.path.relpath(os.path.join(path, name), root)
+                  for path, dirs, names in os.walk(root) for name in dirs + names
+                  if not name.startswith("checkpoint"))
+
+
+def test_resume_exports_only_what_is_missing(tmp_path, extract_all3):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=60, attachment_sizes=(500,))})
+    output_dir, checkpoint_path = tmp_path / "out", tmp_path / "checkpoint.sqlite"
+    assert _export(extract_all3, notes, output_dir, checkpoint_path) == 60
+    tree = _tree(output_dir)
+
+    # A rerun after a complete export reads no document
+    assert _export(extract_all3, notes, output_dir, checkpoint_path) == 0
+
+    # As if the first run had stopped before its last marks were written
+    checkpoint = open_checkpoint(str(checkpoint_path))
+    assert checkpoint.count(NSF_PATH) == 60
+    for index in range(50, 60):
+        checkpoint.forget(NSF_PATH, document_unid(index))
+    checkpoint.flush()
+    assert _export(extract_all3, notes, output_dir, checkpoint_path, workers=3) == 10
+    assert _tree(output_dir) == tree
+
+
+def test_incremental_run_picks_up_changes_and_deletions(tmp_path, extract_all3):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=30, attachments_per_document=0)})
+    output_dir, checkpoint_path = tmp_path / "out", tmp_path / "checkpoint.sqlite"
+    assert _export(extract_all3, notes, output_dir, checkpoint_path, incremental=True) == 30
+    notes.modify(NSF_PATH, [1, 2])
+    notes.delete(NSF_PATH, [3])
+    assert _export(extract_all3, notes, output_dir, checkpoint_path, incremental=True) == 2
+    checkpoint = open_checkpoint(str(checkpoint_path))
+    assert checkpoint.get(NSF_PATH, document_unid(3)) is None
+    assert checkpoint.count(NSF_PATH) == 29
+
+
+def _export_views(notes, output_dir, checkpoint_path):
+    extract_geds = load_script("extract-geds")
+    notes.reset_counters()
+    checkpoint = open_checkpoint(str(checkpoint_path))
+    try:
+        db = notes("").GetDatabase("", NSF_PATH)
+        extract_geds.extract_all_views_with_categories("", db, str(output_dir), checkpoint=checkpoint)
+    finally:
+        checkpoint.close()
+    return notes.calls["FakeDocument.Items"]
+
+
+def test_view_export_resumes_by_last_modified(tmp_path):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=30, attachment_sizes=(500,))})
+    output_dir, checkpoint_path = tmp_path / "out", tmp_path / "checkpoint.sqlite"
+    assert _export_views(notes, output_dir, checkpoint_path) == 30
+    checkpoint = open_checkpoint(str(checkpoint_path))
+    # Views export document.txt only, so no attachment is recorded as written
+    assert all(checkpoint.get(NSF_PATH, document_unid(i)).attachments == [] for i in range(30))
+    checkpoint.close()
+
+    assert _export_views(notes, output_dir, checkpoint_path) == 0
+    notes.modify(NSF_PATH, [1, 2])
+    assert _export_views(notes, output_dir, checkpoint_path) == 2
+    assert _export_views(notes, output_dir, checkpoint_path) == 0
+
+
+def test_view_entry_without_a_document_is_reported_as_missing(tmp_path):
+    extract_geds = load_script("extract-geds")
+
+    class DeletedEntry:
+        UniversalID = document_unid(0)
+        ColumnValues = ("Category",)
+        Document = None
+
+    store = extract_geds.PlacementStore(str(tmp_path))
+    planner = extract_geds.PathPlanner(str(tmp_path))
+    assert extract_geds.export_view_entry(DeletedEntry(), planner, "View", store) == "missing"
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+from bench_export import soak
+from com_lifetime import Watchdog, release, rss_bytes
+from com_trace import TracedSessionFactory
+from doc_snapshot import DocumentSnapshot
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from session_pool import open_database, run_sharded
+
+NSF_PATH = "fake.nsf"
+
+
+def _notes(documents=200, **spec):
+    spec.setdefault("attachments_per_document", 0)
+    return FakeNotes({NSF_PATH: CorpusSpec(documents=documents, items_per_document=6, **spec)},
+                     retain_handles=True)
+
+
+def _unids(notes):
+    return [document_unid(i) for i in range(notes.databases[NSF_PATH].documents)]
+
+
+def test_released_documents_do_not_pile_up():
+    notes = _notes()
+    peak = []
+
+    def process_document(doc):
+        DocumentSnapshot.from_document(doc)
+        peak.append(notes.live_handles())
+
+    run_sharded("", NSF_PATH, _unids(notes), process_document, workers=1, session_factory=notes)
+    assert max(peak) <= 2
+    assert notes.live_handles() == 0
+
+
+def test_watchdog_recycles_a_leaking_session():
+    notes = _notes()
+    peak = []
+
+    def leaky_process_document(doc):
+        # A second handle on the same document that is never released
+        doc._db.GetDocumentByUNID(doc.UniversalID)
+        peak.append(notes.live_handles())
+
+    watchdog = Watchdog(max_handles=20, every=10, handles=notes.live_handles)
+    run_sharded("", NSF_PATH, _unids(notes), leaky_process_document, workers=1, session_factory=notes,
+                watchdog=watchdog)
+    assert watchdog.recycles > 0
+    assert max(peak) <= 20 + 10 + 2
+    assert notes.live_handles() == 0
+
+
+def test_attachments_outlive_the_snapshot_loop(tmp_path):
+    notes = _notes(documents=5, attachments_per_document=3, attachment_sizes=(100,))
+    db = open_database(notes(""), NSF_PATH)
+    snapshot = DocumentSnapshot.from_document(db.GetDocumentByUNID(document_unid(0)))
+    assert snapshot.attachments
+    for n, attachment in enumerate(snapshot.attachments):
+        attachment.extract(str(tmp_path / str(n)))
+        assert (tmp_path / str(n)).stat().st_size == 100
+
+
+def test_released_item_invalidates_its_attachments(tmp_path):
+    notes = _notes(documents=5, attachments_per_document=3, attachment_sizes=(100,))
+    db = open_database(notes(""), NSF_PATH)
+    snapshot = DocumentSnapshot.from_document(db.GetDocumentByUNID(document_unid(0)))
+    release(snapshot.attachments[0].item)
+    with pytest.raises(RuntimeError):
+        snapshot.attachments[0].extract(str(tmp_path / "0"))
+
+
+def test_releasing_traced_objects_is_not_traced():
+    notes = _notes(documents=20)
+    traced = TracedSessionFactory(notes)
+    run_sharded("", NSF_PATH, _unids(notes), DocumentSnapshot.from_document, workers=1, session_factory=traced)
+    assert notes.live_handles() == 0
+    assert not [member for member in traced.tracer.by_member() if "._" in member]
+
+
+@pytest.mark.slow
+def test_soak_keeps_handles_and_rss_flat():
+    # SOAK_DOCUMENTS=1000000 for the full million-document run (about 7 minutes)
+    readings = soak(int(os.environ.get("SOAK_DOCUMENTS", 200000)))
+    assert len(readings) >= 5
+    assert max(live for _, _, live in readings) <= 4
+    (first_count, first_rss, _), (last_count, last_rss, _) = readings[0], readings[-1]
+    if rss_bytes() is not None:
+        assert (last_rss - first_rss) / (last_count - first_count) < 64  # bytes per document
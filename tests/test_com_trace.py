@@ -0,0 +1,44 @@
+from bench_export import load_script
+from com_trace import TracedSessionFactory
+from fake_notes import CorpusSpec, FakeNotes
+
+NSF_PATH = "fake.nsf"
+
+
+def _traced_export(tmp_path, documents=10):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=documents, items_per_document=6,
+                                            attachments_per_document=1, attachment_sizes=(50,))})
+    traced = TracedSessionFactory(notes)
+    load_script("extract-all2").extract_nsf_data_all_documents("", NSF_PATH, str(tmp_path / "out"),
+                                                               session_factory=traced)
+    return notes, traced.tracer
+
+
+def test_every_com_call_is_counted_once(tmp_path):
+    notes, tracer = _traced_export(tmp_path)
+    counts = {member.rstrip("()"): count for member, (count, _) in tracer.by_member().items()}
+    # The fake counts the same calls; Initialize happens inside the wrapped factory
+    expected = {name[len("Fake"):]: count for name, count in notes.calls.items() if name != "FakeSession.Initialize"}
+    assert counts == expected
+    assert counts["Document.Items"] == 10
+    assert counts["EmbeddedObject.ExtractFile"] == 10
+
+
+def test_report_and_folded_stacks(tmp_path):
+    _, tracer = _traced_export(tmp_path)
+    tracer.write(str(tmp_path / "trace"))
+
+    report = (tmp_path / "trace.txt").read_text(encoding="utf-8")
+    total = sum(count for count, _ in tracer.calls.values())
+    assert report.startswith(f"COM trace: {total} calls")
+    assert "Document.Items @ doc_snapshot.py:" in report
+
+    stacks = (tmp_path / "trace.folded").read_text(encoding="utf-8").splitlines()
+    assert stacks
+    for line in stacks:
+        stack, micros = line.rsplit(" ", 1)
+        assert int(micros) > 0
+        # Stacks start at our code, never inside the proxy
+        assert not any(frame.startswith("com_trace.") for frame in stack.split(";"))
+    assert any(line.rsplit(" ", 1)[0].endswith(";extract-all2.export_over_com;DocumentCollection.GetNextDocument()")
+               for line in stacks)
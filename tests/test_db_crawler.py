@@ -0,0 +1,36 @@
+import json
+import os
+
+from bench_export import load_script
+from db_crawler import SUMMARY_NAME, build_catalog
+from fake_notes import CorpusSpec, FakeNotes
+
+SPEC = CorpusSpec(documents=20, attachments_per_document=0, title="Address Book")
+
+
+def test_catalog_counts_documents_unless_told_not_to():
+    notes = FakeNotes({"a.nsf": SPEC, "b.nsf": SPEC._replace(documents=40)})
+    catalog = sorted(build_catalog(notes(""), ""))
+    assert [(entry.file_path, entry.doc_count) for entry in catalog] == [("a.nsf", 20), ("b.nsf", 40)]
+    assert all(entry.size > 0 and entry.error is None for entry in catalog)
+
+    notes.reset_counters()
+    catalog = build_catalog(notes(""), "", count_documents=False)
+    assert all(entry.doc_count is None and entry.size > 0 for entry in catalog)
+    assert notes.calls["FakeDatabase.AllDocuments"] == 0
+
+
+def test_crawl_summary_has_the_document_counts(tmp_path, capsys):
+    notes = FakeNotes({"a.nsf": SPEC})
+    load_script("extract-geds").enumerate_all_databases("", str(tmp_path), server="", session_factory=notes)
+    with open(tmp_path / SUMMARY_NAME, encoding="utf-8") as f:
+        assert [result["doc_count"] for result in json.load(f)] == [20]
+    assert "(20 docs," in capsys.readouterr().out
+
+
+def test_databases_with_the_same_title_get_their_own_folders(tmp_path):
+    notes = FakeNotes({"a.nsf": SPEC, os.path.join("sub", "a.nsf"): SPEC})
+    load_script("extract-geds").enumerate_all_databases("", str(tmp_path), server="", session_factory=notes)
+    folders = [name for name in os.listdir(tmp_path) if os.path.isdir(tmp_path / name)]
+    assert len(folders) == 2
+    assert all(name.startswith("Address_Book_") for name in folders)
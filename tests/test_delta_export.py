@@ -0,0 +1,65 @@
+import datetime
+import os
+import time
+
+import pytest
+
+from delta_export import modified_documents, notes_datetime, watermark_text
+from fake_notes import CorpusSpec, FakeNotes
+from session_pool import open_database
+
+NSF_PATH = "fake.nsf"
+
+
+@pytest.fixture
+def time_zone():
+    """Switch this process's local time zone (Unix only) and restore it afterwards."""
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset")
+    saved = os.environ.get("TZ")
+
+    def switch(name):
+        os.environ["TZ"] = name
+        time.tzset()
+
+    yield switch
+    if saved is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = saved
+    time.tzset()
+
+
+def _changed(notes, since):
+    session = notes("")
+    collection, until = modified_documents(session, open_database(session, NSF_PATH), since)
+    return collection.Count, until
+
+
+def test_watermark_is_iso_utc():
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=10, attachments_per_document=0)})
+    notes.modify(NSF_PATH, [1, 2])
+    _, until = _changed(notes, None)
+    assert datetime.datetime.fromisoformat(until).utcoffset() == datetime.timedelta(0)
+
+
+def test_watermark_survives_a_time_zone_change(time_zone):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=10, attachments_per_document=0)})
+    time_zone("America/New_York")
+    count, until = _changed(notes, None)
+    assert count == 10
+    notes.modify(NSF_PATH, [3, 4, 5])
+    # The next run happens on a machine in another time zone
+    time_zone("Asia/Tokyo")
+    count, until = _changed(notes, until)
+    assert count == 3
+    count, _ = _changed(notes, until)
+    assert count == 0
+
+
+def test_local_time_text_from_older_checkpoints_still_works():
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=10, attachments_per_document=0)})
+    session = notes("")
+    legacy = open_database(session, NSF_PATH).GetModifiedDocuments().UntilTime.LocalTime
+    assert watermark_text(notes_datetime(session, legacy)) == watermark_text(
+        open_database(session, NSF_PATH).GetModifiedDocuments().UntilTime)
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from bench_export import load_script
+from fake_notes import CorpusSpec, FakeNotes
+from throttle import Throttle
+
+NSF_PATH = "fake.nsf"
+
+
+@pytest.fixture(scope="module")
+def extract_all2():
+    return load_script("extract-all2")
+
+
+def _notes():
+    spec = CorpusSpec(documents=30, attachment_sizes=(1000, 3000), category_depth=1)
+    return FakeNotes({NSF_PATH: spec}, retain_handles=True)
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(path, name), root)
+                  for path, _, names in os.walk(root) for name in names)
+
+
+def test_dxl_engine_releases_its_session_and_removes_the_dxl(tmp_path, extract_all2):
+    notes = _notes()
+    output_dir = str(tmp_path / "out")
+    extract_all2.extract_nsf_data_all_documents("", NSF_PATH, output_dir, session_factory=notes, engine="dxl")
+    assert notes.live_handles() == 0
+    assert not any(name.endswith(".dxl") for name in _files(str(tmp_path)))
+
+
+def test_kept_dxl_is_beside_the_output(tmp_path, extract_all2):
+    output_dir = str(tmp_path / "out")
+    extract_all2.extract_nsf_data_all_documents("", NSF_PATH, output_dir, session_factory=_notes(), engine="dxl",
+                                                keep_dxl=True)
+    assert _files(str(tmp_path)).count("out-fake.dxl") == 1
+    assert not any(name.endswith(".dxl") for name in _files(output_dir))
+
+
+def test_dxl_export_takes_a_throttle_slot(tmp_path, extract_all2):
+    throttle = Throttle(1)
+    extract_all2.extract_nsf_data_all_documents("", NSF_PATH, str(tmp_path / "out"), session_factory=_notes(),
+                                                engine="dxl", throttle=throttle)
+    assert throttle.peak == 1
+
+
+def test_com_engine_releases_its_session(tmp_path, extract_all2):
+    notes = _notes()
+    extract_all2.extract_nsf_data_all_documents("", NSF_PATH, str(tmp_path / "out"), session_factory=notes)
+    assert notes.live_handles() == 0
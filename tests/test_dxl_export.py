@@ -0,0 +1,62 @@
+import datetime
+import os
+
+import pytest
+
+from doc_snapshot import AUTHORS, DATETIMES, NUMBERS, READERS, RICHTEXT, TEXT, DocumentSnapshot
+from dxl_export import export_dxl, iter_dxl_documents
+from fake_notes import CorpusSpec, FakeNotes
+from field_serializer import document_text
+from session_pool import open_database
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "library.dxl")
+
+
+def _items(snapshot):
+    return {item.name: (item.type, item.values) for item in snapshot.items}
+
+
+def test_fixture_items_and_attachments(tmp_path):
+    main, response = iter_dxl_documents(FIXTURE, str(tmp_path / "spool"), chunk_size=256)
+    plus_one = datetime.timezone(datetime.timedelta(hours=1))
+    assert main.unid == "0A1B2C3D4E5F60718293A4B5C6D7E8F9"
+    assert _items(main) == {
+        "Subject": (TEXT, ("Enzymes & processing aids",)),
+        "Form": (TEXT, ("Memo",)),
+        "$Folders": (TEXT, ("Food Additives\\Processing aids", "Archive\\2020")),
+        "Authors": (AUTHORS, ("CN=Jane Doe/O=Example",)),
+        "Readers": (READERS, ("[Editors]", "CN=Jane Doe/O=Example")),
+        "DocNumber": (NUMBERS, (42.0,)),
+        "Amounts": (NUMBERS, (1.5, -2.0)),
+        "PublishedDate": (DATETIMES, (datetime.datetime(2020, 1, 1, 9, 30, 0, 250000, tzinfo=plus_one),)),
+        "Body": (RICHTEXT, ("First paragraph.\nSecond paragraph.",)),
+    }
+    # The attachment is listed once, not also as a $FILE item
+    assert [attachment.name for attachment in main.attachments] == ["notes.txt"]
+    target = tmp_path / "notes.txt"
+    main.attachments[0].extract(str(target))
+    assert target.read_bytes() == b"Hello, DXL attachment!\n"
+
+    assert response.parent() == main.unid
+    assert _items(response)["Empty"] == (TEXT, ("",))
+
+
+def test_fake_database_round_trip_matches_com(tmp_path):
+    notes = FakeNotes({"fake.nsf": CorpusSpec(documents=40, attachment_sizes=(500, 1500), response_ratio=0.2)})
+    session = notes("")
+    db = open_database(session, "fake.nsf")
+    dxl_path = export_dxl(session, db, str(tmp_path / "fake.dxl"))
+    count = 0
+    for snapshot in iter_dxl_documents(dxl_path, str(tmp_path / "spool")):
+        com = DocumentSnapshot.from_document(db.GetDocumentByUNID(snapshot.unid))
+        assert document_text(snapshot) == document_text(com)
+        assert [a.name for a in snapshot.attachments] == [a.name for a in com.attachments]
+        count += 1
+    assert count == 40
+
+
+def test_nsf_files_are_refused(tmp_path):
+    nsf = tmp_path / "library.nsf"
+    nsf.write_bytes(b"\x1a\x00" + bytes(100))
+    with pytest.raises(ValueError, match="NSF database"):
+        list(iter_dxl_documents(str(nsf), str(tmp_path / "spool")))
@@ -0,0 +1,58 @@
+import datetime
+import json
+
+from doc_snapshot import DATETIMES, NUMBERS, RICHTEXT, TEXT, DocumentSnapshot, ItemSnapshot
+from field_serializer import document_text, format_values, item_record
+
+
+def test_single_values_are_json():
+    assert format_values(TEXT, ("Memo",)) == '"Memo"'
+    assert format_values(RICHTEXT, "line one\nline two") == '"line one\\nline two"'
+    assert format_values(TEXT, ('["a", "b"]',)) != format_values(TEXT, ("a", "b"))
+    assert format_values(NUMBERS, (2.5,)) == "2.5"
+
+
+def test_several_values_are_a_json_array():
+    assert json.loads(format_values(TEXT, ("a", 'quote " and \\', "é"))) == ["a", 'quote " and \\', "é"]
+    assert format_values(NUMBERS, (1.0, 2)) == "[1.0, 2]"
+    assert format_values(TEXT, ()) == "[]"
+    assert format_values(TEXT, None) == "[]"
+
+
+def test_non_finite_numbers_stay_valid_json():
+    text = format_values(NUMBERS, (1.0, float("nan"), float("inf")))
+    assert json.loads(text) == [1.0, "nan", "inf"]
+
+
+def test_datetimes_are_isoformat():
+    naive = datetime.datetime(2020, 1, 2, 3, 4, 5, 600)
+    aware = datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert json.loads(format_values(DATETIMES, (naive, aware))) == [naive.isoformat(), aware.isoformat()]
+    assert format_values(DATETIMES, ("",)) == '""'
+
+
+def test_datetime_lists_match_isoformat():
+    east = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+    cases = [
+        [datetime.datetime(2020, 1, 1) + datetime.timedelta(hours=n, seconds=n) for n in range(100)],
+        [datetime.datetime(1, 1, 1), datetime.datetime(9999, 12, 31, 23, 59, 59)],
+        [datetime.datetime(2020, 1, 1, tzinfo=east), datetime.datetime(2020, 7, 1, 12, tzinfo=east)],
+        [datetime.datetime(2020, 1, 1, tzinfo=east), datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)],
+        [datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 1, 0, 0, 0, 1)],
+        [datetime.datetime(2020, 1, 1), ""],
+    ]
+    for values in cases:
+        expected = [v.isoformat() if v else v for v in values]
+        assert json.loads(format_values(DATETIMES, tuple(values))) == expected
+
+
+def test_document_text_has_one_line_per_item():
+    snapshot = DocumentSnapshot("FA4E0000", [
+        ItemSnapshot("Subject", TEXT, ("Hello",), None),
+        ItemSnapshot("Body", RICHTEXT, "first\nsecond", None),
+        ItemSnapshot("Broken", TEXT, None, "boom"),
+    ], [])
+    lines = document_text(snapshot).splitlines()
+    assert lines == ["----- Document: Hello (FA4E0000) -----", 'Subject: "Hello"',
+                     'Body: "first\\nsecond"', "Broken: <Error reading value: boom>", "--------------------"]
+    assert item_record(snapshot.items[2])["values"] is None
@@ -0,0 +1,31 @@
+from doc_snapshot import TEXT, DocumentSnapshot, ItemSnapshot
+from fts_index import FtsIndex
+
+
+def _snapshot(unid, subject, body):
+    return DocumentSnapshot(unid, [ItemSnapshot("Subject", TEXT, (subject,), None),
+                                   ItemSnapshot("Notes", TEXT, (body,), None)], [])
+
+
+def test_re_adding_a_unid_replaces_its_row_and_paths(tmp_path):
+    index = FtsIndex(str(tmp_path / "index.db"))
+    index.add(_snapshot("A", "Budget", "first draft"), [["Finance"]], ["Finance/Budget_A"])
+    index.add_placement("A", "Archive/Budget_A")
+    index.flush()
+    index.add(_snapshot("A", "Budget", "final version"), [["Finance", "2019"]], ["Finance/2019/Budget_A"])
+    index.flush()
+
+    assert index.search("draft") == []
+    [(unid, _, _, _, paths)] = index.search("final")
+    assert unid == "A" and paths == ["Finance/2019/Budget_A"]
+    assert [hit[0] for hit in index.search("categories:2019")] == ["A"]
+    index.close()
+
+
+def test_subject_matches_rank_first(tmp_path):
+    index = FtsIndex(str(tmp_path / "index.db"))
+    index.add(_snapshot("BODY", "Minutes", "the zebra crossing was discussed at length"), [], [])
+    index.add(_snapshot("SUBJECT", "Zebra crossing", "see the attached plan"), [], [])
+    index.flush()
+    assert [hit[0] for hit in index.search("zebra")] == ["SUBJECT", "BODY"]
+    index.close()
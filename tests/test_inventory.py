@@ -0,0 +1,34 @@
+import os
+
+import inventory
+from bench_export import load_script
+from fake_notes import CorpusSpec, FakeNotes
+from inventory import load_cache, save_cache, scan_tree, summarize
+
+NSF_PATH = "fake.nsf"
+
+
+def test_unchanged_directories_are_served_from_the_cache(tmp_path, monkeypatch):
+    root = str(tmp_path / "out")
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=20, attachment_sizes=(2000,))})
+    load_script("extract-all2").extract_nsf_data_all_documents("", NSF_PATH, root, session_factory=notes)
+    results, rescanned = scan_tree(root, workers=4)
+    assert rescanned == len(results) > 1
+    cache_path = str(tmp_path / inventory.CACHE_NAME)
+    save_cache(cache_path, results)
+
+    scanned = []
+    scan_directory = inventory.scan_directory
+    monkeypatch.setattr(inventory, "scan_directory", lambda path: scanned.append(path) or scan_directory(path))
+    again, rescanned = scan_tree(root, workers=4, cache=load_cache(cache_path))
+    assert rescanned == 0 and scanned == []
+    assert summarize(again) == summarize(results)
+
+    # A new file changes its directory's mtime, and only that directory is listed again
+    folder = next(os.path.join(root, relative) for relative, summary in results.items()
+                  if relative != "." and not summary["subdirs"])
+    with open(os.path.join(folder, "late.pdf"), "wb") as f:
+        f.write(b"x" * 100)
+    again, rescanned = scan_tree(root, workers=4, cache=load_cache(cache_path))
+    assert rescanned == 1 and scanned == [folder]
+    assert summarize(again)["files"] == summarize(results)["files"] + 1
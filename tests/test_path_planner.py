@@ -0,0 +1,71 @@
+import os
+
+from bench_export import load_script
+from fake_notes import CorpusSpec, FakeNotes
+from path_planner import RESERVED_LENGTH, WINDOWS_MAX_PATH, PathPlanner
+
+CATEGORY = ("Food Additives and Contaminants", "Processing aids", "Enzymes")
+
+
+def test_ordinary_categories_keep_their_names(tmp_path):
+    root = str(tmp_path / ("r" * max(61 - len(str(tmp_path)) - 1, 1)))
+    planner = PathPlanner(root, max_path=WINDOWS_MAX_PATH)
+    planner.plan([CATEGORY])
+    assert planner.folder(CATEGORY) == os.path.join(root, "Food_Additives_and_Contaminants",
+                                                    "Processing_aids", "Enzymes")
+    assert planner.shortened == 0
+
+
+def test_too_deep_parts_are_shortened_to_fit(tmp_path):
+    root = str(tmp_path)
+    deep = tuple(f"Level {n} " + "x" * 60 for n in range(3))
+    planner = PathPlanner(root, max_path=WINDOWS_MAX_PATH)
+    planner.plan([deep])
+    folder = planner._folders[deep]
+    assert planner.shortened > 0
+    assert len(os.path.abspath(folder)) + RESERVED_LENGTH <= WINDOWS_MAX_PATH
+    # The same plan again gives the same names
+    again = PathPlanner(root, max_path=WINDOWS_MAX_PATH)
+    again.plan([deep])
+    assert again._folders[deep] == folder
+
+
+def test_no_limit_without_max_path(tmp_path):
+    deep = tuple(f"Level {n} " + "x" * 60 for n in range(6))
+    planner = PathPlanner(str(tmp_path), max_path=None)
+    planner.plan([deep])
+    assert planner.shortened == 0
+    assert os.path.basename(planner._folders[deep]) == "Level_5_" + "x" * 60
+
+
+def test_collision_suffixes_do_not_depend_on_order(tmp_path):
+    paths = [("Reports", "a/b"), ("Reports", "a:b"), ("Reports", "A?B"), ("reports",)]
+    folders = []
+    for ordering in (paths, paths[::-1]):
+        planner = PathPlanner(str(tmp_path / str(len(folders))))
+        planner.plan(ordering)
+        folders.append([os.path.relpath(planner._folders[p], planner.root) for p in paths])
+    assert folders[0] == folders[1]
+    assert len({f.lower() for f in folders[0]}) == len(paths)
+
+
+def test_planned_folders_are_created_once(tmp_path):
+    planner = PathPlanner(str(tmp_path))
+    planner.plan([CATEGORY, CATEGORY[:2], ("Other",)])
+    assert planner.makedirs() == 4
+    assert planner.makedirs() == 0
+    assert os.path.isdir(planner.folder(CATEGORY))
+
+
+def test_extractors_plan_folders_during_their_single_walk(tmp_path):
+    notes = FakeNotes({"a.nsf": CorpusSpec(documents=30, attachments_per_document=0)})
+    load_script("extract-all2").extract_nsf_data_all_documents("", "a.nsf", str(tmp_path / "all2"),
+                                                               session_factory=notes)
+    assert notes.calls["FakeDocumentCollection.GetFirstDocument"] == 1
+    assert notes.calls["FakeDocument.UniversalID"] == 30
+
+    notes.reset_counters()
+    db = notes("").GetDatabase("", "a.nsf")
+    load_script("extract-geds").extract_all_views_with_categories("", db, str(tmp_path / "geds"))
+    assert notes.calls["FakeView.CreateViewNav"] == len(db.Views)
+    assert notes.calls["FakeViewEntry.ColumnValues"] == notes.calls["FakeViewEntry.UniversalID"]
@@ -0,0 +1,49 @@
+import datetime
+
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from selection import REQUIRED_FIELDS, Selection, select_documents, selected_unids, snapshot_document
+from session_pool import collect_unids, open_database
+
+NSF_PATH = "fake.nsf"
+
+
+def _db(**spec):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=30, items_per_document=8, attachments_per_document=1,
+                                            attachment_sizes=(100,), forms=("Memo", "Reply", "Report"), **spec)})
+    return notes, open_database(notes(""), NSF_PATH)
+
+
+def test_search_formula_combines_the_conditions():
+    selection = Selection(formula='Status = "Final"', forms=("Memo", 'Say "hi"'),
+                          modified_after=datetime.datetime(2023, 6, 30, 12, 5, 9))
+    assert selection.search_formula() == (
+        '(Status = "Final") & (Form = "Memo" : "Say \\"hi\\"") & (@Modified > @Date(2023; 6; 30; 12; 5; 9))')
+    assert Selection(query="budget").search_formula() is None
+    assert not Selection(fields=("Body",)).filtered()
+
+
+def test_selection_is_searched_on_the_server():
+    notes, db = _db()
+    selected = collect_unids(select_documents(db, Selection(forms=("Reply",))))
+    assert selected == [document_unid(i) for i in range(30) if i % 3 == 1]
+    assert notes.calls["FakeDatabase.Search"] == 1
+    assert notes.calls["FakeDatabase.AllDocuments"] == 0
+
+    # A formula and a full-text query: Search, then FTSearch refining that collection
+    notes.reset_counters()
+    both = selected_unids(db, Selection(forms=("Reply",), query="Document 4"))
+    assert both and both < set(selected)
+    assert notes.calls["FakeDatabase.Search"] == notes.calls["FakeDocumentCollection.FTSearch"] == 1
+    assert selected_unids(db, Selection(fields=("Body",))) is None
+
+
+def test_projection_reads_only_the_named_items():
+    notes, db = _db()
+    selection = Selection(fields=("Body", "Subject"), attachments=False)
+    assert selection.projection() == (*REQUIRED_FIELDS, "Body")
+    snapshot = snapshot_document(db.GetDocumentByUNID(document_unid(0)), selection)
+    assert {item.name for item in snapshot.items} <= set(selection.projection())
+    assert snapshot.attachments == []
+    assert notes.calls["FakeDocument.GetFirstItem"] == len(selection.projection())
+    assert notes.calls["FakeDocument.Items"] == 0
+    assert notes.calls["FakeItem.EmbeddedObjects"] == 0
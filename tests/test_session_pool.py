@@ -0,0 +1,119 @@
+import pytest
+
+from bench_export import load_script
+from com_lifetime import release
+from fake_notes import CATEGORIZED_VIEW, CorpusSpec, FakeNotes, document_unid
+from session_pool import release_session, run_sharded, split_shards
+from throttle import Throttle
+
+NSF_PATH = "fake.nsf"
+
+
+@pytest.mark.parametrize("count, workers", [(10, 3), (3, 8), (7, 1), (100, 7)])
+def test_shards_are_contiguous_and_balanced(count, workers):
+    unids = list(range(count))
+    shards = split_shards(unids, workers)
+    assert [unid for shard in shards for unid in shard] == unids
+    assert len(shards) == min(count, workers)
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+
+
+def test_no_shards_for_no_unids():
+    assert split_shards([], 4) == []
+
+
+def test_groups_stay_in_one_shard():
+    unids = ["a1", "a2", "a3", "b1", "c1", "c2", "d1", "d2", "d3", "d4"]
+    shards = split_shards(unids, 3, group_of=lambda unid: unid[0])
+    assert [unid for shard in shards for unid in shard] == unids
+    groups = [{unid[0] for unid in shard} for shard in shards]
+    assert all(not (a & b) for i, a in enumerate(groups) for b in groups[i + 1:])
+
+
+def test_run_sharded_merges_results_in_unid_order():
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=50, attachments_per_document=0)}, retain_handles=True)
+    unids = [document_unid(i) for i in range(50)]
+    results = run_sharded("", NSF_PATH, unids, lambda doc: doc.UniversalID, 4, session_factory=notes)
+    assert results == unids
+    assert notes.live_handles() == 0
+
+
+def test_run_sharded_skips_documents_it_cannot_open():
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=5, attachments_per_document=0)})
+    unids = [document_unid(0), "NOT-A-UNID", document_unid(1)]
+    assert run_sharded("", NSF_PATH, unids, lambda doc: doc.UniversalID, 2, session_factory=notes) == [
+        document_unid(0), document_unid(1)]
+
+
+def test_an_active_throttle_refuses_processes():
+    with pytest.raises(ValueError):
+        run_sharded("", NSF_PATH, ["x"], str, 2, session_factory=FakeNotes(), use_processes=True,
+                    throttle=Throttle(2, rate=10))
+
+
+def test_release_session_releases_objects_before_the_factory_hook():
+    order = []
+
+    class Handle:
+        def __init__(self, name):
+            self.name = name
+
+        @property
+        def _oleobj_(self):
+            return self
+
+        @_oleobj_.setter
+        def _oleobj_(self, value):
+            order.append(self.name)
+
+    class Factory:
+        def release(self, session):
+            release(session)
+            order.append("uninitialize")
+
+    release_session(Factory(), Handle("session"), Handle("db"))
+    assert order == ["db", "session", "uninitialize"]
+    order.clear()
+    # Without a hook the session is released all the same
+    release_session(object(), Handle("session"), Handle("db"))
+    assert order == ["db", "session"]
+
+
+class _SessionLog:
+    """Session factory around FakeNotes that remembers the sessions it hands out and gets back."""
+
+    def __init__(self, notes):
+        self.notes = notes
+        self.opened = []
+        self.released = []
+
+    def __call__(self, password):
+        self.opened.append(self.notes(password))
+        return self.opened[-1]
+
+    def release(self, session):
+        self.released.append(session)
+        self.notes.release(session)
+
+
+def test_blended_export_releases_every_session(tmp_path):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=20, attachments_per_document=0)}, retain_handles=True)
+    sessions = _SessionLog(notes)
+    load_script("extract-all3").blended_export("", NSF_PATH, CATEGORIZED_VIEW, str(tmp_path), workers=2,
+                                               session_factory=sessions)
+    assert len(sessions.opened) == 3
+    assert {id(s) for s in sessions.released} == {id(s) for s in sessions.opened}
+    assert notes.live_handles() == 0
+
+
+def test_all_views_export_releases_its_session(tmp_path):
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=20, attachments_per_document=0)}, retain_handles=True)
+    sessions = _SessionLog(notes)
+    load_script("extract-all4").extract_all_views_with_categories("", NSF_PATH, str(tmp_path),
+                                                                  session_factory=sessions)
+    assert [id(s) for s in sessions.released] == [id(s) for s in sessions.opened]
+    assert notes.live_handles() == 0
+    with pytest.raises(Exception):
+        load_script("extract-all4").extract_all_views_with_categories("", "missing.nsf", str(tmp_path),
+                                                                      session_factory=sessions)
+    assert len(sessions.released) == len(sessions.opened) == 2
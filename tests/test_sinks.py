@@ -0,0 +1,71 @@
+import datetime
+import json
+import os
+import sqlite3
+
+import pytest
+
+from archive_sink import INDEX_NAME
+from doc_snapshot import DATETIMES, NUMBERS, TEXT, DocumentSnapshot, ItemSnapshot
+from path_planner import sanitize_name
+from sinks import RecordSink, open_sink
+
+PLUS_TWO = datetime.timezone(datetime.timedelta(hours=2))
+
+
+def _snapshot():
+    return DocumentSnapshot("FA4E0000000000000000000000000001", [
+        ItemSnapshot("Subject", TEXT, ("Hello",), None),
+        ItemSnapshot("Amount", NUMBERS, (2.5,), None),
+        ItemSnapshot("Sent", DATETIMES, (datetime.datetime(2020, 1, 1, 12, 0, tzinfo=PLUS_TWO),), None),
+        ItemSnapshot("Naive", DATETIMES, (datetime.datetime(2020, 1, 1, 12, 0),), None),
+    ], [])
+
+
+def test_jsonl_record(tmp_path):
+    sink = open_sink("jsonl", str(tmp_path), sanitize_name)
+    sink.write_document(_snapshot(), [["Reports", "2020"]])
+    sink.close()
+    with open(os.path.join(tmp_path, "documents.jsonl"), encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert record["subject"] == "Hello"
+    assert record["categories"] == [["Reports", "2020"]]
+    values = {item["name"]: item["values"] for item in record["items"]}
+    assert values["Sent"] == ["2020-01-01T12:00:00+02:00"]
+
+
+def test_parquet_datetimes_are_utc(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    sink = open_sink("parquet", str(tmp_path), sanitize_name)
+    sink.write_document(_snapshot(), [["Reports"]])
+    sink.close()
+    row = pq.read_table(os.path.join(tmp_path, "documents.parquet")).to_pylist()[0]
+    datetimes = {item["name"]: item["datetimes"] for item in row["items"]}
+    assert datetimes["Sent"] == [datetime.datetime(2020, 1, 1, 10, 0)]
+    assert datetimes["Naive"] == [datetime.datetime(2020, 1, 1, 12, 0)]
+    assert {item["name"]: item["numbers"] for item in row["items"]}["Amount"] == [2.5]
+
+
+def test_record_sinks_must_implement_write(tmp_path):
+    class NoWrite(RecordSink):
+        pass
+
+    with pytest.raises(TypeError):
+        NoWrite(str(tmp_path / "out"), str(tmp_path), sanitize_name)
+
+
+@pytest.mark.parametrize("kind", ["jsonl", "tar"])
+def test_tombstones_go_through_write(tmp_path, kind):
+    sink = open_sink(kind, str(tmp_path), sanitize_name)
+    sink.write_document(_snapshot(), [["Reports"]])
+    sink.write_tombstone(_snapshot().unid)
+    sink.close()
+    if kind == "jsonl":
+        with open(os.path.join(tmp_path, "documents.jsonl"), encoding="utf-8") as f:
+            assert [json.loads(line)["deleted"] for line in f] == [False, True]
+    else:
+        conn = sqlite3.connect(os.path.join(tmp_path, INDEX_NAME))
+        assert conn.execute("SELECT deleted FROM documents").fetchall() == [(1,)]
+        conn.close()
@@ -0,0 +1,45 @@
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from session_pool import open_database, split_shards
+from threads import ThreadIndex, build_thread_index
+
+NSF_PATH = "fake.nsf"
+DOCUMENTS = 60
+
+
+def _index():
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=DOCUMENTS, attachments_per_document=0, response_ratio=0.5)})
+    db = open_database(notes(""), NSF_PATH)
+    parents = {document_unid(i): document_unid(db.parent_index(i))
+               for i in range(DOCUMENTS) if db.parent_index(i) is not None}
+    return build_thread_index(db), parents
+
+
+def test_index_is_built_from_the_ref_items():
+    index, parents = _index()
+    assert parents and index.parents == parents
+
+
+def test_order_keeps_each_thread_together_parents_first():
+    index, _ = _index()
+    unids = [document_unid(i) for i in range(DOCUMENTS)]
+    ordered = index.order(unids)
+    assert sorted(ordered) == sorted(unids)
+    roots = [index.root(unid) for unid in ordered]
+    # Each thread is one contiguous run, headed by its main document
+    runs = [root for n, root in enumerate(roots) if n == 0 or roots[n - 1] != root]
+    assert len(runs) == len(set(roots))
+    position = {unid: n for n, unid in enumerate(ordered)}
+    assert all(position[index.parent(unid)] < position[unid] for unid in index.parents)
+    assert max(map(index.depth, unids)) > 1
+
+    # Shards split on thread boundaries, so no thread spans two workers
+    shards = split_shards(ordered, 4, group_of=index.root)
+    threads = [{index.root(unid) for unid in shard} for shard in shards]
+    assert all(not (a & b) for n, a in enumerate(threads) for b in threads[n + 1:])
+
+
+def test_missing_parents_and_cycles_end_the_chain():
+    index = ThreadIndex({"b": "a", "c": "b", "x": "gone", "p": "q", "q": "p"})
+    assert index.root("c") == "a" and index.depth("c") == 2
+    assert index.root("x") == "gone"
+    assert index.root("p") in ("p", "q") and index.depth("p") == 1
@@ -0,0 +1,92 @@
+import datetime
+import pickle
+import threading
+import time
+
+import pytest
+
+from fake_notes import CorpusSpec, FakeNotes, document_unid
+from session_pool import run_sharded
+from throttle import Throttle, TokenBucket, in_quiet_hours, parse_quiet_hours
+
+NSF_PATH = "fake.nsf"
+
+
+def test_quiet_hours_parse_and_wrap_past_midnight():
+    assert parse_quiet_hours("08:00-18:00") == (datetime.time(8), datetime.time(18))
+    with pytest.raises(ValueError):
+        parse_quiet_hours("8 to 6")
+    night = [parse_quiet_hours("22:00-06:00")]
+    assert in_quiet_hours(night, datetime.datetime(2020, 1, 1, 23, 30))
+    assert in_quiet_hours(night, datetime.datetime(2020, 1, 1, 5, 59))
+    assert not in_quiet_hours(night, datetime.datetime(2020, 1, 1, 12, 0))
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    clock = [0.0]
+    slept = []
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: clock[0], sleep=slept.append)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.5]
+    assert slept == [0.5]
+
+
+def test_worker_limit_caps_documents_in_flight():
+    throttle = Throttle(2)
+
+    def work():
+        for _ in range(5):
+            with throttle.slot():
+                time.sleep(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert throttle.peak == 2
+    assert throttle.in_flight == 0
+
+
+def test_latency_target_halves_and_grows_the_limit():
+    throttle = Throttle(8, target_latency=0.1, min_workers=1, interval=0)
+    throttle.limit = 4.0
+    throttle.observe(0.5)
+    assert throttle.limit == 2.0 and throttle.decreases == 1
+    throttle.in_flight = 2
+    throttle.observe(0.01)
+    assert throttle.limit == 3.0 and throttle.increases == 1
+
+
+def test_quiet_hours_limit_the_workers():
+    noon = datetime.datetime(2020, 1, 1, 12, 0)
+    throttle = Throttle(8, quiet_hours=["08:00-18:00"], quiet_workers=1, now=lambda: noon)
+    assert throttle.allowed() == 1
+    assert Throttle(8, quiet_hours=["20:00-06:00"], quiet_workers=1, now=lambda: noon).allowed() == 8
+
+
+def test_throttle_is_not_picklable():
+    with pytest.raises(TypeError):
+        pickle.dumps(Throttle(2))
+
+
+def test_latency_target_backs_off_under_server_load():
+    # Every call in flight adds 2 ms to the others, so 8 workers run far over a 5 ms target
+    notes = FakeNotes({NSF_PATH: CorpusSpec(documents=400, attachments_per_document=0)},
+                      latency=0.001, load_latency=0.002)
+    throttle = Throttle(8, target_latency=0.005, interval=0.02)
+    throttle.limit = 8.0
+    latencies = []
+    observe = throttle.observe
+
+    def recording_observe(latency):
+        latencies.append(latency)
+        observe(latency)
+
+    throttle.observe = recording_observe
+    unids = [document_unid(i) for i in range(400)]
+    assert run_sharded("", NSF_PATH, unids, lambda doc: doc.UniversalID, 8, session_factory=notes,
+                       throttle=throttle) == unids
+    assert throttle.decreases > 0
+    assert 1 <= int(throttle.limit) < 8
+    settled = latencies[-len(latencies) // 4:]
+    assert sum(settled) / len(settled) < throttle.target_latency + notes.load_latency
@@ -0,0 +1,32 @@
+import pytest
+
+from fake_notes import CATEGORIZED_VIEW, CorpusSpec, FakeNotes
+from session_pool import open_database
+from view_categories import gather_view_categories_by_document, gather_view_categories_by_entry, view_navigator
+
+
+def _view(documents=50):
+    notes = FakeNotes({"fake.nsf": CorpusSpec(documents=documents, attachments_per_document=0)})
+    return open_database(notes(""), "fake.nsf").GetView(CATEGORIZED_VIEW)
+
+
+@pytest.mark.parametrize("auto_update", [True, False])
+def test_auto_update_is_restored(auto_update):
+    view = _view()
+    view.AutoUpdate = auto_update
+    gather_view_categories_by_entry(view)
+    assert view.AutoUpdate is auto_update
+
+
+def test_auto_update_is_restored_after_a_failure():
+    view = _view()
+    with pytest.raises(RuntimeError):
+        with view_navigator(view):
+            assert view.AutoUpdate is False
+            raise RuntimeError("walk failed")
+    assert view.AutoUpdate is True
+
+
+def test_entry_pass_matches_document_pass():
+    view = _view()
+    assert gather_view_categories_by_entry(view) == gather_view_categories_by_document(view)
@@ -0,0 +1,107 @@
+"""
+Response threads: discussion replies and reference database responses.
+
+A response document names its parent in its $Ref item. ThreadIndex keeps the
+response UNID -> parent UNID map in memory, built from one server-side search for
+response documents that reads nothing but their $Ref values: no document is walked
+item by item and no ParentDocument call is made. From it every document gets its
+thread (the UNID of the main document at the top), and a UNID list can be reordered
+so each thread is contiguous, parents before their responses, which keeps whole
+threads on one worker and in one archive shard.
+"""
+import json
+
+from com_lifetime import release
+
+REF_ITEM = "$Ref"
+# Selection formula for response documents (responses to responses included)
+RESPONSES_FORMULA = "@IsResponseDoc"
+# "reference": records and threads.jsonl name each response's parent and thread;
+# "nested": folder exports also place each response inside its parent's folder
+THREAD_MODES = ("reference", "nested")
+THREADS_NAME = "threads.jsonl"
+
+
+class ThreadIndex:
+    """Response UNID -> parent UNID, with memoized thread roots and depths."""
+
+    def __init__(self, parents=None):
+        self.parents = dict(parents or {})
+        self._roots = {}
+
+    def add(self, unid, parent):
+        if unid and parent and unid != parent:
+            self.parents[unid] = parent
+            self._roots.clear()
+
+    def parent(self, unid):
+        return self.parents.get(unid)
+
+    def root(self, unid):
+        """UNID of the main document heading `unid`'s thread (`unid` itself if it isn't a response)."""
+        root = self._roots.get(unid)
+        if root is None:
+            chain = [unid]
+            seen = {unid}
+            parent = self.parents.get(unid)
+            # A missing parent (deleted, or in another database) ends the chain; so does a cycle
+            while parent is not None and parent not in seen:
+                chain.append(parent)
+                seen.add(parent)
+                parent = self.parents.get(parent)
+            root = chain[-1]
+            for member in chain:
+                self._roots[member] = root
+        return root
+
+    def depth(self, unid):
+        """0 for a main document, 1 for a response to it, and so on."""
+        depth = 0
+        seen = {unid}
+        parent = self.parents.get(unid)
+        while parent is not None and parent not in seen:
+            depth += 1
+            seen.add(parent)
+            parent = self.parents.get(parent)
+        return depth
+
+    def order(self, unids):
+        """
+        `unids` regrouped thread by thread, threads in order of their first document and
+        parents before their responses.
+        """
+        threads = {}
+        for unid in unids:
+            threads.setdefault(self.root(unid), []).append(unid)
+        ordered = []
+        for members in threads.values():
+            ordered.extend(sorted(members, key=self.depth) if len(members) > 1 else members)
+        return ordered
+
+    def write(self, path):
+        """One line per response: its UNID, parent, thread and depth."""
+        with open(path, "w", encoding="utf-8") as f:
+            for unid in sorted(self.parents):
+                f.write(json.dumps({"unid": unid, "parent": self.parents[unid], "thread": self.root(unid),
+                                    "depth": self.depth(unid)}) + "\n")
+
+    def report(self):
+        threads = {self.root(unid) for unid in self.parents}
+        deepest = max((self.depth(unid) for unid in self.parents), default=0)
+        print(f"[INFO] Threads: {len(self.parents)} responses in {len(threads)} threads "
+              f"(up to {deepest} levels deep).")
+
+
+def build_thread_index(db):
+    """ThreadIndex of every response document in `db`, from their $Ref values alone."""
+    index = ThreadIndex()
+    collection = db.Search(RESPONSES_FORMULA, None, 0)
+    doc = collection.GetFirstDocument()
+    while doc:
+        next_doc = collection.GetNextDocument(doc)
+        refs = doc.GetItemValue(REF_ITEM)
+        if refs:
+            index.add(doc.UniversalID, refs[0])
+        release(doc)
+        doc = next_doc
+    return index
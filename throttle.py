@@ -0,0 +1,220 @@
+"""
+Load control for exports that run against a production Domino server.
+
+A Throttle sits in the document loops: every document takes a slot first, and one
+timed COM call per document (opening it) feeds an AIMD controller that adds a worker
+while latency stays under the target and halves the in-flight workers when it goes
+over. A token bucket can cap the document rate, and quiet hours limit the export to
+`quiet_workers` (0 pauses it) during e.g. business hours.
+"""
+import datetime
+import sys
+import threading
+import time
+
+from metrics import run_metrics
+
+# How often a waiting worker re-checks quiet hours and the concurrency limit
+POLL_INTERVAL = 1.0
+UNLIMITED = sys.maxsize
+
+
+def parse_quiet_hours(text):
+    """'08:00-18:00' -> (time(8, 0), time(18, 0)); the window may wrap past midnight."""
+    try:
+        start, end = (datetime.time.fromisoformat(part.strip()) for part in text.split("-"))
+    except ValueError:
+        raise ValueError(f"Quiet hours must look like 08:00-18:00, not '{text}'") from None
+    return start, end
+
+
+def in_quiet_hours(windows, now):
+    moment = now.time()
+    for start, end in windows:
+        if start <= end:
+            if start <= moment < end:
+                return True
+        elif moment >= start or moment < end:
+            return True
+    return False
+
+
+class TokenBucket:
+    """At most `rate` takes per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take one token, sleeping until it is available; returns the seconds waited."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve the token even if it isn't there yet, so waiters queue up in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class Throttle:
+    """
+    Concurrency limit shared by the worker threads of one export. Without a
+    `target_latency` the limit stays at `max_workers` (None: unlimited); with one it
+    starts at `min_workers` and is adjusted once per `interval` seconds from the mean
+    latency observed in that window: +1 if under the target and the limit is in use,
+    times `decrease` if over it.
+    """
+
+    def __init__(self, max_workers=None, target_latency=None, rate=None, burst=None, quiet_hours=(),
+                 quiet_workers=0, min_workers=1, interval=1.0, decrease=0.5, now=datetime.datetime.now):
+        self.max_workers = max_workers or UNLIMITED
+        self.min_workers = min(min_workers, self.max_workers)
+        self.target_latency = target_latency
+        self.limit = float(self.min_workers if target_latency else self.max_workers)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.quiet_hours = [parse_quiet_hours(window) if isinstance(window, str) else window
+                            for window in quiet_hours]
+        self.quiet_workers = quiet_workers
+        self.interval = interval
+        self.decrease = decrease
+        self.now = now
+        self.in_flight = 0
+        self.peak = 0
+        self.increases = 0
+        self.decreases = 0
+        self.waited = 0.0
+        self.latency_total = 0.0
+        self.samples = 0
+        self._window = []
+        self._window_start = time.monotonic()
+        self._cond = threading.Condition()
+
+    def __reduce__(self):
+        raise TypeError("A throttle can't be shared with worker processes; use threads.")
+
+    def active(self):
+        """True if this throttle ever holds a document back beyond the worker count."""
+        return bool(self.target_latency or self.bucket or self.quiet_hours)
+
+    def allowed(self):
+        """Workers allowed in flight right now."""
+        limit = max(1, int(self.limit))
+        if self.quiet_hours and in_quiet_hours(self.quiet_hours, self.now()):
+            limit = min(limit, self.quiet_workers)
+        return limit
+
+    def acquire(self):
+        """Wait for quiet hours to end, a free slot and a rate token."""
+        start = time.perf_counter()
+        with self._cond:
+            while self.in_flight >= self.allowed():
+                self._cond.wait(POLL_INTERVAL)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        if self.bucket is not None:
+            self.bucket.take()
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            run_metrics.observe("throttle", waited)
+            with self._cond:
+                self.waited += waited
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def slot(self):
+        """Context manager holding one slot for the duration of a document."""
+        return _Slot(self)
+
+    def measure(self):
+        """Context manager timing one COM call into the controller."""
+        return _Measure(self)
+
+    def observe(self, latency):
+        with self._cond:
+            self.latency_total += latency
+            self.samples += 1
+            if not self.target_latency:
+                return
+            self._window.append(latency)
+            now = time.monotonic()
+            if now - self._window_start < self.interval:
+                return
+            mean = sum(self._window) / len(self._window)
+            if mean > self.target_latency and self.limit > self.min_workers:
+                self.limit = max(float(self.min_workers), self.limit * self.decrease)
+                self.decreases += 1
+            elif mean <= self.target_latency and self.limit < self.max_workers and self.in_flight >= int(self.limit):
+                self.limit += 1
+                self.increases += 1
+                self._cond.notify_all()
+            self._window = []
+            self._window_start = now
+
+    def report(self):
+        if not self.active():
+            return
+        mean = self.latency_total / self.samples * 1000 if self.samples else 0.0
+        print(f"[INFO] Throttle: {mean:.1f} ms mean COM latency over {self.samples} documents, "
+              f"peak {self.peak} in flight, final limit {int(self.limit)} ({self.increases} increases, "
+              f"{self.decreases} decreases), waited {self.waited:.1f}s in total.")
+
+
+class _Measure:
+    __slots__ = ("throttle", "start")
+
+    def __init__(self, throttle):
+        self.throttle = throttle
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.throttle.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _Slot:
+    __slots__ = ("throttle",)
+
+    def __init__(self, throttle):
+        self.throttle = throttle
+
+    def __enter__(self):
+        self.throttle.acquire()
+        return self.throttle
+
+    def __exit__(self, exc_type, exc, tb):
+        self.throttle.release()
+        return False
+
+
+def add_throttle_arguments(parser):
+    group = parser.add_argument_group("server load")
+    group.add_argument("--target-latency-ms", type=float, metavar="MS",
+                       help="Adapt the number of in-flight workers (up to --workers) to keep COM latency under MS.")
+    group.add_argument("--max-rate", type=float, metavar="DOCS",
+                       help="Never process more than DOCS documents per second.")
+    group.add_argument("--quiet-hours", action="append", default=[], type=parse_quiet_hours, metavar="HH:MM-HH:MM",
+                       help="Local time window (repeatable) in which only --quiet-workers workers run.")
+    group.add_argument("--quiet-workers", type=int, default=0,
+                       help="Workers allowed during quiet hours (default 0: pause).")
+
+
+def throttle_from_args(args):
+    """Throttle from the add_throttle_arguments options, bounded by --workers."""
+    return Throttle(max_workers=args.workers,
+                    target_latency=args.target_latency_ms / 1000 if args.target_latency_ms else None,
+                    rate=args.max_rate, quiet_hours=args.quiet_hours, quiet_workers=args.quiet_workers)
@@ -0,0 +1,116 @@
+import contextlib
+import time
+
+from com_lifetime import release
+
+# Entries fetched from the server per navigator read (NotesViewNavigator.BufferMaxEntries caps at 400)
+VIEW_NAV_BUFFER_ENTRIES = 400
+# Older clients only have NotesViewNavigator.CacheSize, which caps at 128
+VIEW_NAV_CACHE_SIZE = 128
+# NotesViewNavigator.EntryOptions: skip child/descendant count data we never read
+VN_ENTRYOPT_NOCOUNTDATA = 1
+
+
+def _add_path(doc_id_to_paths, uid, current_path):
+    if uid:
+        doc_id_to_paths.setdefault(uid, []).append(list(current_path))  # copy current category path
+
+
+def _walk_categories(first, next_, doc_uid):
+    """Shared traversal: tracks the category path and maps each document UNID to it."""
+    doc_id_to_paths = {}
+    entry_count = 0
+    current_path = []
+    entry = first()
+    while entry:
+        entry_count += 1
+        next_entry = next_(entry)
+
+        if entry.IsCategory:
+            cat_name = entry.ColumnValues[0] or "Uncategorized"
+            # Adjust current_path based on the category level
+            while len(current_path) >= entry.Level:
+                current_path.pop()
+            current_path.append(cat_name)
+
+        elif entry.IsDocument:
+            _add_path(doc_id_to_paths, doc_uid(entry), current_path)
+
+        release(entry)
+        entry = next_entry
+    return doc_id_to_paths, entry_count
+
+
+def _document_uid(entry):
+    doc = entry.Document
+    try:
+        return doc.UniversalID if doc is not None else None
+    finally:
+        release(doc)
+
+
+def gather_view_categories_by_document(view):
+    """
+    Original mapping pass: opens every document (entry.Document) to read its UNID.
+    Kept for comparison in bench_view_categories.py.
+    """
+    all_entries = view.AllEntries
+    return _walk_categories(all_entries.GetFirstEntry, all_entries.GetNextEntry, _document_uid)
+
+
+def create_view_navigator(view):
+    """Read-only navigator over the view index with auto-update off and a large read-ahead buffer."""
+    view.AutoUpdate = False
+    nav = view.CreateViewNav()
+    try:
+        nav.BufferMaxEntries = VIEW_NAV_BUFFER_ENTRIES
+    except Exception:
+        nav.CacheSize = VIEW_NAV_CACHE_SIZE
+    try:
+        nav.EntryOptions = VN_ENTRYOPT_NOCOUNTDATA
+    except Exception:
+        pass
+    return nav
+
+
+@contextlib.contextmanager
+def view_navigator(view):
+    """
+    create_view_navigator() for a `with` block: the view's own AutoUpdate setting is
+    restored on the way out, even if the walk fails.
+    """
+    auto_update = view.AutoUpdate
+    try:
+        yield create_view_navigator(view)
+    finally:
+        view.AutoUpdate = auto_update
+
+
+def gather_view_categories_by_entry(view):
+    """
+    Mapping pass that reads only entry-level data from the view index
+    (UniversalID, ColumnValues, Level); no document is instantiated.
+    """
+    with view_navigator(view) as nav:
+        return _walk_categories(nav.GetFirst, nav.GetNext, lambda entry: entry.UniversalID)
+
+
+def gather_view_categories(db, view_name):
+    """
+    Build a dict: doc_id -> [ [catPath1], [catPath2], ... ]
+    Each catPath is a list of category strings.
+    """
+    print(f"\n[DEBUG] Attempting to open view: '{view_name}'")
+    view = db.GetView(view_name)
+    if not view:
+        print(f"[DEBUG] View '{view_name}' not found. Returning empty mapping.")
+        return {}
+
+    start = time.perf_counter()
+    doc_id_to_paths, entry_count = gather_view_categories_by_entry(view)
+    elapsed = time.perf_counter() - start
+
+    print(f"[DEBUG] View '{view_name}' opened. Entries found: {entry_count} "
+          f"({entry_count / elapsed if elapsed else 0:.0f} entries/sec)")
+    print(f"[DEBUG] Documents found in this view: {len(doc_id_to_paths)} unique doc IDs.\n")
+    return doc_id_to_paths